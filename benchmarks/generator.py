@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Synthetic tablatures generator, to feed the benchmarks
+"""
+import argparse
+import random
+
+# Strings names, from low to high
+STRINGS_NAMES = {
+    4: "EADG",
+    6: "EADGBe",
+    7: "BEADGBe",
+}
+
+MAX_FRET = 24
+
+def generate_tablature(
+    strings=6,
+    blocks=100,
+    line_length=80,
+    note_density=0.3,
+    chord_density=0.1,
+    two_digits=0.2,
+    repeat_runs=0.01,
+    seed=0,
+):
+    """Generate a tablature text
+
+    - note_density: probability to write something at a given position
+    - chord_density: probability that something written is a chord
+    - two_digits: probability that a fret is 10 or more
+    - repeat_runs: probability that a fret is written like 777777
+    """
+    rnd = random.Random(seed)
+    names = STRINGS_NAMES[strings][::-1] # tablatures start with the highest string
+    out = ["Title: synthetic tablature", ""]
+
+    for block_idx in range(blocks):
+        out.append(f"part {block_idx + 1}")
+        lines = [[name, '|'] for name in names]
+        column = 2
+
+        while column < line_length - 3:
+            if rnd.random() >= note_density:
+                for line in lines:
+                    line.append('-')
+                column += 1
+                continue
+
+            # Strings played at this position
+            if rnd.random() < chord_density:
+                played = rnd.sample(range(strings), rnd.randint(2, strings))
+            else:
+                played = [rnd.randrange(strings)]
+
+            cells = {}
+            for str_idx in played:
+                if rnd.random() < repeat_runs:
+                    cells[str_idx] = str(rnd.randint(1, 9)) * rnd.randint(4, 8)
+                elif rnd.random() < two_digits:
+                    cells[str_idx] = str(rnd.randint(10, MAX_FRET))
+                else:
+                    cells[str_idx] = str(rnd.randint(0, 9))
+
+            # Every line is padded to the widest cell and followed by a dash
+            width = max(len(cell) for cell in cells.values())
+            for str_idx, line in enumerate(lines):
+                line.append(cells.get(str_idx, '').ljust(width, '-') + '-')
+            column += width + 1
+
+        for line in lines:
+            line.append('-' * max(0, line_length - 1 - len(''.join(line))) + '|')
+            out.append(''.join(line))
+        out.append("")
+
+    return '\n'.join(out)
+
+def init_argparse():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic tablature",
+    )
+    parser.add_argument("-s", "--strings", type=int, default=6, choices=sorted(STRINGS_NAMES))
+    parser.add_argument("-b", "--blocks", type=int, default=100)
+    parser.add_argument("-l", "--line-length", type=int, default=80)
+    parser.add_argument("--note-density", type=float, default=0.3)
+    parser.add_argument("--chord-density", type=float, default=0.1)
+    parser.add_argument("--two-digits", type=float, default=0.2)
+    parser.add_argument("--repeat-runs", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("output", help="Output file")
+    return parser
+
+def main():
+    """Write the tablature to a file"""
+    args = init_argparse().parse_args()
+    text = generate_tablature(
+        strings=args.strings,
+        blocks=args.blocks,
+        line_length=args.line_length,
+        note_density=args.note_density,
+        chord_density=args.chord_density,
+        two_digits=args.two_digits,
+        repeat_runs=args.repeat_runs,
+        seed=args.seed,
+    )
+    with open(args.output, 'w') as f:
+        f.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Benchmarks runner
+Each stage is timed separately on a synthetic tablature, results can be saved
+as JSON and compared against a stored baseline to catch regressions.
+
+python -m benchmarks.run --save results.json
+python -m benchmarks.run --baseline results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from benchmarks.generator import generate_tablature, STRINGS_NAMES
+from src.instruments import INSTRUMENTS
+from src.notes import MusicNote, MIDI_NOTES_COUNT, IDX_ENG, IDX_DEU, IDX_LAT
+from src.tablature import Tablature
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Instrument of the generated tablatures per strings count, the registry
+# preferred one (reversed, so the first registered wins)
+STRINGS_INSTRUMENTS = {len(tuning): name for name, tuning in reversed(INSTRUMENTS.items())}
+
+# A benchmark is slower than its baseline above this ratio
+DEFAULT_TOLERANCE = 0.2
+
+def bench(func, items, repeat):
+    """Best time of func() over repeat runs, with time per item"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {
+        'best': best,
+        'items': items,
+        'per_item_ns': best / items * 1e9 if items else None,
+    }
+
+def run_benchmarks(tab_file, instrument, repeat=5):
+    """Time every stage on the given tablature file, of a registered instrument"""
+    inst_strings = INSTRUMENTS[instrument]
+    results = {}
+
+    with open(tab_file) as f:
+        lines = [line.strip() for line in f]
+    tab_lines = [line for line in lines if Tablature.is_tablature_line(line)]
+
+    results['is_tablature_line'] = bench(
+        lambda: [Tablature.is_tablature_line(line) for line in lines], len(lines), repeat)
+    results['get_line_frets'] = bench(
+        lambda: [Tablature.get_line_frets(line) for line in tab_lines], len(tab_lines), repeat)
+
+    tab = Tablature(tab_file, inst_strings)
+    tab.check() # file loaded once
+    results['_parse_file'] = bench(tab._parse_file, len(lines), repeat)
+
+    notes_count = sum(len(chord) for block in tab.midi_notes() for chord in block)
+    results['midi_notes'] = bench(tab.midi_notes, notes_count, repeat)
+
+    midi_indexes = range(MIDI_NOTES_COUNT)
+    langs = (IDX_ENG, IDX_DEU, IDX_LAT)
+    names = [MusicNote.midi_to_name(midi_idx, lang) for lang in langs for midi_idx in midi_indexes]
+    results['midi_to_name'] = bench(
+        lambda: [MusicNote.midi_to_name(midi_idx, lang) for lang in langs for midi_idx in midi_indexes],
+        len(names), repeat)
+    results['name_to_midi'] = bench(
+        lambda: [MusicNote.name_to_midi(name) for name in names], len(names), repeat)
+
+    # Whole program, including Python startup
+    command = [
+        sys.executable, os.path.join(ROOT_DIR, 'tabs2notes.py'),
+        '--no-cache', '--instrument', instrument, tab_file,
+    ]
+    results['tabs2notes'] = bench(
+        lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL), notes_count, min(repeat, 3))
+
+    return results
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions against a baseline, as (name, baseline time, new time)"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result['best'] > reference['best'] * (1 + tolerance):
+            regressions.append((name, reference['best'], result['best']))
+    return regressions
+
+def init_argparse():
+    parser = argparse.ArgumentParser(
+        description="Benchmark tablature conversion stages",
+    )
+    parser.add_argument(
+        "-s", "--strings", type=int, default=6, choices=sorted(set(STRINGS_NAMES) & set(STRINGS_INSTRUMENTS)),
+    )
+    parser.add_argument("-b", "--blocks", type=int, default=500)
+    parser.add_argument("-l", "--line-length", type=int, default=80)
+    parser.add_argument("--note-density", type=float, default=0.3)
+    parser.add_argument("--chord-density", type=float, default=0.1)
+    parser.add_argument("--two-digits", type=float, default=0.2)
+    parser.add_argument("--repeat-runs", type=float, default=0.01)
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Runs per benchmark, best one is kept")
+    parser.add_argument("--save", help="Save results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare results to this JSON file")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help="Allowed slowdown ratio against the baseline",
+    )
+    return parser
+
+def main():
+    """Run the benchmarks"""
+    args = init_argparse().parse_args()
+    params = {
+        'strings': args.strings,
+        'blocks': args.blocks,
+        'line_length': args.line_length,
+        'note_density': args.note_density,
+        'chord_density': args.chord_density,
+        'two_digits': args.two_digits,
+        'repeat_runs': args.repeat_runs,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tab_file = os.path.join(tmp_dir, 'synthetic.txt')
+        with open(tab_file, 'w') as f:
+            f.write(generate_tablature(**params))
+        results = run_benchmarks(tab_file, STRINGS_INSTRUMENTS[args.strings], args.repeat)
+
+    for name, result in results.items():
+        per_item = f"{result['per_item_ns']:12.1f} ns/item" if result['items'] else ""
+        print(f"{name:20} {result['best'] * 1000:10.3f} ms {per_item}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'params': params,
+                'results': results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('params') != params:
+            print("WARNING: baseline was run with other parameters")
+
+        regressions = compare(results, baseline['results'], args.tolerance)
+        for name, reference, new in regressions:
+            print(f"REGRESSION {name}: {reference * 1000:.3f} ms -> {new * 1000:.3f} ms")
+        if regressions:
+            exit(1)
+
+if __name__ == "__main__":
+    main()
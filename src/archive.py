@@ -0,0 +1,154 @@
+"""
+Tablatures read straight from zip and tar archives
+Members are read in archive order by a reader thread, through a bounded
+queue, so decompression overlaps with conversion and memory stays flat
+however big the archive is. Results are tagged with 'archive path/member'.
+"""
+import collections
+import concurrent.futures
+import functools
+import io
+import os
+import queue
+import tarfile
+import threading
+import zipfile
+
+from src.batch import map_files, _timed_call
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+MEMBER_ENCODING = 'utf-8'
+
+# Members read ahead of the conversion
+QUEUE_SIZE = 64
+# Members converted or waiting for a worker, per job
+IN_FLIGHT_PER_JOB = 4
+# Seconds between two checks that the reader is still wanted
+READER_TIMEOUT = 0.1
+
+class ArchiveError(ValueError):
+    """Archive can't be read"""
+
+def is_archive(path):
+    """Is it an archive, judging by its extension"""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def member_path(archive_path, member_name):
+    """Path tagging a member results"""
+    return f"{archive_path}/{member_name}"
+
+def iter_members(archive_path):
+    """(member name, content bytes) of the archive non hidden files, in archive order"""
+    try:
+        if archive_path.lower().endswith('.zip'):
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and not _is_hidden(info.filename):
+                        yield info.filename, archive.read(info)
+        else:
+            # Stream mode, members are decompressed once, in order
+            with tarfile.open(archive_path, 'r|*') as archive:
+                for info in archive:
+                    if info.isfile() and not _is_hidden(info.name):
+                        yield info.name, archive.extractfile(info).read()
+    except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as exc:
+        raise ArchiveError(f"Can't read archive: {exc}") from exc
+
+def member_stream(content):
+    """Text stream of a member content, for Tablature"""
+    return io.TextIOWrapper(io.BytesIO(content), encoding=MEMBER_ENCODING)
+
+def _is_hidden(member_name):
+    """Hidden files are skipped, like in directories"""
+    return any(part.startswith('.') for part in member_name.split('/'))
+
+def read_archive(archive_path, queue_size=QUEUE_SIZE):
+    """Same as iter_members(), read ahead by a thread"""
+    members = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        """Queue an item, unless the reading isn't wanted anymore"""
+        while not stop.is_set():
+            try:
+                members.put(item, timeout=READER_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for member in iter_members(archive_path):
+                if not put(member):
+                    return
+        except ArchiveError as exc:
+            put(exc)
+            return
+        put(end)
+
+    thread = threading.Thread(target=reader, name=f"read {archive_path}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = members.get()
+            if item is end:
+                return
+            if isinstance(item, ArchiveError):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def map_archive(func, archive_path, jobs=1):
+    """Apply func to each member, yield (member path, result, wall time) in archive order
+
+    func is called as func(member path, content=member bytes). With more than
+    one job, members are spread over a process pool, a bounded count at once.
+    """
+    members = read_archive(archive_path)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if jobs <= 1:
+        for name, content in members:
+            path = member_path(archive_path, name)
+            result, elapsed = _timed_call(functools.partial(func, content=content), path)
+            yield path, result, elapsed
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for name, content in members:
+            path = member_path(archive_path, name)
+            pending.append((path, executor.submit(_timed_call, functools.partial(func, content=content), path)))
+            if len(pending) >= jobs * IN_FLIGHT_PER_JOB:
+                path, future = pending.popleft()
+                yield (path, *future.result())
+        while pending:
+            path, future = pending.popleft()
+            yield (path, *future.result())
+
+def map_inputs(func, paths, jobs=1, error_result=None):
+    """map_files(), with archives members read and converted in streaming
+
+    Yields (path, result, wall time) in input order. An archive that can't be
+    read yields (archive path, error_result(message), 0).
+    """
+    files = []
+    for path in paths:
+        if not is_archive(path):
+            files.append(path)
+            continue
+
+        yield from map_files(func, files, jobs)
+        files = []
+        try:
+            yield from map_archive(func, path, jobs)
+        except ArchiveError as exc:
+            yield path, error_result(str(exc)), 0
+
+    yield from map_files(func, files, jobs)
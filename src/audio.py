@@ -0,0 +1,91 @@
+"""
+Audio preview of converted notes, as a mono 16 bits WAV file
+Every chord lasts the same time and fades out before the next one, so chords
+never overlap: each distinct chord is synthesized once, and the track is
+the concatenation of their samples, written in fixed-size chunks.
+"""
+import functools
+import math
+import sys
+import wave
+from array import array
+
+from src.notes import MusicNote
+from src.output import NotesWriter
+
+SAMPLE_RATE = 22050
+SAMPLE_WIDTH = 2 # bytes, 16 bits samples
+MAX_AMPLITUDE = 32767 * 0.8 # some headroom
+
+DEFAULT_NOTE_LENGTH = 0.25 # seconds per chord
+ATTACK_LENGTH = 0.005 # seconds
+RELEASE_LENGTH = 0.01 # seconds, down to silence before the next chord
+DECAY_RATE = 4.0 # exponential decay per second, a plucked string
+
+# Second harmonic level, a bit less dull than a pure sine
+HARMONIC_LEVEL = 0.3
+
+CHUNK_FRAMES = 64 * 1024
+CHORDS_CACHE_SIZE = 512
+
+@functools.lru_cache(maxsize=None)
+def envelope(frames):
+    """Amplitude envelope of a chord lasting frames samples"""
+    attack = max(int(ATTACK_LENGTH * SAMPLE_RATE), 1)
+    release = max(int(RELEASE_LENGTH * SAMPLE_RATE), 1)
+    return array('d', (
+        min(frame / attack, (frames - frame) / release, 1.0) * math.exp(-DECAY_RATE * frame / SAMPLE_RATE)
+        for frame in range(frames)
+    ))
+
+@functools.lru_cache(maxsize=CHORDS_CACHE_SIZE)
+def chord_samples(chord, frames):
+    """Little-endian 16 bits samples of a chord (tuple of MIDI notes), silence when empty"""
+    if not chord:
+        return bytes(frames * SAMPLE_WIDTH)
+
+    level = MAX_AMPLITUDE / (len(chord) * (1 + HARMONIC_LEVEL))
+    mix = [0.0] * frames
+    for note in chord:
+        step = 2 * math.pi * MusicNote.midi_to_frequency(note) / SAMPLE_RATE
+        mix = [
+            value + math.sin(step * frame) + HARMONIC_LEVEL * math.sin(2 * step * frame)
+            for frame, value in enumerate(mix)
+        ]
+    samples = array('h', (int(value * gain * level) for value, gain in zip(mix, envelope(frames))))
+    if sys.byteorder != 'little':
+        samples.byteswap()
+    return samples.tobytes()
+
+class WavWriter(NotesWriter):
+    """Synthesized notes, chords notes played together"""
+    binary = True
+
+    def __init__(self, out, note_naming=MusicNote.ENGLISH, transposition=0, stats=None, chords=False,
+                 note_length=DEFAULT_NOTE_LENGTH):
+        """Constructor, note_length is each chord duration in seconds"""
+        super().__init__(out, note_naming, transposition, stats, chords)
+        self.frames = max(int(note_length * SAMPLE_RATE), 1)
+        self.buffer = bytearray()
+        self.wav = wave.open(out, 'wb')
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(SAMPLE_WIDTH)
+        self.wav.setframerate(SAMPLE_RATE)
+
+    def write_block(self, block_notes):
+        for chord in self._transposed(block_notes):
+            self.buffer += chord_samples(tuple(chord), self.frames)
+            if len(self.buffer) >= CHUNK_FRAMES * SAMPLE_WIDTH:
+                self.flush()
+
+    def flush(self):
+        self.wav.writeframesraw(self.buffer)
+        self.buffer.clear()
+        self.out.flush()
+
+    def close(self):
+        # Frames count in the header is fixed when closing
+        self.wav.writeframes(self.buffer)
+        self.buffer.clear()
+        self.wav.close()
+        super().close()
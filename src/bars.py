@@ -0,0 +1,144 @@
+"""
+Bars index of tablatures
+Bars are the spans between the bar lines of each block. The index keeps
+where every block starts in the file (line index and byte offset), and the
+block and columns of every bar, so a range of bars is read and converted
+without going through the rest of the file. It's saved next to the
+tablature, as a hidden binary file, and rebuilt when the tablature changes.
+"""
+import os
+import struct
+import sys
+from array import array
+
+BARS_SEPARATOR = '-'
+BARS_EXT = '.bars'
+
+# Header, instrument strings notes, then the blocks line indexes and byte
+# offsets, and the bars blocks, start and end columns, little-endian
+BARS_MAGIC = b'T2NI'
+BARS_VERSION = 1
+# magic, version, parser version, strings count, instrument strings, blocks, bars, tablature size, tablature mtime
+BARS_HEADER = struct.Struct('<4sHHHHIIQq')
+ARR_OFFSET = 'Q'
+ARR_INDEX = 'I'
+
+def parse_bars(text):
+    """(start, end) bars numbers of a 'START-END' range, or of a single 'BAR'"""
+    start, separator, end = text.partition(BARS_SEPARATOR)
+    try:
+        start = int(start)
+        end = int(end) if separator else start
+    except ValueError:
+        raise ValueError(f"Bars '{text}' aren't like START{BARS_SEPARATOR}END") from None
+    if start < 1 or end < start:
+        raise ValueError(f"Bars '{text}' aren't a range of bars, numbered from 1")
+    return start, end
+
+def index_path(tab_file):
+    """Bars index file of a tablature, hidden so directories walks skip it"""
+    dir_name, base_name = os.path.split(tab_file)
+    return os.path.join(dir_name, f".{base_name}{BARS_EXT}")
+
+def lines_offsets(tab_file, lines_indexes):
+    """Byte offsets of some lines of a file, lines indexes being sorted"""
+    offsets = array(ARR_OFFSET)
+    wanted = iter(lines_indexes)
+    line_idx = next(wanted, None)
+    offset = 0
+    with open(tab_file, 'rb') as f:
+        # Same line ends as text files reading
+        for idx, line in enumerate(f.read().splitlines(keepends=True)):
+            if idx == line_idx:
+                offsets.append(offset)
+                line_idx = next(wanted, None)
+            offset += len(line)
+    return offsets
+
+class BarsIndex():
+    """Blocks positions and bars columns of a tablature"""
+
+    def __init__(self, strings_count, inst_strings, blocks_lines, blocks_offsets, bars, parser_version, stat):
+        """Constructor, bars are (block, start column, end column) tuples
+
+        stat is the tablature os.stat() result the index was built from.
+        """
+        self.strings_count = strings_count
+        self.inst_strings = tuple(inst_strings)
+        self.blocks_lines = array(ARR_INDEX, blocks_lines)
+        self.blocks_offsets = array(ARR_OFFSET, blocks_offsets)
+        self.bars = list(bars)
+        self.parser_version = parser_version
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+
+    def is_current(self, stat, parser_version):
+        """Was the index built from this tablature version ?"""
+        return (self.size, self.mtime_ns, self.parser_version) == (stat.st_size, stat.st_mtime_ns, parser_version)
+
+    def save(self, path):
+        """Write the index, atomically"""
+        arrays = [self.blocks_offsets, self.blocks_lines]
+        for field in range(3):
+            arrays.append(array(ARR_INDEX, (bar[field] for bar in self.bars)))
+
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(BARS_HEADER.pack(
+                BARS_MAGIC, BARS_VERSION, self.parser_version, self.strings_count, len(self.inst_strings),
+                len(self.blocks_lines), len(self.bars), self.size, self.mtime_ns,
+            ))
+            f.write(bytes(self.inst_strings))
+            for values in arrays:
+                if sys.byteorder != 'little':
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                values.tofile(f)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path):
+        """Index saved by save(), raises ValueError when it's not one"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < BARS_HEADER.size:
+            raise ValueError(f"'{path}' is not a bars index")
+        magic, version, parser_version, strings_count, inst_len, blocks_count, bars_count, size, mtime_ns = (
+            BARS_HEADER.unpack_from(data)
+        )
+        if magic != BARS_MAGIC or version != BARS_VERSION:
+            raise ValueError(f"'{path}' is not a bars index in version {BARS_VERSION}")
+
+        offset = BARS_HEADER.size
+        inst_strings = tuple(data[offset:offset+inst_len])
+        offset += inst_len
+
+        arrays = []
+        for typecode, count in (
+            (ARR_OFFSET, blocks_count),
+            (ARR_INDEX, blocks_count),
+            (ARR_INDEX, bars_count),
+            (ARR_INDEX, bars_count),
+            (ARR_INDEX, bars_count),
+        ):
+            values = array(typecode)
+            end = offset + count * values.itemsize
+            if end > len(data):
+                raise ValueError(f"'{path}' bars index is truncated")
+            values.frombytes(data[offset:end])
+            if sys.byteorder != 'little':
+                values.byteswap()
+            arrays.append(values)
+            offset = end
+        blocks_offsets, blocks_lines, bars_blocks, bars_starts, bars_ends = arrays
+
+        index = cls.__new__(cls)
+        index.strings_count = strings_count
+        index.inst_strings = inst_strings
+        index.blocks_lines = blocks_lines
+        index.blocks_offsets = blocks_offsets
+        index.bars = list(zip(bars_blocks, bars_starts, bars_ends))
+        index.parser_version = parser_version
+        index.size = size
+        index.mtime_ns = mtime_ns
+        return index
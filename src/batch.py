@@ -0,0 +1,68 @@
+"""
+Batch processing of many tablature files
+"""
+import concurrent.futures
+import functools
+import glob
+import os
+import time
+
+def expand_paths(paths):
+    """Expand files, directories and glob patterns into a list of files
+
+    Directories are walked recursively, hidden files are skipped.
+    Order of the given paths is kept, each directory content is sorted.
+    """
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(_walk_dir(path))
+        elif not os.path.exists(path) and glob.has_magic(path):
+            for match in sorted(glob.glob(path, recursive=True)):
+                files.extend(_walk_dir(match) if os.path.isdir(match) else [match])
+        else:
+            # Missing files are kept, conversion will report them
+            files.append(path)
+
+    return files
+
+def _walk_dir(dir_name):
+    """All the non hidden files of a directory tree"""
+    files = []
+    for root, dirs, names in os.walk(dir_name):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(names):
+            if not name.startswith('.'):
+                files.append(os.path.join(root, name))
+    return files
+
+def map_files(func, files, jobs=1):
+    """Apply func to each file, yield (file, result, wall time) in input order
+
+    With more than one job, files are spread over a process pool, so func must
+    be picklable (module level function or functools.partial of one).
+    A jobs value of 0 uses all the CPUs.
+    """
+    timed_func = functools.partial(_timed_call, func)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if jobs <= 1 or len(files) <= 1:
+        yield from _with_files(files, map(timed_func, files))
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(timed_func, files)
+        yield from _with_files(files, results)
+
+def _with_files(files, results):
+    """Attach file names to (result, elapsed) pairs"""
+    for file_name, (result, elapsed) in zip(files, results):
+        yield file_name, result, elapsed
+
+def _timed_call(func, file_name):
+    """Call func and measure its wall time"""
+    start = time.perf_counter()
+    result = func(file_name)
+    return result, time.perf_counter() - start
@@ -0,0 +1,162 @@
+"""
+On-disk cache of parsed tablatures
+Parsing doesn't depend on notes naming or transposition, so its result can be
+reused as long as the file content, the instrument and the parser don't change.
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+
+# Default location, following XDG conventions
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'tabs2notes',
+)
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024 # bytes
+
+CACHE_FILE_EXT = '.pickle'
+SIZE_FILE = 'size' # entries total size, shared by all the writing processes
+
+logger = logging.getLogger(__name__)
+
+# Cache directories a write failed in, warned about once per process
+_unwritable = set()
+
+class ParseCache():
+    """Parsed tablatures stored by content hash, with LRU eviction
+
+    Entries are files in the cache directory, their modification time is
+    bumped on each hit so the least recently used ones are evicted first when
+    the directory grows over max_size. Their total size is kept in a file of
+    the directory, so writers, worker processes included, don't scan it.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+        """Constructor"""
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def key(lines, inst_strings, parser_version):
+        """Cache key of a tablature content for an instrument, None when it's detected"""
+        instrument = 'auto' if inst_strings is None else ','.join(map(str, inst_strings))
+        digest = hashlib.sha256()
+        digest.update(f"{parser_version}:{instrument}\n".encode())
+        for line in lines:
+            digest.update(line.encode('utf-8', 'surrogateescape'))
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Cached value for key, None when missing or unreadable"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path) # most recently used
+        except OSError:
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError) as exc:
+            # Truncated, or pickled by another version of the code, overwritten on next put()
+            logger.warning("Ignoring unreadable cache entry '%s': %s", path, exc)
+            return None
+        return value
+
+    def put(self, key, value):
+        """Store value for key, evicting old entries if needed
+
+        The cache is optional, when it can't be written a warning is logged
+        and the value just isn't stored.
+        """
+        try:
+            self._put(key, value)
+        except OSError as exc:
+            if self.directory not in _unwritable:
+                _unwritable.add(self.directory)
+                logger.warning("Parse cache '%s' isn't writable, not caching: %s", self.directory, exc)
+
+    def _put(self, key, value):
+        """Store value for key, raises OSError"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            old_size = os.path.getsize(path) # overwritten entry
+        except OSError:
+            old_size = 0
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path) # atomic, concurrent writers are fine
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+        if self._add_size(os.path.getsize(path) - old_size) > self.max_size:
+            self._evict()
+
+    def clear(self):
+        """Remove all the cache entries"""
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+
+    def _evict(self):
+        """Remove least recently used entries until we fit in max_size"""
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, _, entry_size in entries)
+
+        for _, path, entry_size in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue # already removed by another process
+            size -= entry_size
+
+        self._store_size(size)
+
+    def _add_size(self, delta):
+        """Add delta to the stored entries size, return the new total
+
+        The total is rebuilt from the entries when it's missing. Concurrent
+        writers may lose an update, each eviction stores the exact size again.
+        """
+        try:
+            with open(os.path.join(self.directory, SIZE_FILE)) as f:
+                size = int(f.read()) + delta
+        except (OSError, ValueError):
+            size = sum(entry_size for _, _, entry_size in self._entries()) # delta included
+        self._store_size(size)
+        return size
+
+    def _store_size(self, size):
+        """Write the entries size, atomically"""
+        path = os.path.join(self.directory, SIZE_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(size))
+        os.replace(tmp_path, path)
+
+    def _entries(self):
+        """(mtime, path, size) of all the cache entries"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(CACHE_FILE_EXT):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _path(self, key):
+        """Cache entry file path"""
+        return os.path.join(self.directory, f"{key}{CACHE_FILE_EXT}")
@@ -0,0 +1,82 @@
+"""
+Chord naming
+Chords are recognized from their pitch classes set, as a 12 bits mask, looked
+up in a table of all the 4096 masks computed once at import.
+"""
+from src.notes import NOTES_SEQUENCE, SCALE_SIZE, IDX_ENG
+
+# Chord types: suffix and intervals from the root, by preference order when a
+# set of notes has several readings (C6 is also Am7)
+CHORD_TYPES = (
+    ('', (0, 4, 7)),
+    ('m', (0, 3, 7)),
+    ('5', (0, 7)),
+    ('7', (0, 4, 7, 10)),
+    ('maj7', (0, 4, 7, 11)),
+    ('m7', (0, 3, 7, 10)),
+    ('sus4', (0, 5, 7)),
+    ('sus2', (0, 2, 7)),
+    ('dim', (0, 3, 6)),
+    ('aug', (0, 4, 8)),
+    ('7sus4', (0, 5, 7, 10)),
+    ('m7b5', (0, 3, 6, 10)),
+    ('dim7', (0, 3, 6, 9)),
+    ('mmaj7', (0, 3, 7, 11)),
+    ('6', (0, 4, 7, 9)),
+    ('m6', (0, 3, 7, 9)),
+    ('add9', (0, 2, 4, 7)),
+    ('madd9', (0, 2, 3, 7)),
+    ('9', (0, 2, 4, 7, 10)),
+    ('maj9', (0, 2, 4, 7, 11)),
+    ('m9', (0, 2, 3, 7, 10)),
+    # Guitar voicings often drop the fifth
+    ('7', (0, 4, 10)),
+    ('maj7', (0, 4, 11)),
+    ('m7', (0, 3, 10)),
+)
+
+MASKS_COUNT = 1 << SCALE_SIZE
+
+def pitch_classes_mask(notes):
+    """12 bits mask of the pitch classes of MIDI notes"""
+    mask = 0
+    for note in notes:
+        mask |= 1 << (note % SCALE_SIZE)
+    return mask
+
+def _build_table():
+    """Candidate (root, suffix) readings of every mask, preferred first"""
+    table = [() for _ in range(MASKS_COUNT)]
+    for suffix, intervals in CHORD_TYPES:
+        for root in range(SCALE_SIZE):
+            mask = pitch_classes_mask(root + interval for interval in intervals)
+            table[mask] += ((root, suffix),)
+    return tuple(table)
+
+# Index is the pitch classes mask
+CHORDS_TABLE = _build_table()
+
+def chord_name(notes, lang_idx=IDX_ENG):
+    """Name of a chord given as MIDI notes, None if it's not a known chord
+
+    Inversions get the bass note after a slash, like C/E.
+    """
+    if len(notes) < 2:
+        return None
+
+    candidates = CHORDS_TABLE[pitch_classes_mask(notes)]
+    if not candidates:
+        return None
+
+    # A reading rooted on the bass note is preferred over an inversion
+    bass = min(notes) % SCALE_SIZE
+    root, suffix = candidates[0]
+    for candidate_root, candidate_suffix in candidates:
+        if candidate_root == bass:
+            root, suffix = candidate_root, candidate_suffix
+            break
+
+    name = f"{NOTES_SEQUENCE[root][lang_idx]}{suffix}"
+    if root != bass:
+        name += f"/{NOTES_SEQUENCE[bass][lang_idx]}"
+    return name
@@ -0,0 +1,188 @@
+"""
+Corpus statistics
+Each tablature is mapped to fixed-size counters (pitches, pitch classes,
+frets per string) plus chords and keys counts. Aggregates of any files sets
+merge by addition, so a corpus is reduced from the workers results and a
+rerun only maps the files that aren't counted yet.
+"""
+import collections
+import csv
+import json
+import os
+import statistics
+from array import array
+
+from src.chords import chord_name
+from src.notes import MusicNote, MIDI_NOTES_COUNT, SCALE_SIZE, NOTES_SEQUENCE, IDX_ENG
+from src.tablature import Tablature, BINARY_EXT
+
+STATS_VERSION = 1
+DEFAULT_STATS_FILE = 'corpus-stats.json'
+
+# Frets x strings matrix size, higher frets and strings share the last bins
+FRETS_BINS = 25
+STRINGS_BINS = 8
+
+# Krumhansl-Kessler key profiles, from C
+MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+KEYS_PROFILES = (
+    ('major', MAJOR_PROFILE),
+    ('minor', MINOR_PROFILE),
+)
+
+def estimate_key(pitch_classes):
+    """Most likely key of a pitch classes histogram, like 'E minor', None if it can't tell"""
+    best_key = None
+    best_score = None
+    for tonic in range(SCALE_SIZE):
+        # Histogram as seen from this tonic
+        degrees = [pitch_classes[(tonic + degree) % SCALE_SIZE] for degree in range(SCALE_SIZE)]
+        for mode, profile in KEYS_PROFILES:
+            try:
+                score = statistics.correlation(degrees, profile)
+            except statistics.StatisticsError: # no or a single pitch class
+                return None
+            if best_score is None or score > best_score:
+                best_key = f"{NOTES_SEQUENCE[tonic][IDX_ENG]} {mode}"
+                best_score = score
+    return best_key
+
+class CorpusStats():
+    """Mergeable statistics of tablatures files"""
+
+    def __init__(self,):
+        """Constructor, empty aggregates"""
+        self.files = {} # path -> {'notes', 'low', 'high', 'key'}
+        self.pitches = array('Q', [0]) * MIDI_NOTES_COUNT
+        self.pitch_classes = array('Q', [0]) * SCALE_SIZE
+        self.frets = array('Q', [0]) * (STRINGS_BINS * FRETS_BINS) # string major
+        self.chords = collections.Counter()
+        self.keys = collections.Counter()
+
+    def add_tablature(self, file_name, tab):
+        """Count a parsed tablature, raises ValueError when notes are out of the MIDI range"""
+        midi_notes = tab.midi_notes()
+
+        pitches = collections.Counter(note for block_notes in midi_notes for chord in block_notes for note in chord)
+        if pitches and (min(pitches) < 0 or max(pitches) >= MIDI_NOTES_COUNT):
+            raise ValueError(f"Notes {min(pitches)}..{max(pitches)} are out of the MIDI range")
+        pitch_classes = [0] * SCALE_SIZE
+        for note, count in pitches.items():
+            self.pitches[note] += count
+            pitch_classes[note % SCALE_SIZE] += count
+        for pitch_class, count in enumerate(pitch_classes):
+            self.pitch_classes[pitch_class] += count
+
+        for block in tab.extracted_frets:
+            for (string, fret), count in collections.Counter(zip(block.strings, block.frets)).items():
+                string = min(string, STRINGS_BINS - 1)
+                self.frets[string * FRETS_BINS + min(fret, FRETS_BINS - 1)] += count
+
+        for block_notes in midi_notes:
+            for chord in block_notes:
+                if len(chord) > 1:
+                    name = chord_name(chord, IDX_ENG)
+                    if name is not None:
+                        self.chords[name] += 1
+
+        key = estimate_key(pitch_classes)
+        if key is not None:
+            self.keys[key] += 1
+        self.files[file_name] = {
+            'notes': sum(pitch_classes),
+            'low': min(pitches) if pitches else None,
+            'high': max(pitches) if pitches else None,
+            'key': key,
+        }
+
+    def merge(self, other):
+        """Add the aggregates of other files"""
+        counted = self.files.keys() & other.files.keys()
+        if counted:
+            raise ValueError(f"{len(counted)} files would be counted twice, like '{min(counted)}'")
+
+        self.files.update(other.files)
+        for mine, theirs in (
+            (self.pitches, other.pitches),
+            (self.pitch_classes, other.pitch_classes),
+            (self.frets, other.frets),
+        ):
+            for idx, count in enumerate(theirs):
+                mine[idx] += count
+        self.chords.update(other.chords)
+        self.keys.update(other.keys)
+
+    def to_dict(self,):
+        """JSON friendly aggregates"""
+        return {
+            'version': STATS_VERSION,
+            'files': self.files,
+            'pitches': list(self.pitches),
+            'pitch_classes': list(self.pitch_classes),
+            'frets': [list(self.frets[string * FRETS_BINS:(string + 1) * FRETS_BINS]) for string in range(STRINGS_BINS)],
+            'chords': dict(self.chords.most_common()),
+            'keys': dict(self.keys.most_common()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Aggregates back from to_dict()"""
+        if data.get('version') != STATS_VERSION:
+            raise ValueError(f"Statistics version {data.get('version')} isn't supported")
+        corpus = cls()
+        corpus.files = data['files']
+        corpus.pitches = array('Q', data['pitches'])
+        corpus.pitch_classes = array('Q', data['pitch_classes'])
+        corpus.frets = array('Q', [count for string_frets in data['frets'] for count in string_frets])
+        corpus.chords = collections.Counter(data['chords'])
+        corpus.keys = collections.Counter(data['keys'])
+        return corpus
+
+    def save(self, file_name):
+        """Write the aggregates as JSON, atomically"""
+        tmp_file = f"{file_name}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_file, file_name)
+
+    @classmethod
+    def load(cls, file_name):
+        """Aggregates saved by save()"""
+        with open(file_name) as f:
+            return cls.from_dict(json.load(f))
+
+    def write_csv(self, out):
+        """Write the aggregates as (section, name, value) rows"""
+        rows = csv.writer(out)
+        rows.writerow(['section', 'name', 'value'])
+        for note, count in enumerate(self.pitches):
+            if count:
+                rows.writerow(['pitch', MusicNote.midi_to_name(note), count])
+        for pitch_class, count in enumerate(self.pitch_classes):
+            rows.writerow(['pitch_class', NOTES_SEQUENCE[pitch_class][IDX_ENG], count])
+        for idx, count in enumerate(self.frets):
+            if count:
+                string, fret = divmod(idx, FRETS_BINS)
+                rows.writerow(['fret', f"{string + 1}:{fret}", count])
+        for name, count in self.chords.most_common():
+            rows.writerow(['chord', name, count])
+        for name, count in self.keys.most_common():
+            rows.writerow(['key', name, count])
+        for file_name, summary in sorted(self.files.items()):
+            if summary['notes']:
+                low, high = MusicNote.midi_to_names([summary['low'], summary['high']])
+                rows.writerow(['range', file_name, f"{low}:{high}"])
+
+def file_stats(tab_file, inst_strings):
+    """Statistics of a single file, in a worker process, return (stats, error message)"""
+    try:
+        if tab_file.endswith(BINARY_EXT):
+            tab = Tablature.load(tab_file, inst_strings=inst_strings)
+        else:
+            tab = Tablature(tab_file, inst_strings)
+        corpus = CorpusStats()
+        corpus.add_tablature(tab_file, tab)
+    except (Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature, ValueError) as exc:
+        return None, str(exc)
+    return corpus, None
@@ -0,0 +1,257 @@
+"""
+Near-duplicate tablatures detection
+Each file melody is turned into interval shingles, so spacing, line widths
+and transposition don't matter, and summarized by a MinHash signature: the
+share of equal signature values estimates the Jaccard similarity of two
+shingles sets. Signatures are hashed by bands into buckets (locality-sensitive
+hashing), files sharing a bucket are the only pairs ever compared. Signatures
+and buckets are kept in an SQLite database, updated incrementally, so a new
+file is checked against the corpus with a few indexed lookups.
+"""
+import hashlib
+import os
+import sys
+from array import array
+
+from src.riff import melody, intervals_grams, open_database, tuning_key
+from src.tablature import Tablature, BINARY_EXT
+
+SHINGLE_SIZE = 4 # intervals per shingle
+
+# Signature of BANDS * ROWS values, pairs become candidates around
+# (1 / BANDS) ** (1 / ROWS) = 0.42 similarity, and 0.6 similar pairs with
+# a 99% chance
+SIGNATURE_SIZE = 128
+BANDS = 32
+ROWS = SIGNATURE_SIZE // BANDS
+
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_SIGNATURES_FILE = '.tabs2notes-signatures.sqlite' # hidden, so directories walks skip it
+
+HASH_MASK = (1 << 64) - 1
+BIN_SHIFT = 64 - (SIGNATURE_SIZE - 1).bit_length()
+
+# Databases of another schema version are rebuilt
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    parser_version INTEGER NOT NULL,
+    tuning TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    file_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets (band, bucket);
+CREATE INDEX IF NOT EXISTS buckets_file ON buckets (file_id);
+"""
+
+def mix(value):
+    """64 bits hash of an integer (splitmix64 finalizer)"""
+    value = (value + 0x9E3779B97F4A7C15) & HASH_MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+    return value ^ (value >> 31)
+
+def shingles(midi_notes):
+    """Transposition invariant interval shingles of a file melody"""
+    pitches, _ = melody(midi_notes)
+    return set(intervals_grams(pitches, SHINGLE_SIZE))
+
+def signature(file_shingles):
+    """MinHash signature of a shingles set, None when it's empty
+
+    One permutation hashing: each shingle is hashed once, the hash top bits
+    pick a signature value and the lowest hash of each value is kept, so the
+    cost is linear in the shingles count. Values no shingle fell in borrow
+    a filled one, probed in a pseudo-random order of their own (optimal
+    densification), so signatures of similar sets still agree.
+    """
+    if not file_shingles:
+        return None
+
+    values = [None] * SIGNATURE_SIZE
+    for shingle in file_shingles:
+        hashed = mix(shingle)
+        idx = hashed >> BIN_SHIFT
+        if values[idx] is None or hashed < values[idx]:
+            values[idx] = hashed
+
+    result = array('Q', [0]) * SIGNATURE_SIZE
+    for idx, value in enumerate(values):
+        attempt = 0
+        while value is None:
+            attempt += 1
+            value = values[mix(idx * SIGNATURE_SIZE + attempt) % SIGNATURE_SIZE]
+        result[idx] = value
+    return result
+
+def similarity(signature1, signature2):
+    """Estimated Jaccard similarity of the shingles sets of two signatures"""
+    return sum(value1 == value2 for value1, value2 in zip(signature1, signature2)) / SIGNATURE_SIZE
+
+def bands_buckets(file_signature):
+    """Bucket of each band of a signature, as signed 64 bits integers for SQLite"""
+    buckets = []
+    for band in range(BANDS):
+        rows = file_signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(_signature_blob(rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+def _signature_blob(file_signature):
+    """Little-endian signature bytes"""
+    if sys.byteorder != 'little':
+        file_signature = array('Q', file_signature)
+        file_signature.byteswap()
+    return file_signature.tobytes()
+
+def _blob_signature(blob):
+    """Signature back from its bytes"""
+    file_signature = array('Q')
+    file_signature.frombytes(blob)
+    if sys.byteorder != 'little':
+        file_signature.byteswap()
+    return file_signature
+
+class SignaturesIndex():
+    """Persistent MinHash signatures, bucketed by LSH bands"""
+
+    def __init__(self, index_file=DEFAULT_SIGNATURES_FILE):
+        """Constructor"""
+        self.db = open_database(index_file, SCHEMA, SCHEMA_VERSION)
+
+    def close(self):
+        """Commit and close the database"""
+        self.db.commit()
+        self.db.close()
+
+    def is_current(self, path, stat, inst_strings):
+        """Is the file signature already stored in this version, by this parser, with this instrument ?"""
+        row = self.db.execute(
+            "SELECT mtime_ns, size, parser_version, tuning FROM files WHERE path = ?", (path,),
+        ).fetchone()
+        return row is not None and row == (
+            stat.st_mtime_ns, stat.st_size, Tablature.PARSER_VERSION, tuning_key(inst_strings),
+        )
+
+    def add_file(self, path, stat, file_signature, inst_strings):
+        """Store (or replace) a file signature, computed with an instrument"""
+        self.remove_file(path)
+        cursor = self.db.execute(
+            "INSERT INTO files (path, mtime_ns, size, parser_version, tuning, signature) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                path, stat.st_mtime_ns, stat.st_size, Tablature.PARSER_VERSION, tuning_key(inst_strings),
+                _signature_blob(file_signature),
+            ),
+        )
+        file_id = cursor.lastrowid
+        self.db.executemany(
+            "INSERT INTO buckets (band, bucket, file_id) VALUES (?, ?, ?)",
+            ((band, bucket, file_id) for band, bucket in enumerate(bands_buckets(file_signature))),
+        )
+
+    def remove_file(self, path):
+        """Drop a file signature"""
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self.db.execute("DELETE FROM buckets WHERE file_id = ?", row)
+        self.db.execute("DELETE FROM files WHERE id = ?", row)
+
+    def prune(self):
+        """Drop the files that don't exist anymore, return their paths"""
+        missing = [path for path, in self.db.execute("SELECT path FROM files") if not os.path.exists(path)]
+        for path in missing:
+            self.remove_file(path)
+        return missing
+
+    def files_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def _signature(self, file_id):
+        """Stored signature and path of a file"""
+        path, blob = self.db.execute("SELECT path, signature FROM files WHERE id = ?", (file_id,)).fetchone()
+        return path, _blob_signature(blob)
+
+    def query(self, file_signature, threshold=DEFAULT_THRESHOLD):
+        """Stored files similar to a signature, as (similarity, path), most similar first"""
+        candidates = set()
+        for band, bucket in enumerate(bands_buckets(file_signature)):
+            candidates.update(
+                file_id
+                for file_id, in self.db.execute(
+                    "SELECT file_id FROM buckets WHERE band = ? AND bucket = ?", (band, bucket),
+                )
+            )
+
+        results = []
+        for file_id in candidates:
+            path, other = self._signature(file_id)
+            score = similarity(file_signature, other)
+            if score >= threshold:
+                results.append((score, path))
+        results.sort(key=lambda result: (-result[0], result[1]))
+        return results
+
+    def clusters(self, threshold=DEFAULT_THRESHOLD):
+        """Groups of near-duplicate stored files, as sorted paths lists
+
+        Only files sharing a bucket are compared, each with a file of every
+        group already met in that bucket, and similar pairs are joined
+        transitively, so identical files don't cost a comparison per pair.
+        """
+        parents = {}
+
+        def root(file_id):
+            while parents.setdefault(file_id, file_id) != file_id:
+                parents[file_id] = parents[parents[file_id]] # path halving
+                file_id = parents[file_id]
+            return file_id
+
+        signatures = {}
+        compared = set()
+        rows = self.db.execute(
+            "SELECT GROUP_CONCAT(file_id) FROM buckets GROUP BY band, bucket HAVING COUNT(*) > 1"
+        )
+        for file_ids, in rows:
+            representatives = [] # a file per group
+            for file_id in sorted(map(int, file_ids.split(','))):
+                if file_id not in signatures:
+                    signatures[file_id] = self._signature(file_id)
+                for representative in representatives:
+                    if root(representative) == root(file_id):
+                        break
+                    if (representative, file_id) in compared:
+                        continue
+                    compared.add((representative, file_id))
+                    if similarity(signatures[representative][1], signatures[file_id][1]) >= threshold:
+                        parents[root(file_id)] = root(representative)
+                        break
+                else:
+                    representatives.append(file_id)
+
+        groups = {}
+        for file_id in parents:
+            groups.setdefault(root(file_id), []).append(signatures[file_id][0])
+        return sorted(sorted(paths) for paths in groups.values() if len(paths) > 1)
+
+def file_signature(tab_file, inst_strings):
+    """Signature of a single file, in a worker process, return (signature, error message)"""
+    try:
+        if tab_file.endswith(BINARY_EXT):
+            tab = Tablature.load(tab_file, inst_strings=inst_strings)
+        else:
+            tab = Tablature(tab_file, inst_strings)
+        result = signature(shingles(tab.midi_notes()))
+    except (Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature, ValueError) as exc:
+        return None, str(exc)
+    if result is None:
+        return None, f"Too few notes to compare, at least {SHINGLE_SIZE + 1} are needed"
+    return result, None
@@ -0,0 +1,232 @@
+"""
+Notes to tablature
+Every chord can be played at a few (string, fret) positions, the fingering
+is the path through these positions with the least hand movement and
+stretch. Chords notes are assigned jointly, each chord fingering and hand
+position being a state of a Viterbi search: time is linear in the notes
+count, with a bounded count of states per chord.
+"""
+import functools
+import itertools
+
+from src.instruments import notes_positions, MAX_FRET
+from src.notes import MusicNote, NOTES_SEQUENCE, SCALE_SIZE, IDX_ENG
+from src.tablature import TAB_CHAR, TAB_CHAR_MIN_OCCURENCE
+
+MAX_STRETCH = 4 # frets between the index and the pinky
+MAX_STATES = 64 # positions kept per chord, the least stretched ones
+STATES_CACHE_SIZE = 4096 # distinct chords, pieces repeat them a lot
+
+# Costs, in frets of hand movement (moving between open strings only chords is free)
+STRETCH_COST = 0.5 # per fret between the lowest and highest fretted notes
+HEIGHT_COST = 0.05 # per fret, lower positions are easier to read and play
+
+LINE_WIDTH = 80
+LINE_START = '|'
+CHORD_SPACING = 2
+MIN_LINE_LENGTH = 3 * (TAB_CHAR_MIN_OCCURENCE + 1) # short lines must still look like tablature lines
+CHORD_SEPARATOR = '+'
+
+def parse_chords(text):
+    """Chords of MIDI notes from notes names or MIDI numbers
+
+    Chords are separated by spaces, their notes joined by '+', as in the text
+    output: "E2 A2+E3 G2".
+    """
+    chords = []
+    for token in text.split():
+        notes = token.split(CHORD_SEPARATOR)
+        chord = [int(note) if note.isdigit() else note for note in notes]
+        if all(isinstance(note, int) for note in chord):
+            for note in chord:
+                MusicNote.validate_midi_index(note)
+        else:
+            chord = MusicNote.names_to_midi(notes)
+        chords.append(chord)
+    return chords
+
+def chord_states(chord, inst_strings, max_fret=MAX_FRET):
+    """Ways to play a chord, as ((string, fret), ...) tuples with a string per note
+
+    Strings are indexes in inst_strings (low to high). Raises ValueError when
+    the chord can't be played.
+    """
+    positions_table = notes_positions(tuple(inst_strings), max_fret)
+    chord_positions = []
+    for note in chord:
+        positions = positions_table.get(note)
+        if not positions:
+            raise ValueError(f"{MusicNote.midi_to_name(note)} can't be played on this instrument")
+        chord_positions.append(positions)
+
+    states = []
+    for state in itertools.product(*chord_positions):
+        if len({string for string, _ in state}) != len(state):
+            continue
+        if stretch(state) <= MAX_STRETCH:
+            states.append(state)
+    if not states:
+        names = " ".join(MusicNote.midi_to_names(chord))
+        raise ValueError(f"Chord {names} can't be played on this instrument")
+
+    states.sort(key=static_cost)
+    return states[:MAX_STATES]
+
+@functools.lru_cache(maxsize=STATES_CACHE_SIZE)
+def scored_states(chord, inst_strings, max_fret=MAX_FRET):
+    """States of a chord (tuple of MIDI notes), a state per possible hand position
+
+    Returns (fingerings, hand positions, static costs) lists.
+    """
+    fingerings = []
+    positions = []
+    costs = []
+    for state in chord_states(chord, inst_strings, max_fret):
+        cost = static_cost(state)
+        for position in hand_positions(state):
+            fingerings.append(state)
+            positions.append(position)
+            costs.append(cost)
+    return fingerings, positions, costs
+
+def fretted(state):
+    """Frets pressed by the hand, open strings aside"""
+    return [fret for _, fret in state if fret]
+
+def stretch(state):
+    """Frets between the lowest and highest fretted notes"""
+    frets = fretted(state)
+    return max(frets) - min(frets) if frets else 0
+
+def hand_positions(state):
+    """Where the index finger can be, the hand covering MAX_STRETCH frets after it
+
+    A single None when it doesn't matter (open strings only).
+    """
+    frets = fretted(state)
+    if not frets:
+        return [None]
+    return list(range(max(max(frets) - MAX_STRETCH, 1), min(frets) + 1))
+
+def static_cost(state):
+    """Cost of playing a chord, whatever comes before"""
+    frets = fretted(state)
+    return STRETCH_COST * stretch(state) + HEIGHT_COST * sum(frets) / max(len(frets), 1)
+
+def fingering(chords, inst_strings, max_fret=MAX_FRET):
+    """Best positions of each chord of MIDI notes, as ((string, fret), ...) tuples"""
+    # Viterbi: cheapest path cost to each state of the current chord, and
+    # back pointers to rebuild it
+    steps = [scored_states(tuple(chord), tuple(inst_strings), max_fret) for chord in chords]
+    if not steps:
+        return []
+
+    costs = steps[0][2]
+    back_pointers = []
+    for (_, from_positions, _), (_, positions, static_costs) in zip(steps, steps[1:]):
+        # Moving only depends on the hand position, keep the cheapest state of each
+        best_by_position = {}
+        for idx, position in enumerate(from_positions):
+            if position not in best_by_position or costs[idx] < costs[best_by_position[position]]:
+                best_by_position[position] = idx
+        anywhere = min((costs[idx], idx) for idx in best_by_position.values())
+        open_only = best_by_position.pop(None, None)
+
+        # Cheapest way to get to each hand position, a fret of movement
+        # costing 1: a pass up the neck then a pass down
+        arrivals = {None: anywhere}
+        if best_by_position:
+            low = min(min(best_by_position), min(position or max_fret for position in positions))
+            high = max(max(best_by_position), max(position or 0 for position in positions))
+            arrival = (float('inf'), None)
+            span = []
+            for position in range(low, high + 1):
+                idx = best_by_position.get(position)
+                arrival = min(arrival, (costs[idx], idx)) if idx is not None else arrival
+                span.append(arrival)
+                arrival = (arrival[0] + 1, arrival[1])
+            arrival = (float('inf'), None)
+            for offset in range(high - low, -1, -1):
+                arrival = min(arrival, span[offset])
+                arrivals[low + offset] = arrival
+                arrival = (arrival[0] + 1, arrival[1])
+        if open_only is not None:
+            # Open strings let the hand go anywhere
+            for position in arrivals:
+                arrivals[position] = min(arrivals[position], (costs[open_only], open_only))
+        for position in positions:
+            if position not in arrivals: # no fretted state before
+                arrivals[position] = anywhere
+
+        step_pointers = []
+        step_costs = []
+        for position, state_cost in zip(positions, static_costs):
+            cost, idx = arrivals[position]
+            step_pointers.append(idx)
+            step_costs.append(cost + state_cost)
+        back_pointers.append(step_pointers)
+        costs = step_costs
+
+    state_idx = min(range(len(costs)), key=costs.__getitem__)
+    path = [steps[-1][0][state_idx]]
+    for step_idx in range(len(back_pointers) - 1, -1, -1):
+        state_idx = back_pointers[step_idx][state_idx]
+        path.append(steps[step_idx][0][state_idx])
+    path.reverse()
+    return path
+
+def strings_names(inst_strings):
+    """Lines names, in tablature lines order (high to low)
+
+    Names are lowercase, but the lowest string when another one has the same
+    name (E on a guitar).
+    """
+    names = [NOTES_SEQUENCE[base % SCALE_SIZE][IDX_ENG].lower() for base in inst_strings]
+    if names.count(names[0]) > 1:
+        names[0] = names[0].upper()
+    return names[::-1]
+
+def tablature_lines(positions, inst_strings, width=LINE_WIDTH):
+    """Text blocks of tablature lines, wrapped at width columns"""
+    names = strings_names(inst_strings)
+    name_width = max(map(len, names))
+    strings_count = len(inst_strings)
+
+    blocks = []
+    lines = None
+    line_width = 0
+    for state in positions:
+        chord_width = max(len(str(fret)) for _, fret in state)
+        if lines is None or line_width + chord_width + CHORD_SPACING > width:
+            lines = [[TAB_CHAR * CHORD_SPACING] for _ in range(strings_count)]
+            blocks.append(lines)
+            line_width = CHORD_SPACING
+        line_width += chord_width + CHORD_SPACING
+
+        frets = {strings_count - 1 - string: str(fret) for string, fret in state}
+        for line_idx, line in enumerate(lines):
+            fret = frets.get(line_idx, '')
+            line.append(fret + TAB_CHAR * (chord_width - len(fret) + CHORD_SPACING))
+
+    return [
+        [
+            f"{name:<{name_width}}{LINE_START}{''.join(line).ljust(MIN_LINE_LENGTH, TAB_CHAR)}{LINE_START}"
+            for name, line in zip(names, lines)
+        ]
+        for lines in blocks
+    ]
+
+def notes_to_tab(blocks_chords, inst_strings, width=LINE_WIDTH, max_fret=MAX_FRET):
+    """Tablature text of blocks of chords of MIDI notes
+
+    The fingering is searched over the whole piece, then each block starts
+    new tablature lines.
+    """
+    chords = [chord for block_chords in blocks_chords for chord in block_chords if chord]
+    positions = iter(fingering(chords, inst_strings, max_fret))
+
+    text_blocks = []
+    for block_chords in blocks_chords:
+        block_positions = [next(positions) for chord in block_chords if chord]
+        text_blocks.extend(tablature_lines(block_positions, inst_strings, width))
+    return "\n\n".join("\n".join(lines) for lines in text_blocks) + "\n"
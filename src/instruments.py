@@ -0,0 +1,112 @@
+"""
+Instruments registry
+A tuning is the strings MIDI notes, low to high (in strings order, so a
+ukulele's re-entrant G comes first). Auto-detection picks the registered
+tuning with the tablature strings count whose names best match the lines
+prefixes (e|, B|, g-...).
+"""
+import functools
+import re
+
+from src.notes import MusicNote, NOTES_SEQUENCE, SCALE_SIZE, IDX_ENG
+
+# Picked while parsing
+INST_AUTO = 'auto'
+
+INST_BASS4 = 'bass4'
+INST_BASS5 = 'bass5'
+INST_BASS6 = 'bass6'
+INST_GUITAR6 = 'guitar6'
+INST_GUITAR6_DROP_D = 'guitar6-dropd'
+INST_GUITAR6_DADGAD = 'guitar6-dadgad'
+INST_GUITAR7 = 'guitar7'
+INST_GUITAR8 = 'guitar8'
+INST_UKULELE = 'ukulele'
+
+# By preference order, when the strings names don't tell
+INSTRUMENTS = {
+    INST_BASS4: (28, 33, 38, 43),
+    INST_GUITAR6: (40, 45, 50, 55, 59, 64),
+    INST_BASS5: (23, 28, 33, 38, 43),
+    INST_BASS6: (23, 28, 33, 38, 43, 48),
+    INST_GUITAR6_DROP_D: (38, 45, 50, 55, 59, 64),
+    INST_GUITAR6_DADGAD: (38, 45, 50, 55, 57, 62),
+    INST_GUITAR7: (35, 40, 45, 50, 55, 59, 64),
+    INST_GUITAR8: (30, 35, 40, 45, 50, 55, 59, 64),
+    INST_UKULELE: (67, 60, 64, 69),
+}
+
+INST_CHOICES = list(INSTRUMENTS)
+
+MAX_FRET = 24
+
+TUNING_SEPARATOR = ','
+
+# String name at the start of a tablature line: 'e|', 'Bb|', 'g-', 'D:'
+RE_STRING_NAME = re.compile(r"^([A-Ga-g])([#b]?)\s*[|:\-]")
+
+NOTES_LETTERS = {
+    letter: pitch_class for pitch_class, (letter, *_) in enumerate(NOTES_SEQUENCE) if len(letter) == 1
+}
+
+def parse_tuning(text):
+    """Tuning from strings notes names, low to high, like 'D2,A2,D3,G3'"""
+    names = text.replace(TUNING_SEPARATOR, ' ').split()
+    if not names:
+        raise ValueError("Tuning needs at least a string")
+    return tuple(MusicNote.names_to_midi(names))
+
+@functools.lru_cache(maxsize=None)
+def frets_table(inst_strings, max_fret=MAX_FRET):
+    """MIDI note of each string and fret, as table[string][fret], strings low to high"""
+    return tuple(tuple(base + fret for fret in range(max_fret + 1)) for base in inst_strings)
+
+@functools.lru_cache(maxsize=None)
+def notes_positions(inst_strings, max_fret=MAX_FRET):
+    """(string, fret) positions of each MIDI note an instrument can play"""
+    positions = {}
+    for string, frets in enumerate(frets_table(inst_strings, max_fret)):
+        for fret, note in enumerate(frets):
+            positions.setdefault(note, []).append((string, fret))
+    return {note: tuple(note_positions) for note, note_positions in positions.items()}
+
+# Registered tunings tables are computed once at import
+for _inst_strings in INSTRUMENTS.values():
+    notes_positions(_inst_strings)
+
+def string_pitch_class(line):
+    """Pitch class of a tablature line string name, None without a name"""
+    match = RE_STRING_NAME.match(line)
+    if match is None:
+        return None
+    letter, accidental = match.groups()
+    shift = {'#': 1, 'b': -1}.get(accidental, 0)
+    return (NOTES_LETTERS[letter.upper()] + shift) % SCALE_SIZE
+
+def detect_instrument(block_lines):
+    """(name, tuning) of the registered instrument best matching a block lines
+
+    Lines are in tablature order (high to low). None when no instrument has
+    that strings count.
+    """
+    names = [string_pitch_class(line) for line in block_lines]
+    best = None
+    best_score = -1
+    for name, inst_strings in INSTRUMENTS.items():
+        if len(inst_strings) != len(block_lines):
+            continue
+        score = sum(
+            pitch_class == base % SCALE_SIZE
+            for pitch_class, base in zip(names, reversed(inst_strings))
+        )
+        if score > best_score:
+            best = name, inst_strings
+            best_score = score
+    return best
+
+def instrument_name(inst_strings):
+    """Registry name of a tuning, or its notes names"""
+    for name, registered in INSTRUMENTS.items():
+        if registered == tuple(inst_strings):
+            return name
+    return TUNING_SEPARATOR.join(MusicNote.midi_to_names(inst_strings, IDX_ENG))
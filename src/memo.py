@@ -0,0 +1,65 @@
+"""
+Block-level memoization
+Songs repeat verses and choruses verbatim, and many files are near copies of
+each other, so identical blocks are parsed and converted once per run.
+"""
+import collections
+
+DEFAULT_MAX_BLOCKS = 4096
+
+class BlockMemo():
+    """LRU memo of blocks frets and MIDI notes
+
+    Keys are (block string lines, instrument strings) tuples, so only blocks
+    with the very same text on the same instrument share results. Entries
+    are [FretsBlock, MIDI notes or None]. Memoized objects are shared, they
+    must not be modified.
+    """
+
+    def __init__(self, max_blocks=DEFAULT_MAX_BLOCKS):
+        """Constructor"""
+        self.max_blocks = max_blocks
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(block_lines, inst_strings):
+        """Memo key of a block"""
+        return (tuple(block_lines), tuple(inst_strings))
+
+    def get(self, key):
+        """Entry of a key, None if not memoized yet"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, frets_block):
+        """Memoize a block frets, return its entry"""
+        entry = [frets_block, None]
+        self.entries[key] = entry
+        if len(self.entries) > self.max_blocks:
+            self.entries.popitem(last=False)
+        return entry
+
+    def peek(self, key):
+        """Entry of a key without counting nor reordering"""
+        return self.entries.get(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+# One memo per process, shared by all the files it converts
+_shared_memo = None
+
+def shared_memo(max_blocks=DEFAULT_MAX_BLOCKS):
+    """The memo of the current process, created on first use"""
+    global _shared_memo
+    if _shared_memo is None or _shared_memo.max_blocks != max_blocks:
+        _shared_memo = BlockMemo(max_blocks)
+    return _shared_memo
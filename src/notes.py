@@ -41,11 +41,35 @@ NOTES_SEQUENCE = (
 
 # Map language index with corresponding regex
 NOTES_LANGUAGES = (
-    (IDX_ENG, RE_NOTE_ENG),
-    (IDX_DEU, RE_NOTE_DEU),
-    (IDX_LAT, RE_NOTE_LAT),
+    (IDX_ENG, re.compile(RE_NOTE_ENG)),
+    (IDX_DEU, re.compile(RE_NOTE_DEU)),
+    (IDX_LAT, re.compile(RE_NOTE_LAT)),
 )
 
+# All the MIDI notes names are computed once, per language index
+MIDI_NOTES_NAMES = {
+    lang_idx: tuple(
+        f"{NOTES_SEQUENCE[midi_idx % SCALE_SIZE][lang_idx]}{midi_idx // SCALE_SIZE}"
+        for midi_idx in range(MIDI_NOTES_COUNT)
+    )
+    for lang_idx, _ in NOTES_LANGUAGES
+}
+
+# Frequencies in Hz of all the MIDI notes, equal temperament from the concert A
+CONCERT_A_MIDI = 69
+CONCERT_A_FREQUENCY = 440.0
+MIDI_NOTES_FREQUENCIES = tuple(
+    CONCERT_A_FREQUENCY * 2 ** ((midi_idx - CONCERT_A_MIDI) / SCALE_SIZE)
+    for midi_idx in range(MIDI_NOTES_COUNT)
+)
+
+# Reverse mapping, from any language note name to MIDI index
+NOTES_NAMES_MIDI = {
+    note_name: midi_idx
+    for names in MIDI_NOTES_NAMES.values()
+    for midi_idx, note_name in enumerate(names)
+}
+
 class MusicNote():
     """All the notes stuff is in there"""
     ENGLISH = IDX_ENG
@@ -56,20 +80,64 @@ class MusicNote():
     @staticmethod
     def midi_to_name(midi_idx, lang_idx=IDX_ENG):
         """Get note name from midi index"""
+        # Fast path, a lookup in the precomputed names
+        try:
+            if 0 <= midi_idx < MIDI_NOTES_COUNT:
+                return MIDI_NOTES_NAMES[lang_idx][midi_idx]
+        except (KeyError, TypeError):
+            pass
+
+        # Something is wrong, let the validators tell what
+        MusicNote.validate_midi_index(midi_idx)
+        MusicNote.validate_lang(lang_idx)
+        return MIDI_NOTES_NAMES[lang_idx][midi_idx]
+
+    @staticmethod
+    def midi_to_frequency(midi_idx):
+        """Get note frequency in Hz from midi index"""
         MusicNote.validate_midi_index(midi_idx)
+        return MIDI_NOTES_FREQUENCIES[midi_idx]
+
+    @staticmethod
+    def midi_to_names(midi_indexes, lang_idx=IDX_ENG):
+        """Get notes names from a sequence of midi indexes"""
+        midi_indexes = list(midi_indexes)
         MusicNote.validate_lang(lang_idx)
-        note_idx = midi_idx % SCALE_SIZE
-        note_octave = midi_idx // SCALE_SIZE
-        return f"{NOTES_SEQUENCE[note_idx][lang_idx]}{note_octave}"
+        names = MIDI_NOTES_NAMES[lang_idx]
+
+        try:
+            # Negative indexes would silently wrap around
+            if not midi_indexes or min(midi_indexes) >= 0:
+                return [names[midi_idx] for midi_idx in midi_indexes]
+        except (IndexError, TypeError):
+            pass
+
+        # Note by note to raise the right error
+        return [MusicNote.midi_to_name(midi_idx, lang_idx) for midi_idx in midi_indexes]
+
+    @staticmethod
+    def names_to_midi(notes_names):
+        """Get the MIDI indexes from a sequence of notes"""
+        notes_names = list(notes_names)
+        try:
+            return [NOTES_NAMES_MIDI[note_name] for note_name in notes_names]
+        except (KeyError, TypeError):
+            return [MusicNote.name_to_midi(note_name) for note_name in notes_names]
 
     @staticmethod
     def name_to_midi(note_name):
         """Get the MIDI index from a note"""
+        # Fast path, a lookup in the precomputed names
+        try:
+            return NOTES_NAMES_MIDI[note_name]
+        except (KeyError, TypeError):
+            pass
+
         MusicNote.validate_name(note_name)
 
         # Find the matching language
         for lang_idx, lang_re in NOTES_LANGUAGES:
-            if re.match(lang_re, note_name):
+            if lang_re.match(note_name):
                 # Extract octave number and raw note name
                 note_octave = int(re.findall(RE_INT, note_name)[0])
                 raw_note = re.sub(RE_INT, '', note_name)
@@ -105,7 +173,7 @@ class MusicNote():
             raise TypeError("Note name must be a string")
 
         for lang_idx, lang_re in NOTES_LANGUAGES:
-            if re.match(lang_re, note_name):
+            if lang_re.match(note_name):
                 return # It matches to known note, we're fine
         
         raise ValueError(f"Invalid note name '{note_name}'")
@@ -126,9 +194,8 @@ class MusicNote():
         if not isinstance(lang_idx, int):
             raise TypeError("Language index must be an int")
 
-        for index, _ in NOTES_LANGUAGES:
-            if index == lang_idx:
-                return 
+        if lang_idx in MIDI_NOTES_NAMES:
+            return
 
         raise ValueError(f"Language '{lang_idx}' is not defined")
 
@@ -0,0 +1,309 @@
+"""
+Converted notes output, in several formats
+All writers go through a single buffered stream, text or binary.
+"""
+import contextlib
+import csv
+import json
+import struct
+import sys
+
+from src.chords import chord_name
+from src.notes import MusicNote
+from src.timing import STAGE_NAMING
+from src.transpose import transpose
+
+# Output formats
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+FORMAT_MIDI = 'midi'
+
+FORMAT_CHOICES = [
+    FORMAT_TEXT,
+    FORMAT_JSON,
+    FORMAT_NDJSON,
+    FORMAT_CSV,
+    FORMAT_MIDI,
+]
+
+# Output files extensions
+FORMAT_EXTENSIONS = {
+    FORMAT_TEXT: '.txt',
+    FORMAT_JSON: '.json',
+    FORMAT_NDJSON: '.ndjson',
+    FORMAT_CSV: '.csv',
+    FORMAT_MIDI: '.mid',
+}
+
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+# Standard MIDI File settings
+MIDI_TICKS_PER_QUARTER = 480
+MIDI_CHORD_TICKS = MIDI_TICKS_PER_QUARTER // 2 # every chord is an eighth note
+MIDI_TEMPO = 500000 # microseconds per quarter note, 120 BPM
+MIDI_VELOCITY = 100
+MIDI_CHANNEL = 0
+
+class NotesWriter():
+    """Base writer, subclasses write each file blocks in their format"""
+    binary = False
+
+    def __init__(self, out, note_naming=MusicNote.ENGLISH, transposition=0, stats=None, chords=False):
+        """Constructor, chords enables chords names"""
+        self.out = out
+        self.note_naming = note_naming
+        self.transposition = transposition
+        self.stats = stats
+        self.chords = chords
+
+    def begin_file(self, file_name):
+        """A new file starts"""
+
+    def write_block(self, block_notes):
+        """Write the chords MIDI notes of a block"""
+        raise NotImplementedError
+
+    def end_file(self):
+        """Current file is done"""
+
+    def write_error(self, file_name, error):
+        """A file couldn't be converted"""
+        print(f"{file_name}: {error}", file=sys.stderr)
+
+    def abort_file(self, file_name, error):
+        """Current file failed after some blocks were written"""
+        self.end_file()
+        self.write_error(file_name, error)
+
+    def close(self):
+        """Everything is written"""
+        self.out.flush()
+
+    def write_file(self, file_name, midi_notes):
+        """Write all the blocks of a file"""
+        self.begin_file(file_name)
+        for block_notes in midi_notes:
+            self.write_block(block_notes)
+        self.end_file()
+
+    def flush(self):
+        """Push buffered output, when streaming"""
+        self.out.flush()
+
+    # Helpers
+    def _transposed(self, block_notes):
+        """Transposed MIDI notes of a block, checked before any is written"""
+        return transpose([block_notes], self.transposition)[0]
+
+    def _names(self, block_notes):
+        """Notes names of a block, chord by chord"""
+        with self.stats.stage(STAGE_NAMING) if self.stats else contextlib.nullcontext():
+            names = [MusicNote.midi_to_names(chord, self.note_naming) for chord in block_notes]
+        if self.stats:
+            self.stats.count(STAGE_NAMING, sum(map(len, block_notes)))
+        return names
+
+    def _chords_names(self, block_notes):
+        """Chords names of a block, None for single notes and unknown chords"""
+        return [chord_name(chord, self.note_naming) for chord in block_notes]
+
+class TextWriter(NotesWriter):
+    """One line of notes names per block, chords notes joined by '+'"""
+
+    def __init__(self, out, note_naming=MusicNote.ENGLISH, transposition=0, stats=None, chords=False, headers=False):
+        """Constructor, headers enables file names headers"""
+        super().__init__(out, note_naming, transposition, stats, chords)
+        self.headers = headers
+
+    def begin_file(self, file_name):
+        if self.headers:
+            self.out.write(f"==> {file_name} <==\n")
+
+    def write_block(self, block_notes):
+        block_notes = self._transposed(block_notes)
+        chords = ["+".join(chord) for chord in self._names(block_notes)]
+
+        # Known chords are displayed by their name rather than their notes
+        if self.chords:
+            for chord_idx, name in enumerate(self._chords_names(block_notes)):
+                if name is not None:
+                    chords[chord_idx] = name
+
+        self.out.write(" ".join(chords))
+        self.out.write("\n")
+
+    def write_error(self, file_name, error):
+        self.begin_file(file_name)
+        self.out.write(f"{file_name}: {error}\n" if self.headers else f"{error}\n")
+
+class JsonWriter(NotesWriter):
+    """A single JSON array, one object per file, streamed as it comes"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.files_count = 0
+        self.blocks_count = 0
+
+    def begin_file(self, file_name):
+        self._begin_object()
+        self.out.write(f'{{"file": {json.dumps(file_name)}, "blocks": [')
+        self.blocks_count = 0
+
+    def write_block(self, block_notes):
+        if self.blocks_count:
+            self.out.write(", ")
+        block_notes = self._transposed(block_notes)
+        block = {'midi': block_notes, 'names': self._names(block_notes)}
+        if self.chords:
+            block['chords'] = self._chords_names(block_notes)
+        json.dump(block, self.out)
+        self.blocks_count += 1
+
+    def end_file(self):
+        self.out.write("]}")
+
+    def write_error(self, file_name, error):
+        self._begin_object()
+        json.dump({'file': file_name, 'error': error}, self.out)
+
+    def abort_file(self, file_name, error):
+        # The file object keeps its blocks, and gets the error
+        self.out.write(f'], "error": {json.dumps(error)}}}')
+
+    def close(self):
+        self.out.write("\n]\n" if self.files_count else "[]\n")
+        super().close()
+
+    def _begin_object(self):
+        """Array separator"""
+        self.out.write(",\n" if self.files_count else "[\n")
+        self.files_count += 1
+
+class NdjsonWriter(NotesWriter):
+    """One JSON object per line and per block"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_name = None
+        self.block_idx = 0
+
+    def begin_file(self, file_name):
+        self.file_name = file_name
+        self.block_idx = 0
+
+    def write_block(self, block_notes):
+        block_notes = self._transposed(block_notes)
+        block = {
+            'file': self.file_name,
+            'block': self.block_idx,
+            'midi': block_notes,
+            'names': self._names(block_notes),
+        }
+        if self.chords:
+            block['chords'] = self._chords_names(block_notes)
+        json.dump(block, self.out)
+        self.out.write("\n")
+        self.block_idx += 1
+
+    def write_error(self, file_name, error):
+        json.dump({'file': file_name, 'error': error}, self.out)
+        self.out.write("\n")
+
+class CsvWriter(NotesWriter):
+    """One row per note: file, block, chord, midi, name"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.csv = csv.writer(self.out)
+        self.csv.writerow(('file', 'block', 'chord', 'midi', 'name'))
+        self.file_name = None
+        self.block_idx = 0
+
+    def begin_file(self, file_name):
+        self.file_name = file_name
+        self.block_idx = 0
+
+    def write_block(self, block_notes):
+        block_notes = self._transposed(block_notes)
+        rows = []
+        for chord_idx, (chord, names) in enumerate(zip(block_notes, self._names(block_notes))):
+            for note, name in zip(chord, names):
+                rows.append((self.file_name, self.block_idx, chord_idx, note, name))
+        self.csv.writerows(rows)
+        self.block_idx += 1
+
+class MidiWriter(NotesWriter):
+    """Standard MIDI File (format 0), every chord lasts an eighth note
+
+    Track length is in the header, so the track is kept in memory (a few
+    bytes per note) until closing.
+    """
+    binary = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.track = bytearray()
+        self.delta = 0 # ticks since last event
+
+        # Tempo meta event
+        self.track += b'\x00\xff\x51\x03' + MIDI_TEMPO.to_bytes(3, 'big')
+
+    def write_block(self, block_notes):
+        note_on = 0x90 | MIDI_CHANNEL
+        note_off = 0x80 | MIDI_CHANNEL
+
+        for chord in self._transposed(block_notes):
+            if not chord:
+                continue
+            for note in chord:
+                MusicNote.validate_midi_index(note)
+
+            for note in chord:
+                self._event(bytes((note_on, note, MIDI_VELOCITY)))
+            self.delta = MIDI_CHORD_TICKS
+            for note in chord:
+                self._event(bytes((note_off, note, 0)))
+
+    def close(self):
+        # End of track
+        self._event(b'\xff\x2f\x00')
+
+        self.out.write(b'MThd' + struct.pack('>IHHH', 6, 0, 1, MIDI_TICKS_PER_QUARTER))
+        self.out.write(b'MTrk' + struct.pack('>I', len(self.track)))
+        self.out.write(self.track)
+        super().close()
+
+    def _event(self, data):
+        """Add an event after the current delta time"""
+        self.track += MidiWriter.var_len(self.delta)
+        self.track += data
+        self.delta = 0
+
+    @staticmethod
+    def var_len(value):
+        """MIDI variable-length quantity"""
+        data = bytearray((value & 0x7f,))
+        value >>= 7
+        while value:
+            data.insert(0, (value & 0x7f) | 0x80)
+            value >>= 7
+        return bytes(data)
+
+WRITERS = {
+    FORMAT_TEXT: TextWriter,
+    FORMAT_JSON: JsonWriter,
+    FORMAT_NDJSON: NdjsonWriter,
+    FORMAT_CSV: CsvWriter,
+    FORMAT_MIDI: MidiWriter,
+}
+
+def open_output(file_name, out_format):
+    """Buffered output stream for a format, stdout when file_name is None"""
+    binary = WRITERS[out_format].binary
+    if file_name is None:
+        return sys.stdout.buffer if binary else sys.stdout
+    if binary:
+        return open(file_name, 'wb', buffering=OUTPUT_BUFFER_SIZE)
+    return open(file_name, 'w', buffering=OUTPUT_BUFFER_SIZE, newline='' if out_format == FORMAT_CSV else None)
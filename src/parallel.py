@@ -0,0 +1,154 @@
+"""
+Parallel conversion of a single big tablature file
+The file is memory-mapped, a quick structural pre-scan finds the string blocks
+byte ranges, then worker processes map the file themselves and convert their
+own blocks. Nothing but byte offsets and notes go through the pool.
+"""
+import concurrent.futures
+import contextlib
+import mmap
+import os
+
+from src.tablature import Tablature, TAB_CHAR, TAB_CHAR_MIN_OCCURENCE
+from src.timing import StageStats, STAGE_LOAD, STAGE_STRUCTURE, STAGE_FRETS, STAGE_MIDI
+
+TAB_BYTE = TAB_CHAR.encode()
+
+# Blocks handed to a worker at once, per job
+CHUNKS_PER_JOB = 4
+
+def scan_blocks(buf, inst_strings):
+    """Find string blocks byte ranges in a tablature buffer
+
+    Same rules as Tablature._parse_file, returns a list of (start, end) byte
+    offsets, one per block.
+    """
+    return scan_tablature(buf, inst_strings)[0]
+
+def scan_tablature(buf, inst_strings):
+    """Find string blocks byte ranges, and check the instrument on the first one
+
+    Returns (blocks, instrument strings notes, lines count), the instrument
+    being picked from the first block with Tablature.INST_AUTO. Errors are
+    raised in the file order, like Tablature._parse_file does.
+    """
+    blocks = []
+    strings_count = 0
+    lst_str_cnt = 0
+    block_start = None
+    line_no = 0
+    pos = 0
+    size = len(buf)
+
+    while pos < size:
+        line_end = buf.find(b'\n', pos)
+        line_end = size if line_end == -1 else line_end + 1
+        line_no += 1
+
+        if buf[pos:line_end].count(TAB_BYTE) > TAB_CHAR_MIN_OCCURENCE:
+            if block_start is None:
+                block_start = pos
+                strings_count = 0
+            strings_count += 1
+
+        elif block_start is not None: # end of line group
+            blocks.append((block_start, pos))
+            if not lst_str_cnt:
+                inst_strings = check_instrument(buf[block_start:pos], strings_count, inst_strings)
+            if lst_str_cnt and lst_str_cnt != strings_count:
+                raise Tablature.InconsistentTablature(f"Inconsistent string count in file (line {line_no})")
+            lst_str_cnt = strings_count
+            block_start = None
+
+        pos = line_end
+
+    # Last group when the file ends on a string line
+    if block_start is not None:
+        blocks.append((block_start, size))
+        if not lst_str_cnt:
+            inst_strings = check_instrument(buf[block_start:size], strings_count, inst_strings)
+        if lst_str_cnt and lst_str_cnt != strings_count:
+            raise Tablature.InconsistentTablature(f"Inconsistent string count in file (line {line_no})")
+
+    # No strings at all, no instrument fits
+    if not blocks:
+        inst_strings = check_instrument(b'', 0, inst_strings)
+
+    return blocks, inst_strings, line_no
+
+def check_instrument(block, strings_count, inst_strings):
+    """Instrument of the first block bytes, detected or checked, like Tablature._check_instrument"""
+    if inst_strings is Tablature.INST_AUTO:
+        inst_strings = Tablature._detect_instrument([line.strip() for line in block.decode().splitlines()])
+    instr_strings = len(inst_strings)
+    if instr_strings != strings_count:
+        raise Tablature.InstrumentBadStringCount(f"Wrong instrument ({instr_strings} strings instead of {strings_count})")
+    return inst_strings
+
+def parallel_midi_notes(file_name, inst_strings, jobs=0, stats=None):
+    """Same as Tablature(file_name, inst_strings).midi_notes(), using many processes
+
+    A jobs value of 0 uses all the CPUs. With Tablature.INST_AUTO, the
+    instrument is picked from the first block in the parent process.
+    stats is an optional StageStats. The pre-scan reads the file and finds
+    its blocks in a single pass, its time goes to the structure stage, the
+    load stage only counts the lines. Workers stats are added to it.
+    """
+    if not os.path.exists(file_name):
+        raise ValueError(f"Tablature file '{file_name}' doest not exist !")
+
+    with open(file_name, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return scan_blocks(b'', inst_strings) # raises, no strings at all
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            with stats.stage(STAGE_STRUCTURE) if stats else contextlib.nullcontext():
+                blocks, inst_strings, lines_count = scan_tablature(buf, inst_strings)
+    if stats:
+        stats.count(STAGE_LOAD, lines_count)
+        stats.count(STAGE_STRUCTURE, len(blocks))
+
+    jobs = jobs or os.cpu_count() or 1
+    chunk_size = max(1, len(blocks) // (jobs * CHUNKS_PER_JOB))
+    chunks = [blocks[idx:idx+chunk_size] for idx in range(0, len(blocks), chunk_size)]
+
+    retval = []
+    if jobs == 1 or len(chunks) == 1:
+        results = [convert_blocks(file_name, chunk, inst_strings, stats is not None) for chunk in chunks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(convert_blocks, file_name, chunk, inst_strings, stats is not None) for chunk in chunks
+            ]
+            results = [future.result() for future in futures]
+
+    for chunk_notes, chunk_stats in results:
+        retval.extend(chunk_notes)
+        if stats:
+            stats.merge(chunk_stats)
+
+    return retval
+
+def convert_blocks(file_name, blocks, inst_strings, with_stats=False):
+    """Convert the given blocks byte ranges of a file into MIDI notes
+
+    Returns (MIDI notes, stats), stats being None unless with_stats is set.
+    """
+    strings_notes = list(inst_strings)
+    strings_notes.reverse()
+    stats = StageStats() if with_stats else None
+
+    retval = []
+    with open(file_name, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for start, end in blocks:
+                with stats.stage(STAGE_FRETS) if stats else contextlib.nullcontext():
+                    block_lines = [line.strip() for line in buf[start:end].decode().splitlines()]
+                    block_frets = Tablature.get_block_frets(block_lines)
+                with stats.stage(STAGE_MIDI) if stats else contextlib.nullcontext():
+                    block_notes = block_frets.midi_notes(strings_notes)
+                if stats:
+                    stats.count(STAGE_FRETS, len(block_frets))
+                    stats.count(STAGE_MIDI, sum(map(len, block_notes)))
+                retval.append(block_notes)
+
+    return retval, stats
@@ -0,0 +1,177 @@
+"""
+Riff search over a tablatures corpus
+Each file melody (highest note of every chord) is turned into intervals, and
+every run of GRAM_SIZE intervals goes into an inverted index. Intervals don't
+change with transposition, so a riff is found in any key and on any
+instrument. The index is an SQLite database, updated incrementally.
+"""
+import collections
+import os
+import sqlite3
+from array import array
+
+from src.tablature import Tablature
+
+GRAM_SIZE = 3 # intervals per n-gram, so a riff needs GRAM_SIZE + 1 notes
+INTERVAL_OFFSET = 128 # intervals are from -127 to 127
+INTERVAL_BITS = 8
+
+DEFAULT_INDEX_FILE = '.tabs2notes-index.sqlite' # hidden, so directories walks skip it
+DEFAULT_RESULTS = 10
+
+# Databases of another schema version are rebuilt
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    parser_version INTEGER NOT NULL,
+    tuning TEXT NOT NULL,
+    positions BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grams (
+    gram INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    pos INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS grams_gram ON grams (gram);
+CREATE INDEX IF NOT EXISTS grams_file ON grams (file_id);
+"""
+
+def tuning_key(inst_strings):
+    """Stored form of the instrument files were parsed with, empty when it was detected"""
+    if inst_strings is Tablature.INST_AUTO:
+        return ''
+    return ','.join(map(str, inst_strings))
+
+def open_database(index_file, schema, schema_version):
+    """SQLite database of a schema, its tables are dropped when they're of another version"""
+    db = sqlite3.connect(index_file)
+    if db.execute("PRAGMA user_version").fetchone()[0] != schema_version:
+        tables = [name for name, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for name in tables:
+            db.execute(f'DROP TABLE "{name}"')
+        db.execute(f"PRAGMA user_version = {schema_version:d}")
+    db.executescript(schema)
+    return db
+
+def melody(midi_notes):
+    """Highest note of each chord, with its (block, chord) positions
+
+    Returns (pitches, positions), positions being a flat array of block and
+    chord indexes pairs.
+    """
+    pitches = []
+    positions = array('I')
+    for block_idx, block_notes in enumerate(midi_notes):
+        for chord_idx, chord in enumerate(block_notes):
+            if chord:
+                pitches.append(max(chord))
+                positions.append(block_idx)
+                positions.append(chord_idx)
+    return pitches, positions
+
+def intervals_grams(pitches, gram_size=GRAM_SIZE):
+    """Transposition invariant n-grams, one per position having enough notes after it"""
+    intervals = [(pitches[idx+1] - pitches[idx]) + INTERVAL_OFFSET for idx in range(len(pitches) - 1)]
+
+    grams = []
+    for idx in range(len(intervals) - gram_size + 1):
+        gram = 0
+        for interval in intervals[idx:idx+gram_size]:
+            gram = (gram << INTERVAL_BITS) | interval
+        grams.append(gram)
+    return grams
+
+class RiffIndex():
+    """Persistent interval n-grams inverted index"""
+
+    def __init__(self, index_file=DEFAULT_INDEX_FILE):
+        """Constructor"""
+        self.db = open_database(index_file, SCHEMA, SCHEMA_VERSION)
+
+    def close(self):
+        """Commit and close the database"""
+        self.db.commit()
+        self.db.close()
+
+    def is_current(self, path, stat, inst_strings):
+        """Is the file already indexed in this version, by this parser, with this instrument ?"""
+        row = self.db.execute(
+            "SELECT mtime_ns, size, parser_version, tuning FROM files WHERE path = ?", (path,),
+        ).fetchone()
+        return row is not None and row == (
+            stat.st_mtime_ns, stat.st_size, Tablature.PARSER_VERSION, tuning_key(inst_strings),
+        )
+
+    def add_file(self, path, stat, midi_notes, inst_strings):
+        """Index (or reindex) a file MIDI notes, parsed with an instrument"""
+        self.remove_file(path)
+
+        pitches, positions = melody(midi_notes)
+        cursor = self.db.execute(
+            "INSERT INTO files (path, mtime_ns, size, parser_version, tuning, positions) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                path, stat.st_mtime_ns, stat.st_size, Tablature.PARSER_VERSION, tuning_key(inst_strings),
+                positions.tobytes(),
+            ),
+        )
+        file_id = cursor.lastrowid
+        self.db.executemany(
+            "INSERT INTO grams (gram, file_id, pos) VALUES (?, ?, ?)",
+            ((gram, file_id, pos) for pos, gram in enumerate(intervals_grams(pitches))),
+        )
+
+    def remove_file(self, path):
+        """Drop a file from the index"""
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self.db.execute("DELETE FROM grams WHERE file_id = ?", row)
+        self.db.execute("DELETE FROM files WHERE id = ?", row)
+
+    def prune(self):
+        """Drop the files that don't exist anymore, return their paths"""
+        missing = [path for path, in self.db.execute("SELECT path FROM files") if not os.path.exists(path)]
+        for path in missing:
+            self.remove_file(path)
+        return missing
+
+    def files_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def search(self, pitches, limit=DEFAULT_RESULTS):
+        """Find a riff, given as MIDI notes
+
+        Returns a list of (score, path, block, chord), best first. The score is
+        the ratio of the riff n-grams found aligned at that place.
+        """
+        grams = intervals_grams(pitches)
+        if not grams:
+            raise ValueError(f"A riff needs at least {GRAM_SIZE + 1} notes")
+
+        # Votes for (file, riff start position)
+        votes = collections.Counter()
+        for gram in set(grams):
+            offsets = [idx for idx, other in enumerate(grams) if other == gram]
+            for file_id, pos in self.db.execute("SELECT file_id, pos FROM grams WHERE gram = ?", (gram,)):
+                for offset in offsets:
+                    if pos >= offset:
+                        votes[(file_id, pos - offset)] += 1
+
+        results = []
+        files = {}
+        for (file_id, start), count in votes.most_common(limit):
+            if file_id not in files:
+                path, positions_blob = self.db.execute(
+                    "SELECT path, positions FROM files WHERE id = ?", (file_id,),
+                ).fetchone()
+                positions = array('I')
+                positions.frombytes(positions_blob)
+                files[file_id] = path, positions
+            path, positions = files[file_id]
+            results.append((count / len(grams), path, positions[start*2], positions[start*2+1]))
+
+        return results
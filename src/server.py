@@ -0,0 +1,207 @@
+"""
+Conversion daemon
+A JSON-lines protocol over TCP or Unix socket: each request is one JSON object
+on one line, each answer too.
+
+Conversion request:
+  {"id": 1, "tab": "e|---0---...", "instrument": "bass4", "naming": "english", "transpose": 0}
+  instrument can also be a list of strings MIDI notes, low to high, or "auto"
+  -> {"id": 1, "midi": [[[40], ...], ...], "names": [[["E3"], ...], ...]}
+  -> {"id": 1, "error": "Wrong instrument (4 strings instead of 6)"}
+
+Server stats request:
+  {"id": 2, "command": "stats"}
+  -> {"id": 2, "requests": 10, "errors": 1, "pending": 0, "latency_ms": {"p50": ..., "p90": ..., "p99": ...}}
+"""
+import asyncio
+import collections
+import concurrent.futures
+import io
+import json
+import os
+import time
+
+from src.notes import MusicNote
+from src.tablature import Tablature
+
+COMMAND_STATS = 'stats'
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 64 # requests being converted or waiting for a worker
+LATENCIES_WINDOW = 10000 # latest requests kept for percentiles
+MAX_REQUEST_SIZE = 16 * 1024 * 1024 # bytes per request line
+
+PERCENTILES = (50, 90, 99)
+
+class ConversionServer():
+    """Tablatures conversion server, parsing runs in a bounded process pool
+
+    instruments and namings map the names accepted in requests to instrument
+    strings tuples and MusicNote language indexes.
+    When max_pending requests are in flight, connections stop being read
+    until a slot is free, so clients feel the backpressure.
+    """
+
+    def __init__(
+        self, instruments, namings, default_instrument=None, default_naming=None,
+        workers=None, max_pending=DEFAULT_MAX_PENDING,
+    ):
+        """Constructor, defaults are used when requests don't tell"""
+        self.instruments = instruments
+        self.namings = namings
+        self.default_instrument = default_instrument
+        self.default_naming = default_naming
+        self.workers = workers
+        if max_pending < 1:
+            raise ValueError("At least one pending request must be allowed")
+        self.max_pending = max_pending
+        self.slots = None # semaphore, needs the running loop
+        self.pending = 0
+        self.requests = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=LATENCIES_WINDOW)
+        self.executor = None
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, ready=None):
+        """Run the server until cancelled
+
+        ready is an optional callback getting the listening asyncio server.
+        """
+        self.slots = asyncio.Semaphore(self.max_pending)
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            # Workers are started now, so modules and lookup tables are warm for the first request
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self.executor, convert_text, '', (), MusicNote.ENGLISH)
+                for _ in range(self.workers or os.cpu_count() or 1)
+            ))
+
+            if unix_path:
+                server = await asyncio.start_unix_server(self.handle_client, unix_path, limit=MAX_REQUEST_SIZE)
+            else:
+                server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_REQUEST_SIZE)
+            if ready:
+                ready(server)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def handle_client(self, reader, writer):
+        """Answer a client requests, one at a time"""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError: # line over the stream limit
+                    writer.write(self._encode({'error': "Request too large"}))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+
+                answer = await self.handle_request(line)
+                writer.write(self._encode(answer))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, line):
+        """Decode a request line and return the answer object"""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+        except ValueError as exc:
+            self.errors += 1
+            return {'error': f"Bad request: {exc}"}
+
+        answer = {'id': request.get('id')}
+        if request.get('command') == COMMAND_STATS:
+            answer.update(self.stats())
+            return answer
+
+        async with self.slots:
+            self.pending += 1
+            start = time.perf_counter()
+            try:
+                answer.update(await self._convert(request))
+            except (
+                Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature,
+                ValueError, TypeError,
+            ) as exc:
+                self.errors += 1
+                answer['error'] = str(exc)
+            finally:
+                self.pending -= 1
+                self.requests += 1
+                self.latencies.append(time.perf_counter() - start)
+
+        return answer
+
+    async def _convert(self, request):
+        """Run a conversion request in the pool"""
+        tab = request.get('tab')
+        if not isinstance(tab, str):
+            raise ValueError("Request 'tab' must be a string")
+
+        instrument = request.get('instrument', self.default_instrument)
+        if isinstance(instrument, list):
+            if not instrument:
+                raise ValueError("Instrument notes list is empty, use \"auto\" to detect it")
+            inst_strings = tuple(int(note) for note in instrument)
+        elif instrument in self.instruments:
+            inst_strings = self.instruments[instrument]
+        else:
+            raise ValueError(f"Unknown instrument '{instrument}'")
+
+        naming = request.get('naming', self.default_naming)
+        if naming not in self.namings:
+            raise ValueError(f"Unknown naming '{naming}'")
+        note_naming = self.namings[naming]
+        transposition = int(request.get('transpose', 0))
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, convert_text, tab, inst_strings, note_naming, transposition,
+        )
+
+    def stats(self):
+        """Requests counts and latency percentiles"""
+        latencies = sorted(self.latencies)
+        percentiles = {}
+        for percentile in PERCENTILES:
+            if latencies:
+                idx = min(len(latencies) - 1, len(latencies) * percentile // 100)
+                percentiles[f"p{percentile}"] = round(latencies[idx] * 1000, 3)
+            else:
+                percentiles[f"p{percentile}"] = None
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'pending': self.pending,
+            'latency_ms': percentiles,
+        }
+
+    @staticmethod
+    def _encode(answer):
+        """Answer as a JSON line"""
+        return json.dumps(answer).encode() + b'\n'
+
+def convert_text(tab, inst_strings, note_naming, transposition=0):
+    """Convert a tablature text, in a worker process"""
+    midi = []
+    names = []
+    for block_notes in Tablature.iter_blocks(io.StringIO(tab), inst_strings):
+        if transposition:
+            block_notes = [[note + transposition for note in chord] for chord in block_notes]
+        midi.append(block_notes)
+        names.append([MusicNote.midi_to_names(chord, note_naming) for chord in block_notes])
+
+    return {'midi': midi, 'names': names}
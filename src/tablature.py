@@ -3,26 +3,221 @@ Tablature parsing
 As there is not standardized format, it's going to break at some point...
 """
 import os
-import re
 import collections
-
-RE_INT = r"[0-9]+"
+import contextlib
+import io
+import itertools
+import logging
+import mmap
+import operator
+import struct
+import sys
+from array import array
+
+from src.bars import BarsIndex, index_path, lines_offsets
+from src.chords import chord_name
+from src.instruments import INSTRUMENTS, INST_BASS4, INST_GUITAR6, detect_instrument
+from src.notes import IDX_ENG
+from src.timing import (
+    STAGE_LOAD,
+    STAGE_STRUCTURE,
+    STAGE_FRETS,
+    STAGE_MIDI,
+    COUNT_MEMO_HITS,
+    COUNT_MEMO_MISSES,
+)
+
+logger = logging.getLogger(__name__)
+
+# File name of tablatures read from a nameless text stream
+STREAM_NAME = '<stream>'
 
 # Tablature line guesswork
 TAB_CHAR = '-'
 TAB_CHAR_MIN_OCCURENCE = 5
 
-# Dict keys
-K_FR_IDX = 'frets_indexes'
-K_FR_DET = 'frets_detail'
-K_FR_BLK = 'frets_block_idx'
+# Bars are between bar lines, the block first line telling where they are
+BAR_CHAR = '|'
+
+# Frets scanning
+DIGITS = '0123456789'
+MAX_FRET_DIGITS = 2
+# A fret right after these is a bend target or a release, not a new note: 7b9r7
+BEND_CHARS = 'br'
+# Bytes table turning digits into '1' and anything else into '0'
+DIGITS_BITS = bytes(ord('1') if chr(byte) in DIGITS else ord('0') for byte in range(256))
+
+# Array typecodes of the frets blocks columns
+ARR_COLUMN = 'I'
+ARR_STRING = 'B'
+ARR_FRET = 'H'
+
+# Binary format: header, instrument strings notes, blocks table, then the
+# events columns, frets and strings arrays of all blocks, little-endian
+BINARY_MAGIC = b'T2NB'
+BINARY_VERSION = 1
+BINARY_EXT = '.t2n'
+BINARY_HEADER = struct.Struct('<4sHHHII') # magic, version, strings count, instrument strings, blocks, events
+BINARY_BLOCK = struct.Struct('<III') # start line index, first event, events count
+BINARY_ALIGN = 4
+
+class FretsBlock():
+    """Frets of a tablature block, stored as parallel arrays
+
+    One entry per written fret, sorted by column then by string index
+    (0 is the first line of the block, which is the highest string).
+    """
+    __slots__ = ('start_idx', 'strings_count', 'columns', 'strings', 'frets')
+
+    def __init__(self, start_idx, strings_count, columns=(), strings=(), frets=()):
+        self.start_idx = start_idx # block start line index
+        self.strings_count = strings_count
+        self.columns = array(ARR_COLUMN, columns) # character position in the line
+        self.strings = array(ARR_STRING, strings)
+        self.frets = array(ARR_FRET, frets)
+
+    def __len__(self):
+        return len(self.frets)
+
+    def __eq__(self, other):
+        if not isinstance(other, FretsBlock):
+            return NotImplemented
+        return (
+            self.start_idx == other.start_idx
+            and self.strings_count == other.strings_count
+            and self.columns == other.columns
+            and self.strings == other.strings
+            and self.frets == other.frets
+        )
+
+    def __repr__(self):
+        return f"FretsBlock({self.start_idx}, {list(zip(self.columns, self.strings, self.frets))})"
+
+    def moved(self, start_idx):
+        """Same frets for a block starting at another line, arrays are shared"""
+        block = FretsBlock.__new__(FretsBlock)
+        block.start_idx = start_idx
+        block.strings_count = self.strings_count
+        block.columns = self.columns
+        block.strings = self.strings
+        block.frets = self.frets
+        return block
+
+    def midi_notes(self, strings_notes):
+        """MIDI notes grouped by column
+
+        strings_notes are the strings base notes in tablature lines order
+        (high to low).
+        """
+        notes = map(operator.add, map(strings_notes.__getitem__, self.strings), self.frets)
+
+        chords = []
+        last_column = None
+        for column, note in zip(self.columns, notes):
+            if column != last_column:
+                chord = []
+                chords.append(chord)
+                last_column = column
+            chord.append(note)
+
+        return chords
+
+def scan_block_frets(block_lines):
+    """Scan all the string lines of a block column by column
+
+    Returns (columns, strings, frets) lists, sorted by column then by string,
+    ready to make chords.
+    Each line digits become a bitmask (one bit per column), the columns where
+    a fret starts on any string are walked in order, so columns without any
+    fret cost nothing. Frets have one or two digits, a longer run of the same
+    digit (777777, tremolo picking) is one fret, other longer runs are read
+    as two digits frets. Techniques marks (h, p, /, \\, ~, x, |...) aren't
+    frets, the fret after a 'b' (bend) or an 'r' (release) isn't a new note.
+    """
+    # Columns where a digits run starts, per line and for the whole block
+    starts = []
+    block_starts = 0
+    for line in block_lines:
+        bits = line.encode('ascii', 'replace').translate(DIGITS_BITS)[::-1]
+        digits = int(bits, 2) if bits else 0
+        line_starts = digits & ~(digits << 1)
+        starts.append(line_starts)
+        block_starts |= line_starts
+
+    columns = []
+    strings = []
+    frets = []
+    reorder = False
+
+    while block_starts:
+        column_bit = block_starts & -block_starts
+        block_starts ^= column_bit
+        column = column_bit.bit_length() - 1
+
+        for str_idx, line_starts in enumerate(starts):
+            if not line_starts & column_bit:
+                continue
+
+            line = block_lines[str_idx]
+            if column and line[column-1] in BEND_CHARS:
+                continue
+
+            end = column + 1
+            while end < len(line) and line[end] in DIGITS:
+                end += 1
+            run = line[column:end]
+
+            if len(run) <= MAX_FRET_DIGITS:
+                columns.append(column)
+                strings.append(str_idx)
+                frets.append(int(run))
+            elif run.count(run[0]) == len(run):
+                columns.append(column)
+                strings.append(str_idx)
+                frets.append(int(run[0]))
+            else:
+                # Frets written without separators, they belong to later columns
+                for idx in range(0, len(run), MAX_FRET_DIGITS):
+                    columns.append(column + idx)
+                    strings.append(str_idx)
+                    frets.append(int(run[idx:idx+MAX_FRET_DIGITS]))
+                reorder = True
+
+    if reorder:
+        order = sorted(range(len(columns)), key=lambda idx: (columns[idx], strings[idx]))
+        columns = [columns[idx] for idx in order]
+        strings = [strings[idx] for idx in order]
+        frets = [frets[idx] for idx in order]
+
+    return columns, strings, frets
+
+def block_bars(first_line):
+    """(start, end) columns of a block bars, from its first line bar lines
+
+    Spans without any TAB_CHAR (string name, double bar lines) aren't bars,
+    and a block without bar lines is a single bar.
+    """
+    bars = []
+    start = 0
+    while start <= len(first_line):
+        end = first_line.find(BAR_CHAR, start)
+        if end < 0:
+            end = len(first_line)
+        if TAB_CHAR in first_line[start:end]:
+            bars.append((start, end))
+        start = end + 1
+    return bars
 
 class Tablature():
     """Guitar tablature parsing"""
 
     # MIDI values of instrument strings (low to high)
-    INST_BASS4 = (28, 33, 38, 43)
-    INST_GUITAR6 = (40, 45, 50, 55, 59, 64)
+    INST_BASS4 = INSTRUMENTS[INST_BASS4]
+    INST_GUITAR6 = INSTRUMENTS[INST_GUITAR6]
+    INST_AUTO = None # detected from the first block
+
+    # Bump when parsing results change, it invalidates cached tablatures
+    PARSER_VERSION = 4
 
     # Debug levels values
     DEBUG_OFF = 0
@@ -31,72 +226,309 @@ class Tablature():
     DEBUG_DETAILED = 3 # detailed 
     DEBUG_HARDCORE = 4 # everything !
 
-    def __init__(self, file_name, inst_strings, debug=DEBUG_OFF):
-        """Constructor"""
-        self.file = [] # File content line by line
+    def __init__(self, file_name, inst_strings, debug=DEBUG_OFF, cache=None, stats=None, memo=None):
+        """Constructor, nothing is read yet
+
+        Stages run on first access of their results: the file content, its
+        structure (strings_count, strings_blocks), then its frets
+        (extracted_frets, midi_notes()). Checking a file structure doesn't
+        extract any fret.
+        inst_strings is INST_AUTO to pick the registered instrument matching
+        the strings count and names of the tablature, during the structure
+        stage.
+        cache is an optional ParseCache, used to skip parsing of already seen
+        tablatures.
+        stats is an optional StageStats, filled with each stage time and counts.
+        memo is an optional BlockMemo, sharing repeated blocks results.
+        file_name may also be a text stream, read on first access.
+        """
+        self.stream = None # Text stream read instead of a file
+        if not isinstance(file_name, str):
+            self.stream = file_name
+            file_name = getattr(file_name, 'name', STREAM_NAME)
         self.file_name = file_name # File name
         self.strings_base_notes = inst_strings # base midi notes of the instruments strings
         self.debug = debug
+        self.cache = cache
+        self.stats = stats
+        self.memo = memo
+
+        self._debug(self.DEBUG_HARDCORE, "__init__(%s, %s, %s)", file_name, inst_strings, debug)
+
+        # Stages results, None until computed
+        self._file = None # File content line by line
+        self._cache_key = None
+        self._strings_count = None # how many strings in the tablature
+        self._strings_blocks = None # string blocks start lines indexes (not numbers)
+        self._extracted_frets = None # notes written on the tablature
+        self._bars = None # (block, start column, end column) of each bar
+        self._blocks_offsets = None # blocks byte offsets, when read from a bars index
+
+    # Lazy stages
+    @property
+    def file(self,):
+        """File content line by line"""
+        if self._file is None:
+            with self._stage(STAGE_LOAD):
+                self._load_file()
+            self._count(STAGE_LOAD, len(self._file))
+        return self._file
+
+    @property
+    def strings_count(self,):
+        """How many strings in the tablature"""
+        self._parse_structure()
+        return self._strings_count
+
+    @property
+    def strings_blocks(self,):
+        """String blocks start lines indexes (not numbers)"""
+        self._parse_structure()
+        return self._strings_blocks
+
+    @property
+    def extracted_frets(self,):
+        """Frets of each block"""
+        if self._extracted_frets is None:
+            self._parse_structure()
+        if self._extracted_frets is None:
+            with self._stage(STAGE_FRETS):
+                self._extract_frets()
+            self._count(STAGE_FRETS, sum(map(len, self._extracted_frets)))
+
+            if self.cache is not None:
+                self.cache.put(
+                    self._cache_key,
+                    (self._strings_count, self._strings_blocks, self._extracted_frets, self.strings_base_notes),
+                )
+        return self._extracted_frets
+
+    @property
+    def bars(self,):
+        """(block, start column, end column) of each bar, columns of the block lines"""
+        if self._bars is None:
+            if self.strings_blocks and not self.file:
+                raise ValueError(f"'{self.file_name}' has no text, its bars aren't known")
+            self._bars = [
+                (block_idx, start, end)
+                for block_idx, block_start_idx in enumerate(self.strings_blocks)
+                for start, end in block_bars(self.file[block_start_idx])
+            ]
+        return self._bars
+
+    def check(self,):
+        """Check the structure only, raises the first structure error"""
+        self._parse_structure()
+
+    def _parse_structure(self,):
+        """Structure stage, unless already done or cached"""
+        if self._strings_blocks is not None:
+            return
+
+        if self.cache is not None:
+            self._cache_key = self.cache.key(self.file, self.strings_base_notes, self.PARSER_VERSION)
+            cached = self.cache.get(self._cache_key)
+            if cached is not None:
+                self._debug(self.DEBUG_DETAILED, "Cache hit %s", self._cache_key)
+                self._strings_count, self._strings_blocks, self._extracted_frets, self.strings_base_notes = cached
+                return
+
+        with self._stage(STAGE_STRUCTURE):
+            self._parse_file()
+        self._count(STAGE_STRUCTURE, len(self._strings_blocks))
+
+    def save(self, path):
+        """Save the parsed tablature in the binary format"""
+        blocks = self.extracted_frets
+        events_count = sum(map(len, blocks))
+        inst_strings = bytes(self.strings_base_notes)
+
+        with open(path, 'wb') as f:
+            f.write(BINARY_HEADER.pack(
+                BINARY_MAGIC, BINARY_VERSION, self.strings_count, len(inst_strings), len(blocks), events_count,
+            ))
+            f.write(inst_strings)
+            f.write(b'\0' * Tablature._binary_padding(BINARY_HEADER.size + len(inst_strings)))
+
+            first_event = 0
+            for block in blocks:
+                f.write(BINARY_BLOCK.pack(block.start_idx, first_event, len(block)))
+                first_event += len(block)
+
+            # Widest items first, so every array stays aligned
+            for attribute, typecode in (('columns', ARR_COLUMN), ('frets', ARR_FRET), ('strings', ARR_STRING)):
+                values = array(typecode)
+                for block in blocks:
+                    values.extend(getattr(block, attribute))
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                values.tofile(f)
+
+    @classmethod
+    def load(cls, path, debug=DEBUG_OFF, stats=None, inst_strings=INST_AUTO):
+        """Load a tablature saved with save(), without any parsing
+
+        inst_strings, unless INST_AUTO, is the instrument the tablature must
+        have been saved with, InstrumentBadStringCount is raised otherwise.
+        """
+        tab = cls.__new__(cls)
+        tab._file = [] # text isn't saved
+        tab._cache_key = None
+        tab._bars = None
+        tab._blocks_offsets = None
+        tab.stream = None
+        tab.file_name = path
+        tab.debug = debug
+        tab.cache = None
+        tab.stats = stats
+        tab.memo = None
+
+        if not os.path.exists(path):
+            raise ValueError(f"Tablature file '{path}' doest not exist !")
+
+        with tab._stage(STAGE_LOAD):
+            with open(path, 'rb') as f:
+                try:
+                    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError: # empty file
+                    buf = b''
+                with memoryview(buf) as view:
+                    tab._load_binary(view)
+                if isinstance(buf, mmap.mmap):
+                    buf.close()
+        tab._count(STAGE_LOAD, sum(map(len, tab.extracted_frets)))
+
+        if inst_strings is not cls.INST_AUTO and tuple(inst_strings) != tab.strings_base_notes:
+            raise cls.InstrumentBadStringCount(
+                f"Wrong instrument ('{path}' was saved for strings {list(tab.strings_base_notes)}, "
+                f"not {list(inst_strings)})"
+            )
 
-        self._debug(f"__init__({file_name}, {inst_strings}, {debug})", self.DEBUG_HARDCORE)
-
-        # Tablature structure
-        self.strings_count = 0 # how many strings in the tablature
-        self.strings_blocks = [] # string blocks start lines indexes (not numbers)
-        self.extracted_frets = [] # notes written on the tablature
+        return tab
+
+    def _load_binary(self, view):
+        """Read the binary format from a buffer"""
+        if len(view) < BINARY_HEADER.size:
+            raise ValueError(f"'{self.file_name}' is not a tablature binary file")
+        magic, version, strings_count, inst_len, blocks_count, events_count = BINARY_HEADER.unpack_from(view)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"'{self.file_name}' is not a tablature binary file")
+        if version != BINARY_VERSION:
+            raise ValueError(f"'{self.file_name}' binary format version {version} isn't supported")
+
+        offset = BINARY_HEADER.size
+        if offset + inst_len > len(view):
+            raise ValueError(f"'{self.file_name}' is a corrupt binary tablature (truncated instrument)")
+        if inst_len != strings_count:
+            raise ValueError(f"'{self.file_name}' is a corrupt binary tablature (instrument strings count)")
+        self.strings_base_notes = tuple(view[offset:offset+inst_len])
+        self._strings_count = strings_count
+        offset += inst_len + Tablature._binary_padding(offset + inst_len)
+
+        table_size = blocks_count * BINARY_BLOCK.size
+        if offset + table_size > len(view):
+            raise ValueError(f"'{self.file_name}' is a corrupt binary tablature (truncated blocks table)")
+        blocks_table = list(BINARY_BLOCK.iter_unpack(view[offset:offset + table_size]))
+        offset += table_size
+        for _, first_event, block_events in blocks_table:
+            if first_event + block_events > events_count:
+                raise ValueError(f"'{self.file_name}' is a corrupt binary tablature (block events out of range)")
+
+        arrays = []
+        for typecode in (ARR_COLUMN, ARR_FRET, ARR_STRING):
+            values = array(typecode)
+            size = events_count * values.itemsize
+            if offset + size > len(view):
+                raise ValueError(f"'{self.file_name}' is a corrupt binary tablature (truncated events)")
+            values.frombytes(view[offset:offset+size])
+            if sys.byteorder != 'little':
+                values.byteswap()
+            arrays.append(values)
+            offset += size
+        columns, frets, strings = arrays
+        if strings and max(strings) >= strings_count:
+            raise ValueError(f"'{self.file_name}' is a corrupt binary tablature (string out of range)")
+
+        self._strings_blocks = []
+        self._extracted_frets = []
+        for start_idx, first_event, block_events in blocks_table:
+            last_event = first_event + block_events
+            block = FretsBlock.__new__(FretsBlock)
+            block.start_idx = start_idx
+            block.strings_count = strings_count
+            block.columns = columns[first_event:last_event]
+            block.strings = strings[first_event:last_event]
+            block.frets = frets[first_event:last_event]
+            self._strings_blocks.append(start_idx)
+            self._extracted_frets.append(block)
 
-        # Analyze the file
-        self._load_file()
-        self._parse_file()
-        self._extract_frets()
+    @staticmethod
+    def _binary_padding(offset):
+        """Padding bytes count to align the next section"""
+        return -offset % BINARY_ALIGN
 
     def _load_file(self,):
         """Load file content"""
-        self._debug("_load_file()", self.DEBUG_DETAILED)
+        self._debug(self.DEBUG_DETAILED, "_load_file()")
+        if self.stream is not None:
+            self._file = [line.strip() for line in self.stream]
+            return
+
         if not os.path.exists(self.file_name):
             raise ValueError(f"Tablature file '{self.file_name}' doest not exist !")
 
         with open(self.file_name, 'r') as f:
-            lines = f.readlines()
-            for line in lines:
-                line = line.strip()
-                self.file.append(line)
+            self._file = [line.strip() for line in f]
 
     def _parse_file(self,):
-        self._debug("_parse_file()", self.DEBUG_DETAILED)
         """Parse tablature
         - Check each block has same count of strings
         - Check that strings count matches to instrument
         - Document block starts
         """
+        self._debug(self.DEBUG_DETAILED, "_parse_file()")
         cur_str_cnt = 0
         lst_str_cnt = 0
+        first_str_cnt = 0 # strings of the first block, the instrument ones
         lst_was_str = False
 
         cur_grp_start = 0
+        strings_blocks = []
+
+        # Checked once, so the loop doesn't pay for disabled debug
+        debug_structure = self.debug >= self.DEBUG_STRUCTURE
+        debug_hardcore = self.debug >= self.DEBUG_HARDCORE
 
         for line_idx, file_line in enumerate(self.file):
             line_no = line_idx + 1
-            self._debug(f"Line {line_no} '{file_line}'", self.DEBUG_STRUCTURE)
-            self._debug(
-                f"A: cur_str_cnt={cur_str_cnt} lst_str_cnt={lst_str_cnt} lst_was_str={lst_was_str}", 
-                self.DEBUG_HARDCORE,
-            )
+            if debug_structure:
+                self._debug(self.DEBUG_STRUCTURE, "Line %d '%s'", line_no, file_line)
+            if debug_hardcore:
+                self._debug(
+                    self.DEBUG_HARDCORE,
+                    "A: cur_str_cnt=%d lst_str_cnt=%d lst_was_str=%s",
+                    cur_str_cnt, lst_str_cnt, lst_was_str,
+                )
 
             if Tablature.is_tablature_line(file_line):
-                self._debug("-> tablature line", self.DEBUG_STRUCTURE)
+                if debug_structure:
+                    self._debug(self.DEBUG_STRUCTURE, "-> tablature line")
                 cur_str_cnt = (cur_str_cnt + 1) if lst_was_str else 1
                 cur_grp_start = cur_grp_start if lst_was_str else line_idx
                 lst_was_str = True
 
             elif lst_was_str: # end of line group
-                self._debug("-> line after tablature block", self.DEBUG_STRUCTURE)
+                if debug_structure:
+                    self._debug(self.DEBUG_STRUCTURE, "-> line after tablature block")
 
                 # Store lines group start
-                self.strings_blocks.append(cur_grp_start)
-                self._debug(f"-> group start added for line index {cur_grp_start}", self.DEBUG_DETAILED)
+                strings_blocks.append(cur_grp_start)
+                self._debug(self.DEBUG_DETAILED, "-> group start added for line index %d", cur_grp_start)
 
-                # Check that each block has as much strings as the previous one
+                # The first block must fit the instrument, the next ones have as much strings
+                if not first_str_cnt:
+                    first_str_cnt = cur_str_cnt
+                    self._check_instrument(cur_grp_start, first_str_cnt)
                 if lst_str_cnt and lst_str_cnt != cur_str_cnt:
                     raise self.InconsistentTablature(f"Inconsistent string count in file (line {line_no})")
 
@@ -104,96 +536,289 @@ class Tablature():
                 lst_str_cnt = cur_str_cnt
                 lst_was_str = False
             
-            else:
-                self._debug("-> other line", self.DEBUG_STRUCTURE)
+            elif debug_structure:
+                self._debug(self.DEBUG_STRUCTURE, "-> other line")
             
-            self._debug(
-                f"B: cur_str_cnt={cur_str_cnt} lst_str_cnt={lst_str_cnt} lst_was_str={lst_was_str}",
-                self.DEBUG_HARDCORE,
-            )
-
-        # Group start for last group
-        self.strings_blocks.append(cur_grp_start)
-        self._debug(f"-> group start added for line index {cur_grp_start} (outside loop)", self.DEBUG_DETAILED)
-        self._debug(f"Discovered strings blocks start indexes : {self.strings_blocks}", self.DEBUG_STRUCTURE)
-
-        # Store how many strings the instrument has
-        self.strings_count = lst_str_cnt
-
-        # Check that the chosen instrument matches
-        instr_strings = len(self.strings_base_notes)
-        if instr_strings != self.strings_count:
-            raise self.InstrumentBadStringCount(f"Wrong instrument ({instr_strings} strings instead of {self.strings_count})")
+            if debug_hardcore:
+                self._debug(
+                    self.DEBUG_HARDCORE,
+                    "B: cur_str_cnt=%d lst_str_cnt=%d lst_was_str=%s",
+                    cur_str_cnt, lst_str_cnt, lst_was_str,
+                )
+
+        # Last group, when the file ends on a string line
+        if lst_was_str:
+            strings_blocks.append(cur_grp_start)
+            self._debug(self.DEBUG_DETAILED, "-> group start added for line index %d (outside loop)", cur_grp_start)
+            if not first_str_cnt:
+                first_str_cnt = cur_str_cnt
+                self._check_instrument(cur_grp_start, first_str_cnt)
+            if lst_str_cnt and lst_str_cnt != cur_str_cnt:
+                raise self.InconsistentTablature(f"Inconsistent string count in file (line {line_no})")
+        self._debug(self.DEBUG_STRUCTURE, "Discovered strings blocks start indexes : %s", strings_blocks)
+
+        # No strings at all, no instrument fits
+        if not strings_blocks:
+            self._check_instrument(0, 0)
+
+        # Store how many strings the instrument has, and where blocks are
+        self._strings_count = first_str_cnt
+        self._strings_blocks = strings_blocks
     
+    def _check_instrument(self, block_start_idx, strings_count):
+        """Pick the instrument from the first block, or check the chosen one matches"""
+        if self.strings_base_notes is self.INST_AUTO:
+            block_lines = self.file[block_start_idx:block_start_idx + strings_count]
+            self.strings_base_notes = self._detect_instrument(block_lines)
+        instr_strings = len(self.strings_base_notes)
+        if instr_strings != strings_count:
+            raise self.InstrumentBadStringCount(f"Wrong instrument ({instr_strings} strings instead of {strings_count})")
+
     def _extract_frets(self,):
         """Extract frets data based"""
-        self._debug("_extract_frets()", self.DEBUG_DETAILED)
+        self._debug(self.DEBUG_DETAILED, "_extract_frets()")
+
+        memo = self.memo
+        hits = memo.hits if memo is not None else 0
+        extracted_frets = []
 
         for block_start_idx in self.strings_blocks:
             block_end_idx = block_start_idx + self.strings_count
+            block_lines = self.file[block_start_idx:block_end_idx]
 
-            block_frets = {
-                K_FR_IDX : set(), # Fret indexes for all group lines
-                K_FR_DET : collections.OrderedDict(), # Fret indexes per line
-                K_FR_BLK : block_start_idx,
-            }
+            if memo is None:
+                block_frets = Tablature.get_block_frets(block_lines, block_start_idx)
+            else:
+                key = memo.key(block_lines, self.strings_base_notes)
+                entry = memo.get(key)
+                if entry is not None:
+                    block_frets = entry[0].moved(block_start_idx)
+                else:
+                    block_frets = Tablature.get_block_frets(block_lines, block_start_idx)
+                    memo.put(key, block_frets)
 
-            for str_idx, file_line in enumerate(self.file[block_start_idx:block_end_idx]):
-                str_no = str_idx + 1
-                self._debug(f"String {str_no} '{file_line}'", self.DEBUG_NOTES)
-                frets = Tablature.get_line_frets(file_line)
-                self._debug(f"-> frets : {frets}", self.DEBUG_NOTES)
+            extracted_frets.append(block_frets)
 
-                block_frets[K_FR_DET][str_no] = frets
+            self._debug(self.DEBUG_NOTES, "Block %d frets: %s", block_start_idx, block_frets)
+        self._extracted_frets = extracted_frets
 
-                # Document all pressed frets indexes from the block
-                for note_idx in block_frets[K_FR_DET][str_no]:
-                    block_frets[K_FR_IDX].add(note_idx)
-            
-            self.extracted_frets.append(block_frets)
-
-            self._debug(f"Block {block_start_idx} frets: {block_frets[K_FR_IDX]}", self.DEBUG_NOTES)
+        if memo is not None:
+            hits = memo.hits - hits
+            self._count(COUNT_MEMO_HITS, hits)
+            self._count(COUNT_MEMO_MISSES, len(self.strings_blocks) - hits)
 
     def midi_notes(self,):
         """Convert frets list into midi notes"""
-        self._debug("_midi_notes()", self.DEBUG_DETAILED)
+        self._debug(self.DEBUG_DETAILED, "_midi_notes()")
         retval = []
 
-        # Put notes in same order as tablature lines
+        # Put notes in same order as tablature lines, once the instrument is known
+        self._parse_structure()
         strings_notes = list(self.strings_base_notes)
         strings_notes.reverse()
 
-        self._debug(f"Base strings MIDI notes: {strings_notes}", self.DEBUG_NOTES)
+        self._debug(self.DEBUG_NOTES, "Base strings MIDI notes: %s", strings_notes)
 
         # Extract the real notes from frets positions
-        for block_frets in self.extracted_frets:
-            # All the notes of the current group
-            block_midi_notes = []
-
-            block_start_idx = block_frets[K_FR_BLK]
+        with self._stage(STAGE_MIDI):
+            for block_frets in self.extracted_frets:
+                block_midi_notes = self._block_midi_notes(block_frets, strings_notes)
+                self._debug(self.DEBUG_NOTES, "Block %d MIDI notes: %s", block_frets.start_idx, block_midi_notes)
+                retval.append(block_midi_notes)
+        self._count(STAGE_MIDI, sum(map(len, self.extracted_frets)))
 
-            for note_idx in sorted(list(block_frets[K_FR_IDX])):
-                # All the notes at this position in the current group
-                string_midi_notes = []
-                
-                for string_idx in range(1, self.strings_count+1):
-                    string_base_note = strings_notes[string_idx-1]
-
-                    # Do we have a note at this position in the current line ?
-                    fret = block_frets[K_FR_DET][string_idx].get(note_idx)
+        return retval
 
-                     # There is a fret pressed at this position on this line
-                    if fret is not None: # fret can be 0 !    
-                        midi_note = string_base_note + fret
-                        string_midi_notes.append(midi_note)
+    def slice_bars(self, start, end):
+        """MIDI notes of bars start to end (numbered from 1, end included)
 
-                block_midi_notes.append(string_midi_notes)
+        Same layout as midi_notes(), with the blocks holding these bars. Only
+        these bars columns are read and converted. end is clipped to the bars
+        count.
+        """
+        self._debug(self.DEBUG_DETAILED, "slice_bars(%d, %d)", start, end)
+        if start < 1 or end < start:
+            raise ValueError(f"Bars {start}-{end} aren't a range of bars, numbered from 1")
+        if start > len(self.bars):
+            raise ValueError(f"'{self.file_name}' has only {len(self.bars)} bars")
+
+        strings_notes = list(reversed(self.strings_base_notes))
+        # Consecutive bars of a block are read at once
+        spans = []
+        for block_idx, block_bars in itertools.groupby(self.bars[start-1:end], key=operator.itemgetter(0)):
+            block_bars = list(block_bars)
+            spans.append((block_idx, block_bars[0][1], block_bars[-1][2]))
 
-            self._debug(f"Block {block_start_idx} MIDI notes: {block_midi_notes}", self.DEBUG_NOTES)
-            retval.append(block_midi_notes)
+        retval = []
+        with self._stage(STAGE_MIDI):
+            blocks_lines = self._blocks_lines([block_idx for block_idx, _, _ in spans])
+            for (block_idx, start_column, end_column), block_lines in zip(spans, blocks_lines):
+                block_frets = Tablature.get_block_frets(
+                    [line[start_column:end_column] for line in block_lines], self.strings_blocks[block_idx],
+                )
+                retval.append(Tablature.get_block_midi_notes(block_frets, strings_notes))
+        self._count(STAGE_MIDI, sum(len(chord) for block_notes in retval for chord in block_notes))
 
         return retval
 
+    def _blocks_lines(self, blocks_indexes):
+        """String lines of some blocks, read at their offsets when the text isn't loaded"""
+        if self._file is not None or self._blocks_offsets is None:
+            return [
+                self.file[self.strings_blocks[block_idx]:self.strings_blocks[block_idx] + self.strings_count]
+                for block_idx in blocks_indexes
+            ]
+
+        blocks_lines = []
+        with open(self.file_name, 'rb') as f:
+            for block_idx in blocks_indexes:
+                f.seek(self._blocks_offsets[block_idx])
+                # Same decoding and line ends as _load_file()
+                text = io.TextIOWrapper(f)
+                blocks_lines.append([text.readline().strip() for _ in range(self.strings_count)])
+                text.detach()
+        return blocks_lines
+
+    def save_bars_index(self, path, stat):
+        """Save the bars index, stat being the tablature os.stat() before it was read"""
+        BarsIndex(
+            self.strings_count,
+            self.strings_base_notes,
+            self.strings_blocks,
+            lines_offsets(self.file_name, self.strings_blocks),
+            self.bars,
+            self.PARSER_VERSION,
+            stat,
+        ).save(path)
+
+    @classmethod
+    def open_indexed(cls, file_name, inst_strings, debug=DEBUG_OFF, stats=None):
+        """Tablature ready for slice_bars(), from its bars index when it's current
+
+        The tablature isn't read then, its structure and bars come from the
+        index. Otherwise the structure is parsed, and the index saved next to
+        the file for the next time, if the directory is writable.
+        """
+        if not os.path.exists(file_name):
+            raise ValueError(f"Tablature file '{file_name}' doest not exist !")
+        stat = os.stat(file_name)
+        path = index_path(file_name)
+
+        try:
+            index = BarsIndex.load(path)
+        except (OSError, ValueError):
+            index = None
+        if (
+            index is not None
+            and index.is_current(stat, cls.PARSER_VERSION)
+            and (inst_strings is cls.INST_AUTO or tuple(inst_strings) == index.inst_strings)
+        ):
+            tab = cls(file_name, index.inst_strings, debug=debug, stats=stats)
+            tab._strings_count = index.strings_count
+            tab._strings_blocks = list(index.blocks_lines)
+            tab._blocks_offsets = index.blocks_offsets
+            tab._bars = index.bars
+            return tab
+
+        tab = cls(file_name, inst_strings, debug=debug, stats=stats)
+        tab.check()
+        try:
+            tab.save_bars_index(path, stat)
+        except OSError as exc:
+            tab._debug(cls.DEBUG_DETAILED, "Bars index not saved: %s", exc)
+        return tab
+
+    def chord_names(self, lang_idx=IDX_ENG):
+        """Chords names, same layout as midi_notes()
+
+        Single notes and unknown chords are None.
+        """
+        return [[chord_name(chord, lang_idx) for chord in block_notes] for block_notes in self.midi_notes()]
+
+    def _block_midi_notes(self, block_frets, strings_notes):
+        """A block MIDI notes, from the memo when it's there"""
+        if self.memo is None:
+            return Tablature.get_block_midi_notes(block_frets, strings_notes)
+
+        block_lines = self.file[block_frets.start_idx:block_frets.start_idx + self.strings_count]
+        entry = self.memo.peek(self.memo.key(block_lines, self.strings_base_notes))
+        if entry is None:
+            return Tablature.get_block_midi_notes(block_frets, strings_notes)
+
+        if entry[1] is None:
+            entry[1] = Tablature.get_block_midi_notes(block_frets, strings_notes)
+        return entry[1]
+
+    @classmethod
+    def iter_blocks(cls, fileobj, inst_strings):
+        """Stream a tablature from a text file object, in a single pass
+
+        Structure detection, string count checks and frets extraction are done
+        line by line, and each block MIDI notes are yielded as soon as its last
+        string line is read. Only the current block is kept in memory.
+        With INST_AUTO, the instrument is picked on the first block.
+        """
+        strings_notes = None
+
+        block_lines = [] # string lines of the current block
+        block_start_idx = 0
+        strings_count = 0 # strings count of the first block
+        line_idx = -1
+
+        for line_idx, file_line in enumerate(fileobj):
+            file_line = file_line.strip()
+
+            if cls.is_tablature_line(file_line):
+                if not block_lines:
+                    block_start_idx = line_idx
+                block_lines.append(file_line)
+                continue
+
+            if not block_lines:
+                continue
+
+            # End of line group
+            if strings_notes is None:
+                if inst_strings is cls.INST_AUTO:
+                    inst_strings = cls._detect_instrument(block_lines)
+                strings_notes = list(reversed(inst_strings))
+            strings_count = cls._check_block(block_lines, strings_count, inst_strings, line_idx + 1)
+            yield cls.get_block_midi_notes(cls.get_block_frets(block_lines, block_start_idx), strings_notes)
+            block_lines = []
+
+        # Last group when the file ends on a string line
+        if block_lines:
+            if strings_notes is None:
+                if inst_strings is cls.INST_AUTO:
+                    inst_strings = cls._detect_instrument(block_lines)
+                strings_notes = list(reversed(inst_strings))
+            cls._check_block(block_lines, strings_count, inst_strings, line_idx + 1)
+            yield cls.get_block_midi_notes(cls.get_block_frets(block_lines, block_start_idx), strings_notes)
+
+    @classmethod
+    def _detect_instrument(cls, block_lines):
+        """Tuning of the registered instrument matching a block"""
+        detected = detect_instrument(block_lines)
+        if detected is None:
+            raise cls.InstrumentBadStringCount(f"No known instrument with {len(block_lines)} strings")
+        logger.debug("Detected instrument %s", detected[0])
+        return detected[1]
+
+    @classmethod
+    def _check_block(cls, block_lines, strings_count, inst_strings, line_no):
+        """Check a streamed block against the previous ones, return strings count"""
+        if not strings_count:
+            # First block gives the strings count, which must match the instrument
+            instr_strings = len(inst_strings)
+            if instr_strings != len(block_lines):
+                raise cls.InstrumentBadStringCount(f"Wrong instrument ({instr_strings} strings instead of {len(block_lines)})")
+            return len(block_lines)
+
+        if strings_count != len(block_lines):
+            raise cls.InconsistentTablature(f"Inconsistent string count in file (line {line_no})")
+
+        return strings_count
+
     # Static methods
     @staticmethod
     def is_tablature_line(line):
@@ -202,27 +827,43 @@ class Tablature():
         return line.count(TAB_CHAR) > TAB_CHAR_MIN_OCCURENCE
 
     @staticmethod
-    def get_line_frets(line):
-        """Extract frets from line"""
-        frets = collections.OrderedDict()
+    def get_block_frets(block_lines, block_start_idx=0):
+        """Extract frets from the string lines of a block"""
+        columns, strings, frets = scan_block_frets(block_lines)
+        return FretsBlock(block_start_idx, len(block_lines), columns, strings, frets)
+
+    @staticmethod
+    def get_block_midi_notes(block_frets, strings_notes):
+        """Convert a block frets into MIDI notes, grouped by position
 
-        for match in re.finditer(RE_INT, line):
-            note_idx = match.start()
-            fret = match.group()
+        strings_notes are the strings base notes in tablature lines order
+        (high to low).
+        """
+        return block_frets.midi_notes(strings_notes)
 
-            # WORKAROUND when a fret is like 7777777777777
-            if fret.count(fret[0]) == len(fret):
-                fret = fret[0]
-            
-            frets[note_idx] = int(fret)
-        
-        return frets
+    @staticmethod
+    def get_line_frets(line):
+        """Extract frets from line, as {column: fret}"""
+        columns, _, frets = scan_block_frets([line])
+        return collections.OrderedDict(zip(columns, frets))
 
     # Debugging output
-    def _debug(self, message, level=1):
-        """Print debug message if debug enabled"""
+    def _debug(self, level, message, *args):
+        """Log debug message if debug enabled, formatted only in that case"""
         if self.debug >= level:
-            print(f"DEBUG: {message}")
+            logger.debug(message, *args)
+
+    # Stages instrumentation
+    def _stage(self, stage):
+        """Context measuring a stage, if stats are enabled"""
+        if self.stats is None:
+            return contextlib.nullcontext()
+        return self.stats.stage(stage)
+
+    def _count(self, stage, count):
+        """Count items processed by a stage, if stats are enabled"""
+        if self.stats is not None:
+            self.stats.count(stage, count)
 
     # Exceptions
     class InconsistentTablature(Exception):
@@ -0,0 +1,115 @@
+"""
+Per-stage timing instrumentation
+"""
+import collections
+import contextlib
+import time
+
+# Processing stages, in pipeline order
+STAGE_LOAD = 'load'
+STAGE_STRUCTURE = 'structure'
+STAGE_FRETS = 'frets'
+STAGE_MIDI = 'midi'
+STAGE_NAMING = 'naming'
+STAGE_OUTPUT = 'output'
+
+STAGES = (
+    STAGE_LOAD,
+    STAGE_STRUCTURE,
+    STAGE_FRETS,
+    STAGE_MIDI,
+    STAGE_NAMING,
+    STAGE_OUTPUT,
+)
+
+# Counters that aren't stages
+COUNT_MEMO_HITS = 'memo hits'
+COUNT_MEMO_MISSES = 'memo misses'
+
+COUNTERS = (
+    COUNT_MEMO_HITS,
+    COUNT_MEMO_MISSES,
+)
+
+# What is counted in each stage
+STAGES_UNITS = {
+    STAGE_LOAD: 'lines',
+    STAGE_STRUCTURE: 'blocks',
+    STAGE_FRETS: 'frets',
+    STAGE_MIDI: 'notes',
+    STAGE_NAMING: 'notes',
+    STAGE_OUTPUT: 'lines',
+}
+
+class StageStats():
+    """Wall time, CPU time and processed items count per stage
+
+    Stats from several files or processes can be added together with merge().
+    A stage nested in another one is only counted in the inner stage, so
+    stages times add up to the measured time.
+    """
+
+    def __init__(self):
+        """Constructor"""
+        self.wall = collections.defaultdict(float)
+        self.cpu = collections.defaultdict(float)
+        self.counts = collections.defaultdict(int)
+        self._nested = [] # [wall, cpu] of the stages nested in each running stage
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """Measure the time spent in the with block"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self._nested.append([0.0, 0.0])
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            nested_wall, nested_cpu = self._nested.pop()
+            self.wall[stage] += wall - nested_wall
+            self.cpu[stage] += cpu - nested_cpu
+            if self._nested:
+                self._nested[-1][0] += wall
+                self._nested[-1][1] += cpu
+
+    def count(self, stage, count):
+        """Add processed items to a stage"""
+        self.counts[stage] += count
+
+    def merge(self, other):
+        """Add other stats to these ones"""
+        for stage, value in other.wall.items():
+            self.wall[stage] += value
+        for stage, value in other.cpu.items():
+            self.cpu[stage] += value
+        for stage, value in other.counts.items():
+            self.counts[stage] += value
+
+    def report(self, total_wall=None):
+        """Human readable report lines
+
+        Throughput is computed over total_wall when given (the whole run wall
+        time), otherwise over the sum of the stages wall times.
+        """
+        lines = [f"{'stage':10} {'wall ms':>10} {'cpu ms':>10} {'count':>10}"]
+        for stage in STAGES:
+            if stage not in self.wall and stage not in self.counts:
+                continue
+            lines.append(
+                f"{stage:10} {self.wall[stage] * 1000:10.1f} {self.cpu[stage] * 1000:10.1f} "
+                f"{self.counts[stage]:10} {STAGES_UNITS[stage]}"
+            )
+
+        for counter in COUNTERS:
+            if counter in self.counts:
+                lines.append(f"{counter}: {self.counts[counter]}")
+
+        if total_wall is None:
+            total_wall = sum(self.wall.values())
+        if total_wall:
+            lines.append(f"lines/s: {self.counts[STAGE_LOAD] / total_wall:.0f}")
+            lines.append(f"notes/s: {self.counts[STAGE_MIDI] / total_wall:.0f}")
+
+        return lines
@@ -0,0 +1,82 @@
+"""
+Transposition of converted MIDI notes, as a whole
+
+Notes are checked before anything is transposed, so a note leaving the MIDI
+range fails a file before any output. Range fitting picks the transposition
+from the pitch histogram of a file, every candidate offset being counted in
+constant time from its prefix sums.
+"""
+import collections
+import itertools
+
+from src.notes import MusicNote, MIDI_NOTES_COUNT, SCALE_SIZE
+
+RANGE_SEPARATOR = ':'
+
+def notes_range(midi_notes):
+    """Lowest and highest MIDI notes of blocks, None when there's no note"""
+    notes = [note for block_notes in midi_notes for chord in block_notes for note in chord]
+    if not notes:
+        return None
+    return min(notes), max(notes)
+
+def transpose(midi_notes, offset):
+    """Blocks MIDI notes transposed by offset half-tones
+
+    Raises ValueError when a note leaves the MIDI range, before transposing.
+    """
+    if not offset:
+        return midi_notes
+
+    extent = notes_range(midi_notes)
+    if extent is not None:
+        lowest, highest = extent
+        if lowest + offset < 0 or highest + offset >= MIDI_NOTES_COUNT:
+            raise ValueError(
+                f"Transposition by {offset} takes notes {lowest}..{highest} out of the MIDI range"
+            )
+
+    return [[[note + offset for note in chord] for chord in block_notes] for block_notes in midi_notes]
+
+def pitch_histogram(midi_notes):
+    """Notes count of each MIDI note"""
+    counts = collections.Counter(itertools.chain.from_iterable(itertools.chain.from_iterable(midi_notes)))
+    return [counts[note] for note in range(MIDI_NOTES_COUNT)]
+
+def best_offset(histogram, low, high, step=1):
+    """Transposition keeping the most notes between low and high MIDI notes
+
+    Offsets are multiples of step (SCALE_SIZE for octave shifts only), and keep
+    every note in the MIDI range. Ties go to keeping the key, then to the
+    smallest shift.
+    """
+    # prefix[n] is the count of notes below n
+    prefix = list(itertools.accumulate(histogram, initial=0))
+    used = [note for note, count in enumerate(histogram) if count]
+    if not used:
+        return 0
+
+    def in_range(offset):
+        first = max(low - offset, 0)
+        last = min(high - offset, MIDI_NOTES_COUNT - 1)
+        return prefix[last + 1] - prefix[first] if first <= last else 0
+
+    offsets = (
+        offset for offset in range(-used[0], MIDI_NOTES_COUNT - used[-1])
+        if offset % step == 0
+    )
+    return min(offsets, key=lambda offset: (-in_range(offset), offset % SCALE_SIZE != 0, abs(offset)))
+
+def fit_transposition(midi_notes, low, high, step=1):
+    """Transposition fitting blocks MIDI notes between low and high"""
+    return best_offset(pitch_histogram(midi_notes), low, high, step)
+
+def parse_range(text):
+    """(low, high) MIDI notes of a 'LOW:HIGH' notes names range, like 'E1:G3'"""
+    low, separator, high = text.partition(RANGE_SEPARATOR)
+    if not separator:
+        raise ValueError(f"Range '{text}' isn't like LOW{RANGE_SEPARATOR}HIGH")
+    low, high = MusicNote.names_to_midi([low.strip(), high.strip()])
+    if low > high:
+        raise ValueError(f"Range '{text}' is upside down")
+    return low, high
@@ -0,0 +1,146 @@
+"""
+Watch a tablatures directory and reconvert what changes
+Plain polling, so it works anywhere. Every scan only stats the files, hashing
+and conversion only happen for files whose size or modification time moved.
+"""
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_FILE = '.tabs2notes-manifest.json'
+DEFAULT_INTERVAL = 1.0 # seconds between scans
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class TabsWatcher():
+    """Keep an output directory in sync with a tablatures directory
+
+    convert(tab_file, out_file) writes the conversion of a tablature and
+    returns an error message or None. Outputs are named after the tablature
+    relative path, plus out_ext.
+    The manifest of (mtime, size, hash) per file is kept in the output
+    directory, so a restarted watcher doesn't reconvert everything.
+    """
+
+    def __init__(self, tabs_dir, output_dir, convert, out_ext):
+        """Constructor"""
+        self.tabs_dir = tabs_dir
+        self.output_dir = output_dir
+        self.convert = convert
+        self.out_ext = out_ext
+        self.manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+        self.manifest = self._load_manifest() # relative path -> [mtime_ns, size, sha256]
+
+    def scan(self):
+        """Reconvert added or changed files, drop outputs of deleted ones
+
+        Returns (converted, removed, errors), errors being (file, message).
+        """
+        converted = []
+        errors = []
+        seen = set()
+
+        for rel_path, stat in self._list_files():
+            seen.add(rel_path)
+            entry = self.manifest.get(rel_path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                continue # untouched
+
+            tab_file = os.path.join(self.tabs_dir, rel_path)
+            digest = self._hash(tab_file)
+            if digest is None:
+                continue # vanished meanwhile, next scan will tell
+            if entry and entry[2] == digest:
+                # Touched but same content
+                self.manifest[rel_path] = [stat.st_mtime_ns, stat.st_size, digest]
+                continue
+
+            out_file = self.out_path(rel_path)
+            os.makedirs(os.path.dirname(out_file), exist_ok=True)
+            error = self.convert(tab_file, out_file)
+            if error:
+                errors.append((rel_path, error))
+                self._remove_output(rel_path)
+            else:
+                converted.append(rel_path)
+            self.manifest[rel_path] = [stat.st_mtime_ns, stat.st_size, digest]
+
+        removed = sorted(set(self.manifest) - seen)
+        for rel_path in removed:
+            self._remove_output(rel_path)
+            del self.manifest[rel_path]
+
+        if converted or removed or errors:
+            self._save_manifest()
+
+        return converted, removed, errors
+
+    def run(self, report, interval=DEFAULT_INTERVAL):
+        """Scan forever, report(converted, removed, errors) after each scan"""
+        while True:
+            report(*self.scan())
+            time.sleep(interval)
+
+    def out_path(self, rel_path):
+        """Output file of a tablature"""
+        return os.path.join(self.output_dir, rel_path + self.out_ext)
+
+    def _list_files(self):
+        """(relative path, stat) of all the non hidden tablatures"""
+        output_dir = os.path.abspath(self.output_dir)
+        stack = [self.tabs_dir]
+
+        while stack:
+            dir_name = stack.pop()
+            try:
+                entries = list(os.scandir(dir_name))
+            except OSError:
+                continue
+
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) != output_dir:
+                        stack.append(entry.path)
+                elif entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield os.path.relpath(entry.path, self.tabs_dir), stat
+
+    def _remove_output(self, rel_path):
+        """Remove a tablature output, if any"""
+        try:
+            os.remove(self.out_path(rel_path))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _hash(file_name):
+        """Content hash, None if the file is gone"""
+        digest = hashlib.sha256()
+        try:
+            with open(file_name, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()
+
+    def _load_manifest(self):
+        """Manifest from a previous run"""
+        try:
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        """Write the manifest atomically"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_file, self.manifest_file)
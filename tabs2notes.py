@@ -1,7 +1,30 @@
 #!/usr/bin/env python
 import argparse
-from src.tablature import Tablature
-from src.notes import MusicNote
+import asyncio
+import functools
+import logging
+import os
+import sys
+import time
+from src.batch import expand_paths, map_files
+from src.archive import map_inputs, member_stream, is_archive
+from src.parallel import parallel_midi_notes
+from src.cache import ParseCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE
+from src.memo import shared_memo, DEFAULT_MAX_BLOCKS
+from src.tablature import Tablature, BINARY_EXT
+from src.instruments import INSTRUMENTS, INST_CHOICES, INST_AUTO, INST_BASS4, parse_tuning
+from src.notes import MusicNote, SCALE_SIZE
+from src.output import WRITERS, FORMAT_CHOICES, FORMAT_EXTENSIONS, FORMAT_TEXT, open_output
+from src.timing import StageStats, STAGE_OUTPUT
+from src.server import ConversionServer, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_PENDING
+from src.watch import TabsWatcher, DEFAULT_INTERVAL
+from src.riff import RiffIndex, DEFAULT_INDEX_FILE, DEFAULT_RESULTS
+from src.audio import WavWriter, DEFAULT_NOTE_LENGTH
+from src.fingering import notes_to_tab, parse_chords, LINE_WIDTH, MAX_FRET
+from src.corpus import CorpusStats, file_stats, DEFAULT_STATS_FILE
+from src.dedupe import SignaturesIndex, file_signature, DEFAULT_SIGNATURES_FILE, DEFAULT_THRESHOLD
+from src.transpose import transpose, fit_transposition, parse_range, RANGE_SEPARATOR
+from src.bars import parse_bars, BARS_SEPARATOR, BARS_EXT
 
 # Notes naming
 NOTE_ENGLISH = 'english'
@@ -14,18 +37,34 @@ NOTE_CHOICES = [
     NOTE_GERMAN,
 ]
 
-# Instrument
-INST_GUITAR6 = 'guitar6'
-INST_BASS4 = 'bass4'
+NOTE_NAMINGS = {
+    NOTE_ENGLISH: MusicNote.ENGLISH,
+    NOTE_LATIN: MusicNote.LATIN,
+    NOTE_GERMAN: MusicNote.GERMAN,
+}
 
-INST_CHOICES = [
-    INST_BASS4,
-    INST_GUITAR6,
-]
+# Instrument, auto picks it from each tablature
+AUTO_INSTRUMENTS = dict(INSTRUMENTS, **{INST_AUTO: Tablature.INST_AUTO})
+AUTO_INST_CHOICES = INST_CHOICES + [INST_AUTO]
+
+# Frets counted above the highest string for an instrument range
+FIT_FRETS = 24
+
+# Check mode exit codes, a batch exits with its first failure code
+CHECK_OK = 0
+CHECK_INCONSISTENT = 1
+CHECK_BAD_INSTRUMENT = 3
+CHECK_UNREADABLE = 4
+
+# Read tablature from standard input
+STDIN_FILE = '-'
+
+# Where watch mode writes by default
+WATCH_OUTPUT_DIR = 'notes'
 
 def init_argparse():
     parser = argparse.ArgumentParser(
-        usage="%(prog)s [OPTIONS] [FILE]",
+        usage=f"%(prog)s [OPTIONS] FILE [FILE ...]\n       %(prog)s {{{','.join(COMMANDS)}}} [OPTIONS]",
         description="Convert a tablature to note names",
     )
     parser.add_argument(
@@ -34,6 +73,37 @@ def init_argparse():
         type=int,
         default=0,
     )
+    parser.add_argument(
+        "--check",
+        help=(
+            "Only check files structure, no output. Exit code is "
+            f"{CHECK_OK} when all files are fine, {CHECK_INCONSISTENT} for an inconsistent tablature, "
+            f"{CHECK_BAD_INSTRUMENT} for another instrument, {CHECK_UNREADABLE} for an unreadable file"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--fit",
+        help=(
+            f"Transpose each file to keep most notes in a LOW{RANGE_SEPARATOR}HIGH range, like 'E1{RANGE_SEPARATOR}G3', "
+            f"or in the range of an instrument ({', '.join(INST_CHOICES)})"
+        ),
+        metavar="RANGE",
+    )
+    parser.add_argument(
+        "--fit-octaves",
+        help="Only shift by octaves when fitting, keeping the key",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--bars",
+        help=(
+            f"Only convert bars START{BARS_SEPARATOR}END (or a single bar), numbered from 1. "
+            f"Bar lines positions are kept in a hidden '{BARS_EXT}' index next to each file, "
+            "so only these bars are read the next times"
+        ),
+        metavar="RANGE",
+    )
     parser.add_argument(
         "-n", "--naming",
         help="Language in which notes will be displayed",
@@ -42,9 +112,13 @@ def init_argparse():
     )
     parser.add_argument(
         "-i", "--instrument",
-        help="Instrument the tablature is written for",
+        help=f"Instrument the tablature is written for, '{INST_AUTO}' picks it from each tablature",
         default=INST_BASS4,
-        choices=INST_CHOICES,
+        choices=AUTO_INST_CHOICES,
+    )
+    parser.add_argument(
+        "--tuning",
+        help="Custom strings notes, low to high, like 'D2,A2,D3,G3', instead of an instrument",
     )
     parser.add_argument(
         "-d", "--debug",
@@ -53,56 +127,857 @@ def init_argparse():
         type=int,
         choices=range(0,5),
     )
-    parser.add_argument('file', nargs=1)
+    parser.add_argument(
+        "-j", "--jobs",
+        help="Number of processes converting files in parallel (0 for all CPUs), a single file is split by blocks",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "-T", "--timing",
+        help="Report per-file and total wall time on stderr",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c", "--chords",
+        help="Display chords names (power chords, triads, sevenths...) instead of their notes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-f", "--format",
+        help="Output format",
+        default=FORMAT_TEXT,
+        choices=FORMAT_CHOICES,
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help=f"Output file, instead of stdout (output directory in watch mode, default '{WATCH_OUTPUT_DIR}')",
+    )
+    parser.add_argument(
+        "--render",
+        help="Also synthesize the notes into a WAV file, an audio preview",
+        metavar="WAV_FILE",
+    )
+    parser.add_argument(
+        "--note-length",
+        help="Seconds each chord lasts in the audio preview",
+        default=DEFAULT_NOTE_LENGTH,
+        type=float,
+    )
+    parser.add_argument(
+        "-w", "--watch",
+        help="Watch a tablatures directory, reconverting files when they change",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--interval",
+        help="Seconds between two watch mode scans",
+        default=DEFAULT_INTERVAL,
+        type=float,
+    )
+    parser.add_argument(
+        "--stats",
+        help="Report wall/CPU time and counts per processing stage on stderr",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--memo-size",
+        help="Identical blocks memoized per process, 0 disables it",
+        default=DEFAULT_MAX_BLOCKS,
+        type=int,
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory where parsed tablatures are cached",
+        default=DEFAULT_CACHE_DIR,
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Maximum cache size in MB, least recently used entries are evicted",
+        default=DEFAULT_MAX_SIZE // (1024 * 1024),
+        type=int,
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="Don't use the parsed tablatures cache",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        help="Empty the parsed tablatures cache before converting",
+        action="store_true",
+    )
+    parser.add_argument(
+        'file',
+        nargs='*',
+        help="Tablature files, directories, glob patterns or zip and tar archives, or '-' to stream from stdin",
+    )
+    return parser
+
+def init_serve_argparse():
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} serve",
+        description="Run a conversion server, speaking JSON lines (see src/server.py)",
+    )
+    parser.add_argument("--host", help="Listening address", default=DEFAULT_HOST)
+    parser.add_argument("-p", "--port", help="Listening TCP port", default=DEFAULT_PORT, type=int)
+    parser.add_argument("-u", "--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument(
+        "-w", "--workers",
+        help="Conversion processes (default: all CPUs)",
+        type=int,
+    )
+    parser.add_argument(
+        "--max-pending",
+        help="Requests converted or waiting for a worker before clients are throttled",
+        default=DEFAULT_MAX_PENDING,
+        type=int,
+    )
+    parser.add_argument(
+        "-n", "--naming",
+        help="Language of notes when the request doesn't tell",
+        default=NOTE_LATIN,
+        choices=NOTE_CHOICES,
+    )
+    parser.add_argument(
+        "-i", "--instrument",
+        help="Instrument when the request doesn't tell",
+        default=INST_BASS4,
+        choices=AUTO_INST_CHOICES,
+    )
+    return parser
+
+def serve(argv):
+    """The conversion server"""
+    args = init_serve_argparse().parse_args(argv)
+    server = ConversionServer(
+        AUTO_INSTRUMENTS,
+        NOTE_NAMINGS,
+        default_instrument=args.instrument,
+        default_naming=args.naming,
+        workers=args.workers,
+        max_pending=args.max_pending,
+    )
+    address = args.unix or f"{args.host}:{args.port}"
+    print(f"Listening on {address}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+def init_index_argparse():
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} index",
+        description="Add tablatures to the riff search index, only new or changed files are parsed",
+    )
+    parser.add_argument("--db", help="Index file", default=DEFAULT_INDEX_FILE)
+    parser.add_argument(
+        "-i", "--instrument",
+        help="Instrument of the tablatures",
+        default=INST_AUTO,
+        choices=AUTO_INST_CHOICES,
+    )
+    parser.add_argument("--prune", help="Drop indexed files that don't exist anymore", action="store_true")
+    parser.add_argument('file', nargs='*', help="Tablature files, directories or glob patterns")
+    return parser
+
+def index(argv):
+    """Build or update the riff search index"""
+    args = init_index_argparse().parse_args(argv)
+    inst_strings = AUTO_INSTRUMENTS[args.instrument]
+    riff_index = RiffIndex(args.db)
+    indexed = 0
+
+    try:
+        if args.prune:
+            for path in riff_index.prune():
+                print(f"removed {path}", file=sys.stderr)
+
+        for tab_file in expand_paths(args.file):
+            tab_path = os.path.abspath(tab_file)
+            if is_database_file(tab_path, args.db):
+                continue
+            try:
+                stat = os.stat(tab_path)
+            except OSError as exc:
+                print(f"{tab_file}: {exc.strerror}", file=sys.stderr)
+                continue
+            if riff_index.is_current(tab_path, stat, inst_strings):
+                continue
+
+            midi_notes, error = tab_midi_notes(tab_path, inst_strings)
+            if error:
+                print(f"{tab_file}: {error}", file=sys.stderr)
+                continue
+            riff_index.add_file(tab_path, stat, midi_notes, inst_strings)
+            indexed += 1
+    finally:
+        riff_index.close()
+
+    print(f"{indexed} files indexed", file=sys.stderr)
+
+def init_search_argparse():
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} search",
+        description="Find tablatures containing a riff, in any key",
+    )
+    parser.add_argument("--db", help="Index file", default=DEFAULT_INDEX_FILE)
+    riff = parser.add_mutually_exclusive_group(required=True)
+    riff.add_argument("--notes", help="Riff as notes names, like 'E2 G2 A2 E2 G2 A#2 A2'")
+    riff.add_argument("--tab", help="Riff as a tablature snippet file, '-' for stdin")
+    parser.add_argument("-l", "--limit", help="Maximum results count", default=DEFAULT_RESULTS, type=int)
+    return parser
+
+def search(argv):
+    """Search a riff in the index"""
+    parser = init_search_argparse()
+    args = parser.parse_args(argv)
+
+    if args.notes:
+        try:
+            pitches = MusicNote.names_to_midi(args.notes.replace(',', ' ').split())
+        except ValueError as exc:
+            parser.error(str(exc))
+    else:
+        tab_file = sys.stdin if args.tab == STDIN_FILE else args.tab
+        midi_notes, error = tab_midi_notes(tab_file, Tablature.INST_AUTO)
+        if error:
+            parser.error(error)
+        pitches = [max(chord) for block in midi_notes for chord in block if chord]
+
+    riff_index = RiffIndex(args.db)
+    try:
+        results = riff_index.search(pitches, args.limit)
+    except ValueError as exc:
+        parser.error(str(exc))
+    finally:
+        riff_index.close()
+
+    for score, path, block, chord in results:
+        print(f"{score:.2f} {path} block {block + 1} chord {chord + 1}")
+
+def init_pack_argparse():
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} pack",
+        description=f"Save parsed tablatures as binary '{BINARY_EXT}' files, converted later without parsing",
+    )
+    parser.add_argument(
+        "-i", "--instrument",
+        help="Instrument of the tablatures",
+        default=INST_BASS4,
+        choices=AUTO_INST_CHOICES,
+    )
+    parser.add_argument("-o", "--output", help="Output directory (default: next to each tablature)")
+    parser.add_argument('file', nargs='+', help="Tablature files, directories or glob patterns")
+    return parser
+
+def pack(argv):
+    """Save tablatures in the binary format"""
+    args = init_pack_argparse().parse_args(argv)
+    inst_strings = AUTO_INSTRUMENTS[args.instrument]
+    failures = 0
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    for tab_file in expand_paths(args.file):
+        bin_file = os.path.splitext(tab_file)[0] + BINARY_EXT
+        if args.output:
+            bin_file = os.path.join(args.output, os.path.basename(bin_file))
+        try:
+            Tablature(tab_file, inst_strings).save(bin_file)
+        except (Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature, ValueError) as exc:
+            failures += 1
+            print(f"{tab_file}: {exc}", file=sys.stderr)
+            continue
+        print(f"{tab_file} -> {bin_file}", file=sys.stderr)
+
+    if failures:
+        exit(1)
+
+def init_stats_argparse():
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} stats",
+        description="Corpus statistics: pitches, ranges, chords, frets per string and keys",
+    )
+    parser.add_argument(
+        "-i", "--instrument",
+        help="Instrument of the tablatures",
+        default=INST_BASS4,
+        choices=AUTO_INST_CHOICES,
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        help="Number of processes reading files (0 for all CPUs)",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Statistics JSON file, files it already counts are skipped",
+        default=DEFAULT_STATS_FILE,
+    )
+    parser.add_argument("--csv", help="Also write the statistics as CSV, '-' for stdout", metavar="FILE")
+    parser.add_argument(
+        "--merge",
+        help="Add the statistics of another JSON file, computed on other files",
+        action="append",
+        default=[],
+        metavar="FILE",
+    )
+    parser.add_argument("--rebuild", help="Count all the files again, ignoring the output content", action="store_true")
+    parser.add_argument('file', nargs='*', help="Tablature files, directories or glob patterns")
+    return parser
+
+def stats(argv):
+    """Compute corpus statistics, map in workers then reduce"""
+    parser = init_stats_argparse()
+    args = parser.parse_args(argv)
+
+    corpus = CorpusStats()
+    try:
+        if os.path.exists(args.output) and not args.rebuild:
+            corpus = CorpusStats.load(args.output)
+        for other_file in args.merge:
+            corpus.merge(CorpusStats.load(other_file))
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+
+    # Overlapping inputs, like 'tabs/ tabs/*.txt', are counted once
+    tab_files = list(dict.fromkeys(os.path.abspath(tab_file) for tab_file in expand_paths(args.file)))
+    new_files = [tab_file for tab_file in tab_files if tab_file not in corpus.files]
+    convert = functools.partial(file_stats, inst_strings=AUTO_INSTRUMENTS[args.instrument])
+    failures = 0
+
+    for tab_file, (file_corpus, error), _ in map_files(convert, new_files, args.jobs):
+        if error:
+            failures += 1
+            print(f"{tab_file}: {error}", file=sys.stderr)
+            continue
+        corpus.merge(file_corpus)
+
+    corpus.save(args.output)
+    if args.csv == STDIN_FILE:
+        corpus.write_csv(sys.stdout)
+    elif args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            corpus.write_csv(f)
+
+    print(
+        f"{len(new_files) - failures} files added, {len(tab_files) - len(new_files)} already counted, "
+        f"{len(corpus.files)} in {args.output}",
+        file=sys.stderr,
+    )
+    if failures:
+        exit(1)
+
+def init_dedupe_argparse():
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} dedupe",
+        description=(
+            "Find near-duplicate tablatures, in any key and whatever their layout. "
+            "Files are added to the signatures database, only new or changed ones are parsed, "
+            "then groups of near duplicates are printed, a blank line between groups"
+        ),
+    )
+    parser.add_argument("--db", help="Signatures file", default=DEFAULT_SIGNATURES_FILE)
+    parser.add_argument(
+        "-i", "--instrument",
+        help="Instrument of the tablatures",
+        default=INST_AUTO,
+        choices=AUTO_INST_CHOICES,
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        help="Number of processes reading files (0 for all CPUs)",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--threshold",
+        help="Similarity of near duplicates, from 0 to 1",
+        default=DEFAULT_THRESHOLD,
+        type=float,
+    )
+    parser.add_argument(
+        "--query",
+        help="Only report the near duplicates of the files in the database, without adding them. Exit code is 1 when some are found",
+        action="store_true",
+    )
+    parser.add_argument("--prune", help="Drop files that don't exist anymore", action="store_true")
+    parser.add_argument('file', nargs='*', help="Tablature files, directories or glob patterns")
+    return parser
+
+def dedupe(argv):
+    """Cluster near-duplicate tablatures, or check files against the corpus"""
+    parser = init_dedupe_argparse()
+    args = parser.parse_args(argv)
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be between 0 and 1")
+
+    inst_strings = AUTO_INSTRUMENTS[args.instrument]
+    signatures = functools.partial(file_signature, inst_strings=inst_strings)
+    signatures_index = SignaturesIndex(args.db)
+    failures = 0
+    added = 0
+    found = False
+
+    try:
+        if args.prune:
+            for path in signatures_index.prune():
+                print(f"removed {path}", file=sys.stderr)
+
+        tab_files = [
+            os.path.abspath(tab_file) for tab_file in expand_paths(args.file)
+            if not is_database_file(tab_file, args.db)
+        ]
+        files_stats = {}
+        if not args.query:
+            for tab_file in tab_files:
+                try:
+                    files_stats[tab_file] = os.stat(tab_file)
+                except OSError as exc:
+                    failures += 1
+                    print(f"{tab_file}: {exc.strerror}", file=sys.stderr)
+            tab_files = [
+                tab_file for tab_file, stat in files_stats.items()
+                if not signatures_index.is_current(tab_file, stat, inst_strings)
+            ]
+
+        for tab_file, (signature, error), _ in map_files(signatures, tab_files, args.jobs):
+            if error:
+                failures += 1
+                print(f"{tab_file}: {error}", file=sys.stderr)
+            elif args.query:
+                for score, path in signatures_index.query(signature, args.threshold):
+                    if path != tab_file:
+                        found = True
+                        print(f"{tab_file}: {score:.2f} {path}")
+            else:
+                signatures_index.add_file(tab_file, files_stats[tab_file], signature, inst_strings)
+                added += 1
+
+        if not args.query:
+            groups = signatures_index.clusters(args.threshold)
+            if groups:
+                print("\n\n".join("\n".join(paths) for paths in groups))
+            print(
+                f"{added} files added, {len(groups)} groups of near duplicates "
+                f"in {signatures_index.files_count()} files",
+                file=sys.stderr,
+            )
+    finally:
+        signatures_index.close()
+
+    if found or failures:
+        exit(1)
+
+def init_tab_argparse():
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} tab",
+        description="Write the tablature of notes, with the least hand movement and stretch",
+    )
+    parser.add_argument(
+        "-i", "--instrument",
+        help="Instrument to play the notes on",
+        default=INST_BASS4,
+        choices=INST_CHOICES,
+    )
+    parser.add_argument("--tuning", help="Custom strings notes, low to high, like 'D2,A2,D3,G3', instead of an instrument")
+    parser.add_argument(
+        "-f", "--file",
+        help="Notes file, a block per line like the text output, '-' for stdin",
+    )
+    parser.add_argument("-o", "--output", help="Output file, instead of stdout")
+    parser.add_argument("-w", "--width", help="Tablature lines width", default=LINE_WIDTH, type=int)
+    parser.add_argument("--max-fret", help="Highest fret of the instrument", default=MAX_FRET, type=int)
+    parser.add_argument(
+        'notes',
+        nargs='*',
+        help="Notes names or MIDI numbers, chords notes joined by '+', like 'E2 A2+E3 G2'",
+    )
     return parser
 
+def tab(argv):
+    """Notes to tablature"""
+    parser = init_tab_argparse()
+    args = parser.parse_args(argv)
+    if bool(args.notes) == bool(args.file):
+        parser.error("Give either notes or a notes file")
+
+    inst_strings = INSTRUMENTS[args.instrument]
+    try:
+        if args.tuning:
+            inst_strings = parse_tuning(args.tuning)
+
+        if args.notes:
+            lines = [" ".join(args.notes)]
+        elif args.file == STDIN_FILE:
+            lines = sys.stdin.readlines()
+        else:
+            with open(args.file) as f:
+                lines = f.readlines()
+        blocks_chords = [parse_chords(line) for line in lines if line.strip()]
+
+        text = notes_to_tab(blocks_chords, inst_strings, args.width, args.max_fret)
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+def instrument_range(inst_strings):
+    """(low, high) MIDI notes an instrument can play"""
+    return min(inst_strings), max(inst_strings) + FIT_FRETS
+
+def is_database_file(path, db_file):
+    """Is path an SQLite database file, or one of its journals ?"""
+    db_path = os.path.abspath(db_file)
+    path = os.path.abspath(path)
+    return path == db_path or path.startswith(f"{db_path}-")
+
+def tab_midi_notes(tab_file, inst_strings):
+    """MIDI notes of a tablature, in a single pass even when the instrument is detected
+
+    tab_file is a file name or a text file object. Returns (MIDI notes,
+    error message).
+    """
+    try:
+        if isinstance(tab_file, str):
+            return Tablature(tab_file, inst_strings).midi_notes(), None
+        return list(Tablature.iter_blocks(tab_file, inst_strings)), None
+    except (Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature, ValueError) as exc:
+        return None, str(exc)
+
+# Subcommands, the first argument selects them
+COMMANDS = {
+    'serve': serve,
+    'index': index,
+    'search': search,
+    'pack': pack,
+    'stats': stats,
+    'tab': tab,
+    'dedupe': dedupe,
+}
+
 def main():
     """The main program"""
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
     # Inputs
     parser = init_argparse()
     args = parser.parse_args()
 
-    tab_file = args.file[0]
     transposistion = args.transpose
+    note_naming = NOTE_NAMINGS.get(args.naming)
+    inst_strings = AUTO_INSTRUMENTS.get(args.instrument)
+    if args.tuning:
+        try:
+            inst_strings = parse_tuning(args.tuning)
+        except ValueError as exc:
+            parser.error(str(exc))
+    debug = args.debug
+    if debug:
+        logging.basicConfig(level=logging.DEBUG, format="DEBUG: %(message)s")
 
-    note_naming = {
-        NOTE_ENGLISH: MusicNote.ENGLISH,
-        NOTE_LATIN: MusicNote.LATIN,
-        NOTE_GERMAN: MusicNote.GERMAN,
-    }.get(args.naming)
+    fit_range = None
+    if args.fit:
+        if args.transpose:
+            parser.error("--fit and --transpose can't be used together")
+        if args.watch or args.file == [STDIN_FILE]:
+            parser.error("--fit needs whole files, it can't watch nor stream")
+        try:
+            fit_range = instrument_range(INSTRUMENTS[args.fit]) if args.fit in INSTRUMENTS else parse_range(args.fit)
+        except ValueError as exc:
+            parser.error(str(exc))
+    fit_step = SCALE_SIZE if args.fit_octaves else 1
 
-    inst_strings = {
-        INST_GUITAR6: Tablature.INST_GUITAR6,
-        INST_BASS4: Tablature.INST_BASS4,
-    }.get(args.instrument)
-    debug = args.debug
+    bars = None
+    if args.bars:
+        if args.watch or args.file == [STDIN_FILE]:
+            parser.error("--bars needs whole files, it can't watch nor stream")
+        try:
+            bars = parse_bars(args.bars)
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    cache = None
+    if not args.no_cache:
+        cache = ParseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        if args.clear_cache:
+            cache.clear()
+
+    if args.watch:
+        if args.file:
+            parser.error("No file can be given in watch mode")
+        if args.render:
+            parser.error("No audio preview in watch mode")
+        watch(args, inst_strings, note_naming, cache)
+        return
+
+    if not args.file:
+        parser.error("At least one file is needed")
+
+    if args.check:
+        if STDIN_FILE in args.file:
+            parser.error("--check needs files")
+        tab_files = expand_paths(args.file)
+        if not tab_files:
+            parser.error("No tablature file found")
+        exit(check_files(tab_files, inst_strings, args.jobs, args.timing))
+
+    stats = StageStats()
+    out = open_output(args.output, args.format)
+    writer_args = dict(
+        note_naming=note_naming,
+        transposition=transposistion,
+        stats=stats if args.stats else None,
+        chords=args.chords,
+    )
+
+    # Streamed input: write each block as soon as it's read
+    if args.file == [STDIN_FILE]:
+        writer = WRITERS[args.format](out, **writer_args)
+        renderer = open_renderer(args, writer_args)
+        writer.begin_file(STDIN_FILE)
+        try:
+            for block_notes in Tablature.iter_blocks(sys.stdin, inst_strings):
+                writer.write_block(block_notes)
+                writer.flush()
+                if renderer:
+                    renderer.write_block(block_notes)
+        except (Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature, ValueError) as exc:
+            writer.abort_file(STDIN_FILE, str(exc))
+            close_output(writer, args.output)
+            if renderer:
+                close_output(renderer, args.render)
+            exit(1)
+        writer.end_file()
+        close_output(writer, args.output)
+        if renderer:
+            close_output(renderer, args.render)
+        return
+
+    if STDIN_FILE in args.file:
+        parser.error(f"'{STDIN_FILE}' can't be mixed with other files")
+
+    tab_files = expand_paths(args.file)
+    if not tab_files:
+        parser.error("No tablature file found")
+
+    archives = any(is_archive(tab_file) for tab_file in tab_files)
+    batch = len(tab_files) > 1 or archives
+    if args.format == FORMAT_TEXT:
+        writer_args['headers'] = batch
+    # Whole files are transposed, and checked, before being written
+    writer_args['transposition'] = 0
+    writer = WRITERS[args.format](out, **writer_args)
+    renderer = open_renderer(args, writer_args)
 
     # Compute
-    tab = None
-    try:
-        tab = Tablature(tab_file, inst_strings, debug=debug)
-    except (Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature) as exc:
-        print(exc)
+    convert = functools.partial(
+        convert_file,
+        inst_strings=inst_strings,
+        debug=debug,
+        cache=cache,
+        # A single file is split over the processes
+        block_jobs=args.jobs if not batch else 1,
+        with_stats=args.stats,
+        memo_size=args.memo_size,
+        bars=bars,
+    )
+    failures = 0
+    converted = 0
+    start = time.perf_counter()
+
+    results = map_inputs(convert, tab_files, args.jobs, error_result=lambda error: (None, error, None))
+    for tab_file, (midi_notes, error, file_stats), elapsed in results:
+        converted += 1
+        if file_stats is not None:
+            stats.merge(file_stats)
+
+        if not error:
+            offset = transposistion
+            if fit_range:
+                offset = fit_transposition(midi_notes, *fit_range, fit_step)
+                if offset:
+                    print(f"{tab_file}: transposed by {offset:+d} to fit {args.fit}", file=sys.stderr)
+            try:
+                midi_notes = transpose(midi_notes, offset)
+            except ValueError as exc:
+                error = str(exc)
+
+        # Output
+        with stats.stage(STAGE_OUTPUT):
+            if error:
+                failures += 1
+                writer.write_error(tab_file, error)
+            else:
+                writer.write_file(tab_file, midi_notes)
+                if renderer:
+                    renderer.write_file(tab_file, midi_notes)
+        stats.count(STAGE_OUTPUT, len(midi_notes) if midi_notes else 0)
+
+        if args.timing:
+            print(f"{tab_file}: {elapsed:.3f}s", file=sys.stderr)
+
+    with stats.stage(STAGE_OUTPUT):
+        close_output(writer, args.output)
+        if renderer:
+            close_output(renderer, args.render)
+
+    if args.timing:
+        total = time.perf_counter() - start
+        print(f"Total: {converted} files in {total:.3f}s", file=sys.stderr)
+
+    if args.stats:
+        for line in stats.report(time.perf_counter() - start):
+            print(line, file=sys.stderr)
+
+    if failures:
         exit(1)
 
-    midi_notes = tab.midi_notes()
+def check_files(tab_files, inst_strings, jobs=1, timing=False):
+    """Check mode, report bad files on stderr and return the exit code"""
+    exit_code = CHECK_OK
+    check = functools.partial(check_file, inst_strings=inst_strings)
+
+    results = map_inputs(check, tab_files, jobs, error_result=lambda error: (CHECK_UNREADABLE, error))
+    for tab_file, (code, error), elapsed in results:
+        if code != CHECK_OK:
+            print(f"{tab_file}: {error}", file=sys.stderr)
+            exit_code = exit_code or code
+        if timing:
+            print(f"{tab_file}: {elapsed:.3f}s", file=sys.stderr)
 
-    # Output
-    for line in midi_notes:
-        line_notes = []
+    return exit_code
 
-        for chords in line:
-            chord_notes = []
+def check_file(tab_file, inst_strings, content=None):
+    """Check a tablature structure only, return (exit code, error message)
 
-            for note in chords:
-                note += transposistion
-                note_name = MusicNote.midi_to_name(note, note_naming)
-                chord_notes.append(note_name)
+    content is the file bytes when it's an archive member.
+    """
+    try:
+        if content is not None:
+            Tablature(member_stream(content), inst_strings).check()
+        elif tab_file.endswith(BINARY_EXT):
+            Tablature.load(tab_file, inst_strings=inst_strings)
+        else:
+            Tablature(tab_file, inst_strings).check()
+    except Tablature.InconsistentTablature as exc:
+        return CHECK_INCONSISTENT, str(exc)
+    except Tablature.InstrumentBadStringCount as exc:
+        return CHECK_BAD_INSTRUMENT, str(exc)
+    except (OSError, ValueError) as exc: # missing, not text, not a binary tablature
+        return CHECK_UNREADABLE, str(exc)
+    return CHECK_OK, None
+
+def watch(args, inst_strings, note_naming, cache):
+    """Watch mode, keep an output directory in sync with a tablatures directory"""
+    output_dir = args.output or WATCH_OUTPUT_DIR
+    convert = functools.partial(
+        convert_to_file,
+        inst_strings=inst_strings,
+        out_format=args.format,
+        writer_args=dict(note_naming=note_naming, transposition=args.transpose, chords=args.chords),
+        cache=cache,
+    )
+    watcher = TabsWatcher(args.watch, output_dir, convert, FORMAT_EXTENSIONS[args.format])
+
+    def report(converted, removed, errors):
+        for rel_path in converted:
+            print(f"converted {rel_path}", file=sys.stderr)
+        for rel_path in removed:
+            print(f"removed {rel_path}", file=sys.stderr)
+        for rel_path, error in errors:
+            print(f"{rel_path}: {error}", file=sys.stderr)
+
+    print(f"Watching {args.watch}, writing to {output_dir}", file=sys.stderr)
+    try:
+        watcher.run(report, args.interval)
+    except KeyboardInterrupt:
+        pass
+
+def convert_to_file(tab_file, out_file, inst_strings, out_format, writer_args, cache=None):
+    """Convert a tablature into an output file, return an error message or None"""
+    midi_notes, error, _ = convert_file(tab_file, inst_strings, cache=cache)
+    if error:
+        return error
+
+    # Readers never see a partial output
+    tmp_file = f"{out_file}.tmp"
+    writer = WRITERS[out_format](open_output(tmp_file, out_format), **writer_args)
+    try:
+        writer.write_file(tab_file, midi_notes)
+    except ValueError as exc: # out of MIDI range
+        close_output(writer, tmp_file)
+        os.remove(tmp_file)
+        return str(exc)
+    close_output(writer, tmp_file)
+    os.replace(tmp_file, out_file)
+    return None
+
+def open_renderer(args, writer_args):
+    """Audio preview writer when asked for, None otherwise"""
+    if not args.render:
+        return None
+    render_args = dict(writer_args, stats=None, note_length=args.note_length)
+    render_args.pop('headers', None)
+    return WavWriter(open(args.render, 'wb'), **render_args)
+
+def close_output(writer, output_file):
+    """Finish writing, and close the output file if it's not stdout"""
+    writer.close()
+    if output_file is not None:
+        writer.out.close()
+
+def convert_file(
+    tab_file, inst_strings, debug=Tablature.DEBUG_OFF, cache=None, block_jobs=1, with_stats=False, memo_size=0,
+    content=None, bars=None,
+):
+    """Convert a tablature file, return (MIDI notes, error message, stats)
+
+    Parsing and reading errors are returned instead of raised, so a batch goes on.
+    With block_jobs other than 1 the file blocks are converted by a process pool.
+    Stats are None unless with_stats is set.
+    Blocks are memoized across the files converted by the process when
+    memo_size isn't 0.
+    Binary files written by the pack command are loaded without parsing,
+    and must have been saved with the instrument, unless it's detected.
+    content is the file bytes when it's an archive member, tab_file only
+    naming it then.
+    bars is an optional (start, end) bars range, the only one converted.
+    """
+    stats = StageStats() if with_stats else None
+    memo = shared_memo(memo_size) if memo_size else None
+    try:
+        if bars is not None:
+            if content is not None:
+                tab = Tablature(member_stream(content), inst_strings, debug=debug, stats=stats)
+            elif tab_file.endswith(BINARY_EXT):
+                tab = Tablature.load(tab_file, debug=debug, stats=stats, inst_strings=inst_strings)
+            else:
+                tab = Tablature.open_indexed(tab_file, inst_strings, debug=debug, stats=stats)
+            midi_notes = tab.slice_bars(*bars)
+        elif content is not None:
+            tab = Tablature(member_stream(content), inst_strings, debug=debug, cache=cache, stats=stats, memo=memo)
+            midi_notes = tab.midi_notes()
+        elif tab_file.endswith(BINARY_EXT):
+            midi_notes = Tablature.load(tab_file, debug=debug, stats=stats, inst_strings=inst_strings).midi_notes()
+        elif block_jobs != 1:
+            midi_notes = parallel_midi_notes(tab_file, inst_strings, block_jobs, stats=stats)
+        else:
+            tab = Tablature(tab_file, inst_strings, debug=debug, cache=cache, stats=stats, memo=memo)
+            midi_notes = tab.midi_notes()
+    except (Tablature.InstrumentBadStringCount, Tablature.InconsistentTablature, ValueError, OSError) as exc:
+        return None, str(exc), stats
 
-            # TODO this way of displaying chords isn't readable
-            line_notes.append("+".join(chord_notes))
-            
-        print(" ".join(line_notes))
+    return midi_notes, None, stats
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
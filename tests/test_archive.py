@@ -0,0 +1,98 @@
+"""
+Archives input tests
+"""
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from src.archive import is_archive, iter_members, read_archive, map_inputs, member_stream, ArchiveError
+from src.tablature import Tablature
+
+TABS = ["tests/tab_style1.txt", "tests/tab_inconsistent.txt"]
+
+def member_notes(member_path, content=None):
+    """MIDI notes of a member, or its error"""
+    try:
+        return Tablature(member_stream(content), Tablature.INST_BASS4).midi_notes()
+    except (Tablature.InconsistentTablature, ValueError) as exc:
+        return type(exc).__name__
+
+class ArchiveTest(unittest.TestCase):
+    """Tablatures read from zip and tar archives"""
+
+    def setUp(self,):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.zip_file = os.path.join(self.tmp_dir.name, "tabs.zip")
+        with zipfile.ZipFile(self.zip_file, 'w') as archive:
+            for tab in TABS:
+                archive.write(tab, os.path.join("tabs", os.path.basename(tab)))
+            archive.writestr("tabs/.hidden.txt", "not a tablature")
+        self.tar_file = os.path.join(self.tmp_dir.name, "tabs.tar.gz")
+        with tarfile.open(self.tar_file, 'w:gz') as archive:
+            for tab in TABS:
+                archive.add(tab, os.path.join("tabs", os.path.basename(tab)))
+
+    def tearDown(self,):
+        self.tmp_dir.cleanup()
+
+    def test_is_archive(self,):
+        """Archives are told by their extension"""
+        for path in ("a.zip", "a.tar", "a.tar.gz", "a.TGZ", "a.tar.bz2", "a.tar.xz"):
+            self.assertTrue(is_archive(path), path)
+        for path in ("a.txt", "a.t2n", "a.gz"):
+            self.assertFalse(is_archive(path), path)
+
+    def test_iter_members(self,):
+        """Non hidden members, in archive order"""
+        names = ["tabs/tab_style1.txt", "tabs/tab_inconsistent.txt"]
+        for archive in (self.zip_file, self.tar_file):
+            members = list(read_archive(archive, queue_size=1))
+            self.assertEqual(names, [name for name, _ in members])
+            with open(TABS[0], 'rb') as f:
+                self.assertEqual(f.read(), members[0][1])
+
+    def test_stream_tablature(self,):
+        """A tablature read from a stream is the same as from its file"""
+        with open(TABS[0]) as f:
+            text = f.read()
+        expected = Tablature(TABS[0], Tablature.INST_BASS4).midi_notes()
+        self.assertEqual(expected, Tablature(io.StringIO(text), Tablature.INST_BASS4).midi_notes())
+        self.assertEqual(expected, Tablature(member_stream(text.encode()), Tablature.INST_BASS4).midi_notes())
+
+    def test_map_inputs(self,):
+        """Members results are tagged with the archive path, in input order"""
+        expected = Tablature(TABS[0], Tablature.INST_BASS4).midi_notes()
+        for jobs in (1, 2):
+            results = list(map_inputs(member_notes, [self.tar_file, self.zip_file], jobs))
+            self.assertEqual([
+                f"{self.tar_file}/tabs/tab_style1.txt",
+                f"{self.tar_file}/tabs/tab_inconsistent.txt",
+                f"{self.zip_file}/tabs/tab_style1.txt",
+                f"{self.zip_file}/tabs/tab_inconsistent.txt",
+            ], [path for path, _, _ in results])
+            self.assertEqual(
+                [expected, 'InconsistentTablature'] * 2,
+                [result for _, result, _ in results],
+            )
+
+    def test_broken_archive(self,):
+        """Unreadable archives are reported, the other inputs still converted"""
+        broken = os.path.join(self.tmp_dir.name, "broken.zip")
+        with open(broken, 'w') as f:
+            f.write("not a zip")
+        with self.assertRaises(ArchiveError):
+            list(iter_members(broken))
+
+        results = list(map_inputs(member_notes, [broken, self.zip_file], error_result=lambda error: error))
+        self.assertEqual(broken, results[0][0])
+        self.assertIn("zip", results[0][1])
+        self.assertEqual(3, len(results))
+
+    def test_early_stop(self,):
+        """The reader thread stops when members aren't wanted anymore"""
+        members = read_archive(self.tar_file, queue_size=1)
+        next(members)
+        members.close()
@@ -0,0 +1,54 @@
+"""
+Audio preview tests
+"""
+import io
+import unittest
+import wave
+from array import array
+
+from src.audio import WavWriter, chord_samples, SAMPLE_RATE, CHUNK_FRAMES
+
+# Two blocks, with a chord and a rest
+MIDI_NOTES = [
+    [[40], [45, 52], []],
+    [[43]],
+]
+
+class WavWriterTest(unittest.TestCase):
+    """Synthesis"""
+
+    def test_chord_samples(self,):
+        """Chords fade in and out, rests are silent"""
+        samples = array('h', chord_samples((45, 52), 1000))
+        self.assertEqual(1000, len(samples))
+        self.assertEqual(0, samples[0])
+        self.assertLess(abs(samples[-1]), 100)
+        self.assertGreater(max(samples), 10000)
+        self.assertEqual(bytes(2000), chord_samples((), 1000))
+        with self.assertRaises(ValueError):
+            chord_samples((128,), 1000)
+
+    def test_wav(self,):
+        """One note length per chord, written in chunks"""
+        out = io.BytesIO()
+        writer = WavWriter(out, note_length=0.1)
+        writer.write_file("song.txt", MIDI_NOTES)
+        writer.close()
+
+        out.seek(0)
+        with wave.open(out) as wav:
+            self.assertEqual((1, 2, SAMPLE_RATE), (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()))
+            self.assertEqual(4 * int(0.1 * SAMPLE_RATE), wav.getnframes())
+            frames = wav.readframes(wav.getnframes())
+        # Third chord is a rest
+        chord_bytes = 2 * int(0.1 * SAMPLE_RATE)
+        self.assertEqual(bytes(chord_bytes), frames[2 * chord_bytes:3 * chord_bytes])
+
+        # Longer than a chunk
+        out = io.BytesIO()
+        writer = WavWriter(out, note_length=1)
+        writer.write_file("song.txt", MIDI_NOTES * (CHUNK_FRAMES // SAMPLE_RATE))
+        writer.close()
+        out.seek(0)
+        with wave.open(out) as wav:
+            self.assertEqual(4 * SAMPLE_RATE * (CHUNK_FRAMES // SAMPLE_RATE), wav.getnframes())
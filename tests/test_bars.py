@@ -0,0 +1,92 @@
+"""
+Bars slicing tests
+"""
+import os
+import tempfile
+import unittest
+
+from src.bars import BarsIndex, parse_bars, index_path
+from src.tablature import Tablature, block_bars
+
+TAB = """Title: bars
+
+G|--5--|-----|--7--||
+D|-----|--3--|-----||
+A|3----|-----|--5--||
+E|-----|0----|-----||
+
+G|-----|--2--|
+D|--4--|-----|
+A|-----|-----|
+E|1----|-----|
+"""
+
+class BarsTest(unittest.TestCase):
+    """Random access to bars"""
+
+    def setUp(self,):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tab_file = os.path.join(self.tmp_dir.name, "bars.txt")
+        with open(self.tab_file, 'w') as f:
+            f.write(TAB)
+
+    def tearDown(self,):
+        self.tmp_dir.cleanup()
+
+    def test_parse_bars(self,):
+        """Ranges and single bars"""
+        self.assertEqual((120, 140), parse_bars("120-140"))
+        self.assertEqual((3, 3), parse_bars("3"))
+        for text in ("0-2", "5-4", "a-b", "-3"):
+            with self.assertRaises(ValueError):
+                parse_bars(text)
+
+    def test_block_bars(self,):
+        """Bars are between bar lines, names and double bar lines aside"""
+        self.assertEqual([(2, 7), (8, 13), (14, 19)], block_bars("G|--5--|-----|--7--||"))
+        self.assertEqual([(0, 10)], block_bars("e---3-----"))
+
+    def test_slice_bars(self,):
+        """Slices are the notes of these bars only"""
+        tab = Tablature(self.tab_file, Tablature.INST_BASS4)
+        self.assertEqual([(0, 2, 7), (0, 8, 13), (0, 14, 19), (1, 2, 7), (1, 8, 13)], tab.bars)
+
+        self.assertEqual([[[36], [48]]], tab.slice_bars(1, 1))
+        self.assertEqual([[[50, 38]], [[29], [42]]], tab.slice_bars(3, 4))
+        # Clipped to the last bar
+        self.assertEqual([[[29], [42], [45]]], tab.slice_bars(4, 100))
+        self.assertEqual(tab.midi_notes(), tab.slice_bars(1, 5))
+
+        with self.assertRaises(ValueError):
+            tab.slice_bars(6, 8)
+
+    def test_index(self,):
+        """The index is saved next to the file, used while it's current"""
+        expected = Tablature(self.tab_file, Tablature.INST_BASS4).slice_bars(2, 4)
+
+        tab = Tablature.open_indexed(self.tab_file, Tablature.INST_AUTO)
+        self.assertEqual(expected, tab.slice_bars(2, 4))
+        index_file = index_path(self.tab_file)
+        self.assertTrue(os.path.basename(index_file).startswith('.'))
+        index = BarsIndex.load(index_file)
+        self.assertEqual(Tablature.INST_BASS4, index.inst_strings)
+        self.assertEqual(tab.bars, index.bars)
+
+        # Blocks are read at their offsets, the rest of the file isn't
+        tab = Tablature.open_indexed(self.tab_file, Tablature.INST_BASS4)
+        self.assertEqual(expected, tab.slice_bars(2, 4))
+        self.assertIsNone(tab._file)
+
+        # A changed file is indexed again
+        with open(self.tab_file, 'a') as f:
+            f.write("\nG|--9-----|\nD|--------|\nA|--------|\nE|--------|\n")
+        tab = Tablature.open_indexed(self.tab_file, Tablature.INST_BASS4)
+        self.assertEqual([[[52]]], tab.slice_bars(6, 6))
+        self.assertEqual(6, len(BarsIndex.load(index_file).bars))
+
+    def test_binary_has_no_bars(self,):
+        """Binary tablatures text isn't saved"""
+        bin_file = os.path.join(self.tmp_dir.name, "bars.t2n")
+        Tablature(self.tab_file, Tablature.INST_BASS4).save(bin_file)
+        with self.assertRaises(ValueError):
+            Tablature.load(bin_file).slice_bars(1, 2)
@@ -0,0 +1,48 @@
+"""
+Batch processing tests
+"""
+import os
+import tempfile
+import unittest
+
+from tabs2notes import convert_file
+from src.batch import expand_paths, map_files
+
+class BatchTest(unittest.TestCase):
+    """Many files at once"""
+
+    def test_expand_paths(self,):
+        """Files, directories and globs"""
+        # Plain files are kept as is, even missing ones
+        self.assertEqual(["tests/tab_style1.txt", "missing.txt"], expand_paths(["tests/tab_style1.txt", "missing.txt"]))
+
+        # Globs are sorted
+        tabs = [
+            "tests/tab_empty_guitar.txt",
+            "tests/tab_inconsistent.txt",
+            "tests/tab_style1.txt",
+        ]
+        self.assertEqual(tabs, expand_paths(["tests/tab_*.txt"]))
+
+        # Directories are walked
+        files = expand_paths(["tests"])
+        for tab in tabs:
+            self.assertIn(os.path.join("tests", os.path.basename(tab)), files)
+
+    def test_map_files_order(self,):
+        """Results are in input order, with or without a pool"""
+        files = ["a/one", "b/two", "c/three", "d/four"]
+        for jobs in (1, 2):
+            results = list(map_files(os.path.basename, files, jobs))
+            self.assertEqual(files, [file_name for file_name, _, _ in results])
+            self.assertEqual(["one", "two", "three", "four"], [result for _, result, _ in results])
+            for _, _, elapsed in results:
+                self.assertGreaterEqual(elapsed, 0)
+
+    def test_convert_file_errors(self,):
+        """Unreadable files are per file errors, like parsing ones"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            midi_notes, error, _ = convert_file(tmp_dir, (28, 33, 38, 43))
+        self.assertIsNone(midi_notes)
+        self.assertIsNotNone(error)
+        self.assertIsNotNone(convert_file("tests/tab_inconsistent.txt", (28, 33, 38, 43))[1])
@@ -0,0 +1,106 @@
+"""
+Parse cache tests
+"""
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from src.cache import ParseCache, CACHE_FILE_EXT, SIZE_FILE
+from src.tablature import Tablature
+
+class ParseCacheTest(unittest.TestCase):
+    """Don't parse the same thing twice"""
+
+    def setUp(self,):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+
+    def tearDown(self,):
+        self.tmp_dir.cleanup()
+
+    def test_key(self,):
+        """Key depends on content, instrument and parser version"""
+        key = ParseCache.key(["a", "b"], Tablature.INST_BASS4, 1)
+        self.assertEqual(key, ParseCache.key(["a", "b"], Tablature.INST_BASS4, 1))
+        self.assertNotEqual(key, ParseCache.key(["a", "c"], Tablature.INST_BASS4, 1))
+        self.assertNotEqual(key, ParseCache.key(["a", "b"], Tablature.INST_GUITAR6, 1))
+        self.assertNotEqual(key, ParseCache.key(["a", "b"], Tablature.INST_BASS4, 2))
+
+    def test_tablature_cache(self,):
+        """Cached tablature gives the same notes"""
+        cache = ParseCache(self.cache_dir)
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4, cache=cache)
+        # Stages are lazy, nothing is parsed nor cached yet
+        self.assertFalse(os.path.exists(self.cache_dir) and os.listdir(self.cache_dir))
+        tab.midi_notes()
+        self.assertEqual(1, len([name for name in os.listdir(self.cache_dir) if name.endswith(CACHE_FILE_EXT)]))
+
+        cached_tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4, cache=cache)
+        self.assertEqual(tab.strings_count, cached_tab.strings_count)
+        self.assertEqual(tab.extracted_frets, cached_tab.extracted_frets)
+        self.assertEqual(tab.midi_notes(), cached_tab.midi_notes())
+
+        cache.clear()
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_eviction(self,):
+        """Least recently used entries go first"""
+        cache = ParseCache(self.cache_dir, max_size=2500)
+        value = "x" * 1000
+
+        cache.put("a", value)
+        cache.put("b", value)
+        os.utime(os.path.join(self.cache_dir, "a.pickle"), (0, 0))
+        os.utime(os.path.join(self.cache_dir, "b.pickle"), (1, 1))
+        self.assertEqual(value, cache.get("a")) # a is now the most recent
+        cache.put("c", value)
+
+        self.assertEqual(value, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(value, cache.get("c"))
+
+    def stored_size(self,):
+        with open(os.path.join(self.cache_dir, SIZE_FILE)) as f:
+            return int(f.read())
+
+    def test_size(self,):
+        """Overwrites and worker copies keep the stored size right, without scans"""
+        cache = ParseCache(self.cache_dir, max_size=2500)
+        cache.put("a", "x" * 1000)
+        entry_size = os.path.getsize(os.path.join(self.cache_dir, "a.pickle"))
+        for _ in range(5):
+            cache.put("a", "x" * 1000)
+        self.assertEqual(entry_size, self.stored_size())
+
+        # As sent to a worker process, sizes come from the shared file
+        worker_cache = pickle.loads(pickle.dumps(cache))
+        with mock.patch.object(ParseCache, '_entries', side_effect=AssertionError("cache directory scanned")):
+            worker_cache.put("b", "y" * 1000)
+        self.assertEqual(2 * entry_size, self.stored_size())
+
+        # Over the limit, the exact size is stored again
+        pickle.loads(pickle.dumps(cache)).put("c", "z" * 1000)
+        self.assertEqual(2 * entry_size, self.stored_size())
+        self.assertIsNone(cache.get("a"))
+
+    def test_unusable(self,):
+        """Cache problems are warned about, conversions go on without it"""
+        not_dir = os.path.join(self.tmp_dir.name, "file")
+        with open(not_dir, 'w') as f:
+            f.write("not a directory")
+        cache = ParseCache(os.path.join(not_dir, "cache"))
+        with self.assertLogs('src.cache', 'WARNING'):
+            cache.put("a", "value")
+        self.assertIsNone(cache.get("a"))
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4, cache=cache)
+        self.assertEqual(Tablature("tests/tab_style1.txt", Tablature.INST_BASS4).midi_notes(), tab.midi_notes())
+
+        # Pickled by code that doesn't exist anymore
+        cache = ParseCache(self.cache_dir)
+        cache.put("b", "value")
+        with open(os.path.join(self.cache_dir, "b.pickle"), 'wb') as f:
+            f.write(b"cno_such_module\nNoSuchClass\n.")
+        with self.assertLogs('src.cache', 'WARNING'):
+            self.assertIsNone(cache.get("b"))
@@ -0,0 +1,66 @@
+"""
+Check mode tests
+"""
+import os
+import tempfile
+import unittest
+
+from src.tablature import Tablature
+from tabs2notes import check_file, CHECK_OK, CHECK_INCONSISTENT, CHECK_BAD_INSTRUMENT, CHECK_UNREADABLE
+
+ONE_BLOCK = (
+    "e|-----0-----|\n"
+    "B|-----1-----|\n"
+    "G|-----0-----|\n"
+    "D|-----2-----|\n"
+    "A|-----3-----|\n"
+    "E|-----------|\n"
+)
+
+class CheckTest(unittest.TestCase):
+    """Structure only checks, exit codes"""
+
+    def setUp(self,):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self,):
+        self.tmp_dir.cleanup()
+
+    def write_file(self, name, data):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+        return path
+
+    def test_exit_codes(self,):
+        """Each kind of problem has its code"""
+        one_block = self.write_file("one_block.txt", ONE_BLOCK)
+        self.assertEqual((CHECK_OK, None), check_file(one_block, Tablature.INST_GUITAR6))
+        self.assertEqual(CHECK_BAD_INSTRUMENT, check_file(one_block, Tablature.INST_BASS4)[0])
+
+        # Wrong strings count in the last block, at the end of the file
+        last_block = self.write_file("last_block.txt", "G|---3-----|\nD|---------|\nA|---------|\nE|---------|\n\n" + ONE_BLOCK)
+        self.assertEqual(CHECK_INCONSISTENT, check_file(last_block, Tablature.INST_BASS4)[0])
+        # Stops at the first error, the first block instrument
+        self.assertEqual(CHECK_BAD_INSTRUMENT, check_file(last_block, Tablature.INST_GUITAR6)[0])
+
+        self.assertEqual(CHECK_UNREADABLE, check_file(os.path.join(self.tmp_dir.name, "missing.txt"), Tablature.INST_BASS4)[0])
+
+    def test_truncated_binary(self,):
+        """Truncated or corrupt binary tablatures are unreadable, and have an instrument"""
+        bin_file = os.path.join(self.tmp_dir.name, "song.t2n")
+        Tablature("tests/tab_style1.txt", Tablature.INST_BASS4).save(bin_file)
+        self.assertEqual((CHECK_OK, None), check_file(bin_file, Tablature.INST_BASS4))
+        self.assertEqual((CHECK_OK, None), check_file(bin_file, Tablature.INST_AUTO))
+        self.assertEqual(CHECK_BAD_INSTRUMENT, check_file(bin_file, Tablature.INST_GUITAR6)[0])
+
+        with open(bin_file, 'rb') as f:
+            data = f.read()
+        truncated = self.write_file("truncated.t2n", data[:37])
+        code, error = check_file(truncated, Tablature.INST_BASS4)
+        self.assertEqual(CHECK_UNREADABLE, code)
+        self.assertIn("corrupt", error)
+
+        # Strings array is last, a string index out of the instrument
+        corrupt = self.write_file("corrupt.t2n", data[:-1] + bytes([200]))
+        self.assertEqual(CHECK_UNREADABLE, check_file(corrupt, Tablature.INST_BASS4)[0])
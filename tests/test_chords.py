@@ -0,0 +1,56 @@
+"""
+Chord naming tests
+"""
+import io
+import unittest
+
+from src.chords import chord_name, pitch_classes_mask, CHORDS_TABLE, MASKS_COUNT
+from src.notes import IDX_ENG, IDX_DEU, IDX_LAT
+from src.output import TextWriter
+from src.tablature import Tablature
+
+class ChordNameTest(unittest.TestCase):
+    """What's this chord ?"""
+
+    def test_table(self,):
+        """One entry per pitch classes mask"""
+        self.assertEqual(MASKS_COUNT, len(CHORDS_TABLE))
+        self.assertEqual(0b10010001, pitch_classes_mask([48, 52, 55, 60]))
+
+    def test_chord_name(self,):
+        """Common chords"""
+        test_data = (
+            # Notes, language, name
+            ([40, 47, 52], IDX_ENG, 'E5'),
+            ([48, 52, 55], IDX_ENG, 'C'),
+            ([45, 52, 57, 60, 64], IDX_ENG, 'Am'),
+            ([43, 47, 50, 53], IDX_ENG, 'G7'),
+            ([48, 52, 55, 59], IDX_ENG, 'Cmaj7'),
+            ([50, 57, 62, 67], IDX_ENG, 'Dsus4'),
+            ([47, 50, 53], IDX_ENG, 'Bdim'),
+            # Inversion
+            ([52, 55, 60], IDX_ENG, 'C/E'),
+            # Same notes, other bass, other reading
+            ([48, 52, 55, 57], IDX_ENG, 'C6'),
+            ([45, 52, 55, 60], IDX_ENG, 'Am7'),
+            # Languages
+            ([47, 54, 59, 62], IDX_DEU, 'Hm'),
+            ([43, 47, 50, 53], IDX_LAT, 'Sol7'),
+        )
+        for notes, lang_idx, name in test_data:
+            self.assertEqual(name, chord_name(notes, lang_idx))
+
+        # Not chords
+        for notes in ([40], [40, 52], [40, 41, 42]):
+            self.assertIsNone(chord_name(notes))
+
+    def test_tablature_and_output(self,):
+        """Chords names from a tablature, and displayed"""
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4)
+        names = tab.chord_names()
+        self.assertEqual([len(block) for block in tab.midi_notes()], [len(block) for block in names])
+
+        out = io.StringIO()
+        writer = TextWriter(out, IDX_ENG, chords=True)
+        writer.write_block([[40], [40, 47, 52], [40, 41]])
+        self.assertEqual("E3 E5 E3+F3\n", out.getvalue())
@@ -0,0 +1,85 @@
+"""
+Corpus statistics tests
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import tabs2notes
+
+from src.corpus import CorpusStats, estimate_key, file_stats, FRETS_BINS
+from src.tablature import Tablature
+
+class CorpusStatsTest(unittest.TestCase):
+    """Counting tablatures"""
+
+    def test_estimate_key(self,):
+        """Keys from pitch classes histograms"""
+        c_major = [4, 0, 2, 0, 3, 2, 0, 4, 0, 2, 0, 1]
+        self.assertEqual('C major', estimate_key(c_major))
+        self.assertEqual('A minor', estimate_key([2, 0, 1, 0, 3, 1, 0, 1, 0, 4, 0, 2]))
+        self.assertIsNone(estimate_key([0] * 12))
+
+    def test_file_stats(self,):
+        """A single file aggregates"""
+        corpus, error = file_stats("tests/tab_style1.txt", Tablature.INST_BASS4)
+        self.assertIsNone(error)
+        summary = corpus.files["tests/tab_style1.txt"]
+        self.assertEqual(56, summary['notes'])
+        self.assertEqual((28, 59), (summary['low'], summary['high']))
+        self.assertEqual(56, sum(corpus.pitches))
+        self.assertEqual(56, sum(corpus.pitch_classes))
+        self.assertEqual(56, sum(corpus.frets))
+        # Open E string
+        self.assertEqual(corpus.pitches[28], corpus.frets[3 * FRETS_BINS])
+
+        corpus, error = file_stats("tests/tab_inconsistent.txt", Tablature.INST_BASS4)
+        self.assertIsNone(corpus)
+        self.assertIn("Inconsistent", error)
+
+        # High e string 70th fret, above the MIDI range
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            high_file = os.path.join(tmp_dir, "high.txt")
+            with open(high_file, 'w') as f:
+                f.write("e|---70----|\nB|---------|\nG|---------|\nD|---------|\nA|---------|\nE|---------|\n")
+            corpus, error = file_stats(high_file, Tablature.INST_GUITAR6)
+        self.assertIsNone(corpus)
+        self.assertIn("MIDI range", error)
+
+    def test_overlapping_inputs(self,):
+        """Files given twice are counted once"""
+        tab_file = os.path.abspath("tests/tab_style1.txt")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "stats.json")
+            with contextlib.redirect_stderr(io.StringIO()):
+                tabs2notes.stats(["-j", "1", "-o", output, tab_file, "tests/tab_style1.txt", "tests/tab_style*.txt"])
+            corpus = CorpusStats.load(output)
+        self.assertEqual([tab_file], list(corpus.files))
+        self.assertEqual(56, sum(corpus.pitches))
+
+    def test_merge(self,):
+        """Aggregates add up, and survive a JSON round trip"""
+        whole = CorpusStats()
+        whole.add_tablature("a", Tablature("tests/tab_style1.txt", Tablature.INST_BASS4))
+        whole.add_tablature("b", Tablature("tests/tab_style1.txt", Tablature.INST_BASS4))
+
+        first, _ = file_stats("tests/tab_style1.txt", Tablature.INST_BASS4)
+        second = CorpusStats()
+        second.add_tablature("b", Tablature("tests/tab_style1.txt", Tablature.INST_BASS4))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stats_file = os.path.join(tmp_dir, "stats.json")
+            second.save(stats_file)
+            second = CorpusStats.load(stats_file)
+        first.files = {"a": first.files["tests/tab_style1.txt"]}
+        first.merge(second)
+        self.assertEqual(whole.to_dict(), first.to_dict())
+
+        # Files can't be counted twice
+        with self.assertRaises(ValueError):
+            first.merge(second)
+
+        out = io.StringIO()
+        first.write_csv(out)
+        self.assertIn("range,a,E2:B4", out.getvalue().splitlines())
@@ -0,0 +1,116 @@
+"""
+Near-duplicate detection tests
+"""
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import tabs2notes
+
+from src.dedupe import (
+    SignaturesIndex, shingles, signature, similarity, bands_buckets, file_signature, BANDS, SIGNATURE_SIZE,
+)
+from src.tablature import Tablature
+
+class DedupeTest(unittest.TestCase):
+    """Same songs, whatever their layout and key"""
+
+    def setUp(self,):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_file = os.path.join(self.tmp_dir.name, "signatures.sqlite")
+
+    def tearDown(self,):
+        self.tmp_dir.cleanup()
+
+    def write_tab(self, name, text):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_shingles(self,):
+        """Transposition doesn't change shingles"""
+        midi_notes = [[[40], [43, 47]], [[45], [40], [43], [46]]]
+        transposed = [[[note + 5 for note in chord] for chord in block] for block in midi_notes]
+        self.assertEqual(2, len(shingles(midi_notes)))
+        self.assertEqual(shingles(midi_notes), shingles(transposed))
+        self.assertIsNone(signature(shingles([[[40], [43]]])))
+
+    def test_similarity(self,):
+        """Signatures estimate the Jaccard similarity"""
+        rng = random.Random(0)
+        base = rng.sample(range(1 << 32), 400)
+        same = signature(set(base))
+        self.assertEqual(SIGNATURE_SIZE, len(same))
+        self.assertEqual(1.0, similarity(same, signature(set(reversed(base)))))
+        self.assertEqual(BANDS, len(bands_buckets(same)))
+
+        # 300 shared shingles out of 500: 0.6
+        edited = signature(set(base[:300] + rng.sample(range(1 << 32), 100)))
+        self.assertAlmostEqual(0.6, similarity(same, edited), delta=0.12)
+        unrelated = signature(set(rng.sample(range(1 << 32), 400)))
+        self.assertLess(similarity(same, unrelated), 0.1)
+
+    def test_index(self,):
+        """Reformatted copies are grouped, and found by a query"""
+        with open("tests/tab_style1.txt") as f:
+            text = f.read()
+        original = self.write_tab("original.txt", text)
+        # Wider columns everywhere, same notes
+        wider = self.write_tab("wider.txt", "\n".join(
+            line[:3] + '--' + line[3:] if '-' in line else line for line in text.split("\n")
+        ))
+        other = self.write_tab("other.txt", "\n".join(
+            line.replace('5', '9').replace('7', '1') for line in text.split("\n")
+        ))
+
+        signatures_index = SignaturesIndex(self.index_file)
+        for path in (original, wider, other):
+            file_sig, error = file_signature(path, Tablature.INST_BASS4)
+            self.assertIsNone(error)
+            stat = os.stat(path)
+            self.assertFalse(signatures_index.is_current(path, stat, Tablature.INST_BASS4))
+            signatures_index.add_file(path, stat, file_sig, Tablature.INST_BASS4)
+            self.assertTrue(signatures_index.is_current(path, stat, Tablature.INST_BASS4))
+            self.assertFalse(signatures_index.is_current(path, stat, Tablature.INST_AUTO))
+            with mock.patch.object(Tablature, 'PARSER_VERSION', Tablature.PARSER_VERSION + 1):
+                self.assertFalse(signatures_index.is_current(path, stat, Tablature.INST_BASS4))
+        self.assertEqual([sorted([original, wider])], signatures_index.clusters())
+
+        query, _ = file_signature(original, Tablature.INST_BASS4)
+        self.assertEqual([original, wider], [path for _, path in signatures_index.query(query)])
+        self.assertEqual(1.0, signatures_index.query(query)[0][0])
+
+        os.remove(wider)
+        self.assertEqual([wider], signatures_index.prune())
+        self.assertEqual([], signatures_index.clusters())
+        signatures_index.close()
+
+    def test_file_errors(self,):
+        """Unreadable and too short files aren't signed"""
+        self.assertIsNotNone(file_signature("tests/tab_inconsistent.txt", Tablature.INST_BASS4)[1])
+        short = self.write_tab("short.txt", "G|--3--5--|\nD|-------|\nA|-------|\nE|-------|\n")
+        self.assertIsNotNone(file_signature(short, Tablature.INST_BASS4)[1])
+
+    def test_dedupe_directory(self,):
+        """The database isn't signed as a tablature"""
+        tabs_dir = os.path.join(self.tmp_dir.name, "tabs")
+        os.mkdir(tabs_dir)
+        with open("tests/tab_style1.txt") as src, open(os.path.join(tabs_dir, "song.txt"), 'w') as dst:
+            dst.write(src.read())
+
+        cwd = os.getcwd()
+        os.chdir(tabs_dir)
+        try:
+            for db_args in ([], ["--db", "visible.sqlite"]):
+                for _ in range(2):
+                    errors = io.StringIO()
+                    with contextlib.redirect_stderr(errors), contextlib.redirect_stdout(io.StringIO()):
+                        tabs2notes.dedupe(db_args + ["-j", "1", "-i", "bass4", "."])
+                    self.assertNotIn("sqlite", errors.getvalue())
+        finally:
+            os.chdir(cwd)
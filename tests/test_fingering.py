@@ -0,0 +1,67 @@
+"""
+Notes to tablature tests
+"""
+import os
+import tempfile
+import unittest
+
+from src.fingering import chord_states, fingering, notes_to_tab, parse_chords, strings_names
+from src.tablature import Tablature
+
+class FingeringTest(unittest.TestCase):
+    """Where to put the fingers"""
+
+    def test_parse_chords(self,):
+        """Notes names and MIDI numbers"""
+        self.assertEqual([[28], [33, 40], [43]], parse_chords("E2 A2+E3 43"))
+        with self.assertRaises(ValueError):
+            parse_chords("E2 X2")
+        with self.assertRaises(ValueError):
+            parse_chords("E2 200")
+
+    def test_chord_states(self,):
+        """A string per note, playable stretch only"""
+        # E3 on a bass: open D string is 38
+        self.assertEqual({((2, 2),), ((1, 7),), ((0, 12),)}, set(chord_states([40], Tablature.INST_BASS4)))
+        for state in chord_states([40, 47, 52], Tablature.INST_GUITAR6):
+            self.assertEqual(3, len({string for string, _ in state}))
+        with self.assertRaises(ValueError):
+            chord_states([20], Tablature.INST_BASS4)
+        with self.assertRaises(ValueError):
+            chord_states([28, 29], Tablature.INST_BASS4)
+
+    def test_fingering(self,):
+        """The hand stays in position"""
+        # A2 B2 C#3 D3 on a bass, all on the A string rather than jumping to open D
+        self.assertEqual(
+            [((1, 0),), ((1, 2),), ((1, 4),), ((2, 0),)],
+            fingering([[33], [35], [37], [38]], Tablature.INST_BASS4),
+        )
+        # Higher up, the scale stays around the 7th fret
+        positions = fingering([[40], [42], [44], [45], [47]], Tablature.INST_BASS4)
+        frets = [fret for (_, fret), in positions]
+        self.assertLessEqual(max(frets) - min(frets), 4)
+        self.assertEqual([], fingering([], Tablature.INST_BASS4))
+
+    def test_round_trip(self,):
+        """Tablature text reads back to the same notes"""
+        self.assertEqual(['e', 'b', 'g', 'd', 'a', 'E'], strings_names(Tablature.INST_GUITAR6))
+
+        with open("tests/tab_style1.txt") as f:
+            midi_notes = list(Tablature.iter_blocks(f, Tablature.INST_BASS4))
+        text = notes_to_tab(midi_notes, Tablature.INST_BASS4, width=40)
+
+        # Written out as the tab command does, then parsed as any tablature file
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tab_file = os.path.join(tmp_dir, "round_trip.txt")
+            with open(tab_file, 'w') as f:
+                f.write(text)
+            read_back = Tablature(tab_file, Tablature.INST_BASS4).midi_notes()
+        self.assertEqual(
+            [chord for block in midi_notes for chord in block],
+            [chord for block in read_back for chord in block],
+        )
+        for line in text.splitlines():
+            if line:
+                self.assertTrue(Tablature.is_tablature_line(line))
+                self.assertLessEqual(len(line), 40 + 3)
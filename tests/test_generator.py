@@ -0,0 +1,26 @@
+"""
+Synthetic tablatures generator tests
+"""
+import io
+import unittest
+
+from benchmarks.generator import generate_tablature
+from src.tablature import Tablature
+
+class GeneratorTest(unittest.TestCase):
+    """Generated tablatures must be parsable"""
+
+    def test_generated_tablature(self,):
+        """Blocks and strings count"""
+        for strings, inst_strings in ((4, Tablature.INST_BASS4), (6, Tablature.INST_GUITAR6)):
+            text = generate_tablature(strings=strings, blocks=5, chord_density=0.5, repeat_runs=0.1)
+            blocks = list(Tablature.iter_blocks(io.StringIO(text), inst_strings))
+            self.assertEqual(5, len(blocks))
+
+            # Chords are there
+            self.assertTrue(any(len(chord) > 1 for block in blocks for chord in block))
+
+    def test_seed(self,):
+        """Same seed, same tablature"""
+        self.assertEqual(generate_tablature(blocks=3, seed=1), generate_tablature(blocks=3, seed=1))
+        self.assertNotEqual(generate_tablature(blocks=3, seed=1), generate_tablature(blocks=3, seed=2))
@@ -0,0 +1,85 @@
+"""
+Instruments registry and detection tests
+"""
+import os
+import tempfile
+import unittest
+
+from src.instruments import (
+    INSTRUMENTS,
+    INST_GUITAR6,
+    INST_GUITAR6_DROP_D,
+    INST_GUITAR7,
+    INST_UKULELE,
+    detect_instrument,
+    frets_table,
+    instrument_name,
+    notes_positions,
+    parse_tuning,
+    string_pitch_class,
+)
+from src.tablature import Tablature
+
+EMPTY_LINE = "-" * 20
+
+class InstrumentsTest(unittest.TestCase):
+    """Tunings"""
+
+    def test_tables(self,):
+        """Strings x frets tables, both ways"""
+        table = frets_table(Tablature.INST_BASS4)
+        self.assertEqual(28, table[0][0])
+        self.assertEqual(48, table[3][5])
+        self.assertEqual(((0, 12), (1, 7), (2, 2)), notes_positions(Tablature.INST_BASS4)[40])
+        self.assertNotIn(27, notes_positions(Tablature.INST_BASS4))
+
+    def test_parse_tuning(self,):
+        """Custom tunings"""
+        self.assertEqual((26, 33, 38, 43), parse_tuning("D2,A2,D3,G3"))
+        self.assertEqual((26, 33, 38, 43), parse_tuning("D2 A2 D3 G3"))
+        self.assertEqual(INST_UKULELE, instrument_name(INSTRUMENTS[INST_UKULELE]))
+        self.assertEqual("D2,A2,D3,G3", instrument_name((26, 33, 38, 43)))
+        for text in ("", "D2,X3"):
+            with self.assertRaises(ValueError):
+                parse_tuning(text)
+
+    def test_detect(self,):
+        """Strings count first, then strings names"""
+        self.assertEqual(0, string_pitch_class("c|---"))
+        self.assertEqual(10, string_pitch_class("Bb|---"))
+        self.assertEqual(7, string_pitch_class("g------"))
+        self.assertIsNone(string_pitch_class("|-----"))
+
+        # No names, the preferred instrument for the strings count
+        self.assertEqual(INST_GUITAR6, detect_instrument([EMPTY_LINE] * 6)[0])
+        self.assertEqual(INST_GUITAR7, detect_instrument([EMPTY_LINE] * 7)[0])
+        self.assertIsNone(detect_instrument([EMPTY_LINE] * 3))
+
+        drop_d = [f"{name}|{EMPTY_LINE}" for name in "eBGDAD"]
+        self.assertEqual(INST_GUITAR6_DROP_D, detect_instrument(drop_d)[0])
+        ukulele = [f"{name}|{EMPTY_LINE}" for name in "AECG"]
+        self.assertEqual(INST_UKULELE, detect_instrument(ukulele)[0])
+
+    def test_tablature_auto(self,):
+        """Instrument picked in the structure pass"""
+        tab = Tablature("tests/tab_empty_guitar.txt", Tablature.INST_AUTO)
+        tab.check()
+        self.assertEqual(Tablature.INST_GUITAR6, tab.strings_base_notes)
+
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_AUTO)
+        self.assertEqual(Tablature("tests/tab_style1.txt", Tablature.INST_BASS4).midi_notes(), tab.midi_notes())
+        with open("tests/tab_style1.txt") as f:
+            self.assertEqual(tab.midi_notes(), list(Tablature.iter_blocks(f, Tablature.INST_AUTO)))
+
+        with self.assertRaises(Tablature.InstrumentBadStringCount):
+            list(Tablature.iter_blocks([EMPTY_LINE] * 3, Tablature.INST_AUTO))
+
+        # A single block, the file ending on its last string
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tab_file = os.path.join(tmp_dir, "drop_d.txt")
+            with open(tab_file, 'w') as f:
+                f.write("\n".join(f"{name}|---0-{EMPTY_LINE}" for name in "eBGDAD"))
+            tab = Tablature(tab_file, Tablature.INST_AUTO)
+            tab.check()
+            self.assertEqual(INSTRUMENTS[INST_GUITAR6_DROP_D], tab.strings_base_notes)
+            self.assertEqual([[[64, 59, 55, 50, 45, 38]]], tab.midi_notes())
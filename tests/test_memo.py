@@ -0,0 +1,52 @@
+"""
+Block memo tests
+"""
+import os
+import tempfile
+import unittest
+
+from src.memo import BlockMemo
+from src.tablature import Tablature
+from src.timing import StageStats, COUNT_MEMO_HITS, COUNT_MEMO_MISSES
+
+class BlockMemoTest(unittest.TestCase):
+    """Repeated blocks are parsed once"""
+
+    def test_lru(self,):
+        """Least recently used blocks are dropped"""
+        memo = BlockMemo(max_blocks=2)
+        memo.put(memo.key(["a"], (1,)), "A")
+        memo.put(memo.key(["b"], (1,)), "B")
+        self.assertEqual("A", memo.get(memo.key(["a"], (1,)))[0])
+        memo.put(memo.key(["c"], (1,)), "C")
+
+        self.assertEqual(2, len(memo))
+        self.assertIsNone(memo.get(memo.key(["b"], (1,))))
+        self.assertIsNotNone(memo.get(memo.key(["a"], (1,))))
+        self.assertIsNone(memo.get(memo.key(["a"], (2,)))) # other instrument
+        self.assertEqual(2, memo.hits)
+        self.assertEqual(2, memo.misses)
+
+    def test_tablature_memo(self,):
+        """Same notes with and without memo, repeated blocks hit"""
+        with open("tests/tab_style1.txt") as f:
+            content = f.read()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tab_file = os.path.join(tmp_dir, "repeated.txt")
+            with open(tab_file, 'w') as f:
+                f.write("\n\n".join([content] * 3))
+
+            memo = BlockMemo()
+            stats = StageStats()
+            tab = Tablature(tab_file, Tablature.INST_BASS4, memo=memo, stats=stats)
+            expected = Tablature(tab_file, Tablature.INST_BASS4)
+
+            self.assertEqual(expected.midi_notes(), tab.midi_notes())
+            self.assertEqual([block.start_idx for block in expected.extracted_frets], [block.start_idx for block in tab.extracted_frets])
+            self.assertEqual(6, stats.counts[COUNT_MEMO_HITS])
+            self.assertEqual(3, stats.counts[COUNT_MEMO_MISSES])
+
+            # Shared across files
+            Tablature("tests/tab_style1.txt", Tablature.INST_BASS4, memo=memo, stats=stats).midi_notes()
+            self.assertEqual(9, stats.counts[COUNT_MEMO_HITS])
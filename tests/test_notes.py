@@ -120,5 +120,40 @@ class MusicNoteTest(unittest.TestCase):
         for name, midi_idx in test_data:
             self.assertEqual(midi_idx, MusicNote.name_to_midi(name))
 
+    def test_batch(self,):
+        """Sequences of notes"""
+        self.assertEqual(['Do0', 'Re#4', 'Sol10'], MusicNote.midi_to_names([0, 51, 127], IDX_LAT))
+        self.assertEqual([], MusicNote.midi_to_names([]))
+        self.assertEqual([0, 51, 11], MusicNote.names_to_midi(['C0', 'Re#4', 'H0']))
+
+        # Same errors as one by one
+        with self.assertRaises(ValueError):
+            MusicNote.midi_to_names([0, -1])
+        with self.assertRaises(ValueError):
+            MusicNote.midi_to_names([0, 128])
+        with self.assertRaises(TypeError):
+            MusicNote.midi_to_names([0, 'bla'])
+        with self.assertRaises(ValueError):
+            MusicNote.midi_to_names([0], 1000)
+        with self.assertRaises(ValueError):
+            MusicNote.names_to_midi(['C0', 'G#10'])
+        with self.assertRaises(TypeError):
+            MusicNote.names_to_midi(['C0', 8])
+
+    def test_tables_round_trip(self,):
+        """Precomputed tables are consistent both ways"""
+        for lang_idx in (IDX_ENG, IDX_DEU, IDX_LAT):
+            names = MusicNote.midi_to_names(range(128), lang_idx)
+            self.assertEqual(list(range(128)), MusicNote.names_to_midi(names))
+
+    def test_midi_to_frequency(self,):
+        """Equal temperament frequencies"""
+        self.assertEqual(440.0, MusicNote.midi_to_frequency(69))
+        self.assertAlmostEqual(261.626, MusicNote.midi_to_frequency(60), places=3)
+        self.assertAlmostEqual(41.203, MusicNote.midi_to_frequency(28), places=3)
+        self.assertAlmostEqual(2 * MusicNote.midi_to_frequency(40), MusicNote.midi_to_frequency(52))
+        with self.assertRaises(ValueError):
+            MusicNote.midi_to_frequency(128)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
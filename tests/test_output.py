@@ -0,0 +1,126 @@
+"""
+Output formats tests
+"""
+import contextlib
+import csv
+import io
+import json
+import struct
+import unittest
+
+from src.notes import MusicNote
+from src.output import TextWriter, JsonWriter, NdjsonWriter, CsvWriter, MidiWriter
+
+# Two blocks, with a chord
+MIDI_NOTES = [
+    [[40], [45, 52]],
+    [[43]],
+]
+
+class OutputTest(unittest.TestCase):
+    """Writers"""
+
+    def test_text(self,):
+        """Text lines"""
+        out = io.StringIO()
+        writer = TextWriter(out, MusicNote.ENGLISH, transposition=2)
+        writer.write_file("song.txt", MIDI_NOTES)
+        writer.close()
+        self.assertEqual("F#3 B3+F#4\nA3\n", out.getvalue())
+
+        out = io.StringIO()
+        writer = TextWriter(out, MusicNote.LATIN, headers=True)
+        writer.write_file("song.txt", MIDI_NOTES[1:])
+        writer.write_error("bad.txt", "Wrong instrument")
+        self.assertEqual("==> song.txt <==\nSol3\n==> bad.txt <==\nbad.txt: Wrong instrument\n", out.getvalue())
+
+    def test_json(self,):
+        """Single JSON document"""
+        out = io.StringIO()
+        writer = JsonWriter(out)
+        writer.write_file("song.txt", MIDI_NOTES)
+        writer.write_error("bad.txt", "Wrong instrument")
+        writer.close()
+
+        data = json.loads(out.getvalue())
+        self.assertEqual(2, len(data))
+        self.assertEqual([[40], [45, 52]], data[0]['blocks'][0]['midi'])
+        self.assertEqual([['E3'], ['A3', 'E4']], data[0]['blocks'][0]['names'])
+        self.assertEqual("Wrong instrument", data[1]['error'])
+
+        # Nothing written is still valid JSON
+        out = io.StringIO()
+        JsonWriter(out).close()
+        self.assertEqual([], json.loads(out.getvalue()))
+
+    def test_ndjson(self,):
+        """One object per block"""
+        out = io.StringIO()
+        writer = NdjsonWriter(out)
+        writer.write_file("song.txt", MIDI_NOTES)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([0, 1], [line['block'] for line in lines])
+        self.assertEqual([['G3']], lines[1]['names'])
+
+    def test_csv(self,):
+        """One row per note"""
+        out = io.StringIO()
+        writer = CsvWriter(out)
+        writer.write_file("song.txt", MIDI_NOTES)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(['file', 'block', 'chord', 'midi', 'name'], rows[0])
+        self.assertEqual(['song.txt', '0', '1', '52', 'E4'], rows[3])
+        self.assertEqual(5, len(rows))
+
+    def test_midi(self,):
+        """Standard MIDI File"""
+        self.assertEqual(b'\x00', MidiWriter.var_len(0))
+        self.assertEqual(b'\x7f', MidiWriter.var_len(127))
+        self.assertEqual(b'\x81\x00', MidiWriter.var_len(128))
+        self.assertEqual(b'\x83\x60', MidiWriter.var_len(480))
+
+        out = io.BytesIO()
+        writer = MidiWriter(out)
+        writer.write_file("song.txt", MIDI_NOTES)
+        writer.close()
+        data = out.getvalue()
+
+        self.assertEqual(b'MThd', data[:4])
+        self.assertEqual((6, 0, 1, 480), struct.unpack('>IHHH', data[4:14]))
+        self.assertEqual(b'MTrk', data[14:18])
+        track_len, = struct.unpack('>I', data[18:22])
+        self.assertEqual(len(data) - 22, track_len)
+        self.assertTrue(data.endswith(b'\xff\x2f\x00'))
+        # 4 notes on and 4 notes off
+        self.assertEqual(4, data.count(b'\x90'))
+
+        # Out of MIDI range after transposition
+        writer = MidiWriter(io.BytesIO(), transposition=100)
+        with self.assertRaises(ValueError):
+            writer.write_block(MIDI_NOTES[0])
+
+    def test_abort_file(self,):
+        """A file failing halfway, when streaming, still gives valid output"""
+        for writer_class in (TextWriter, JsonWriter, NdjsonWriter, CsvWriter, MidiWriter):
+            out = io.BytesIO() if writer_class.binary else io.StringIO()
+            writer = writer_class(out)
+            writer.begin_file("-")
+            writer.write_block(MIDI_NOTES[0])
+            with contextlib.redirect_stderr(io.StringIO()) as errors:
+                writer.abort_file("-", "Inconsistent string count in file (line 12)")
+            writer.close()
+            output = out.getvalue()
+
+            if writer_class is JsonWriter:
+                data = json.loads(output)
+                self.assertEqual(1, len(data))
+                self.assertEqual([[40], [45, 52]], data[0]['blocks'][0]['midi'])
+                self.assertIn("line 12", data[0]['error'])
+            elif writer_class is NdjsonWriter:
+                lines = [json.loads(line) for line in output.splitlines()]
+                self.assertEqual(0, lines[0]['block'])
+                self.assertEqual({'file': "-", 'error': "Inconsistent string count in file (line 12)"}, lines[1])
+            elif writer_class is TextWriter:
+                self.assertEqual("E3 A3+E4\nInconsistent string count in file (line 12)\n", output)
+            else:
+                self.assertIn("line 12", errors.getvalue())
@@ -0,0 +1,50 @@
+"""
+Parallel single file conversion tests
+"""
+import unittest
+
+from src.parallel import scan_blocks, parallel_midi_notes
+from src.tablature import Tablature
+from src.timing import StageStats, STAGE_LOAD, STAGE_STRUCTURE, STAGE_FRETS, STAGE_MIDI
+
+class ParallelTest(unittest.TestCase):
+    """Big files split over processes"""
+
+    def test_scan_blocks(self,):
+        """Blocks byte ranges"""
+        buf = (
+            b"Title\n"
+            b"e---0---\n"
+            b"a---2---\n"
+            b"\n"
+            b"e---3---\n"
+            b"a-------"
+        )
+        self.assertEqual([(6, 24), (25, 42)], scan_blocks(buf, (40, 45)))
+
+        with self.assertRaises(Tablature.InstrumentBadStringCount):
+            scan_blocks(buf, Tablature.INST_BASS4)
+        with self.assertRaises(Tablature.InconsistentTablature):
+            scan_blocks(b"e--------\na--------\n\ne--------\n\n", (40, 45))
+
+    def test_same_notes(self,):
+        """Same notes as the Tablature class"""
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4)
+        for jobs in (1, 2):
+            self.assertEqual(tab.midi_notes(), parallel_midi_notes("tests/tab_style1.txt", Tablature.INST_BASS4, jobs))
+
+        with self.assertRaises(Tablature.InconsistentTablature):
+            parallel_midi_notes("tests/tab_inconsistent.txt", Tablature.INST_BASS4, 2)
+        with self.assertRaises(ValueError):
+            parallel_midi_notes("tests/missing.txt", Tablature.INST_GUITAR6, 2)
+
+    def test_stats(self,):
+        """Workers stages are counted like a sequential parse"""
+        expected = StageStats()
+        Tablature("tests/tab_style1.txt", Tablature.INST_BASS4, stats=expected).midi_notes()
+        for jobs in (1, 2):
+            stats = StageStats()
+            parallel_midi_notes("tests/tab_style1.txt", Tablature.INST_BASS4, jobs, stats=stats)
+            for stage in (STAGE_LOAD, STAGE_STRUCTURE, STAGE_FRETS, STAGE_MIDI):
+                self.assertEqual(expected.counts[stage], stats.counts[stage], stage)
+            self.assertGreater(stats.wall[STAGE_FRETS], 0)
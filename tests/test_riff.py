@@ -0,0 +1,125 @@
+"""
+Riff search tests
+"""
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import tabs2notes
+
+from src.notes import MusicNote
+from src.riff import RiffIndex, melody, intervals_grams, GRAM_SIZE
+from src.tablature import Tablature
+
+class RiffIndexTest(unittest.TestCase):
+    """Find riffs in any key"""
+
+    def setUp(self,):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_file = os.path.join(self.tmp_dir.name, "index.sqlite")
+
+    def tearDown(self,):
+        self.tmp_dir.cleanup()
+
+    def test_grams(self,):
+        """Transposition doesn't change n-grams"""
+        pitches = [40, 43, 45, 40, 43, 46]
+        grams = intervals_grams(pitches)
+        self.assertEqual(len(pitches) - GRAM_SIZE, len(grams))
+        self.assertEqual(grams, intervals_grams([pitch + 7 for pitch in pitches]))
+        self.assertEqual([], intervals_grams(pitches[:GRAM_SIZE]))
+
+    def test_melody(self,):
+        """Highest note of chords, with positions"""
+        pitches, positions = melody([[[40], [45, 52]], [[], [43]]])
+        self.assertEqual([40, 52, 43], pitches)
+        self.assertEqual([0, 0, 0, 1, 1, 1], list(positions))
+
+    def test_search(self,):
+        """Index a tablature and find a transposed riff"""
+        tab_file = os.path.abspath("tests/tab_style1.txt")
+        midi_notes = Tablature(tab_file, Tablature.INST_BASS4).midi_notes()
+
+        riff_index = RiffIndex(self.index_file)
+        stat = os.stat(tab_file)
+        self.assertFalse(riff_index.is_current(tab_file, stat, Tablature.INST_BASS4))
+        riff_index.add_file(tab_file, stat, midi_notes, Tablature.INST_BASS4)
+        self.assertTrue(riff_index.is_current(tab_file, stat, Tablature.INST_BASS4))
+        # Parsed again with another instrument, or by another parser
+        self.assertFalse(riff_index.is_current(tab_file, stat, Tablature.INST_AUTO))
+        self.assertFalse(riff_index.is_current(tab_file, stat, Tablature.INST_GUITAR6))
+        with mock.patch.object(Tablature, 'PARSER_VERSION', Tablature.PARSER_VERSION + 1):
+            self.assertFalse(riff_index.is_current(tab_file, stat, Tablature.INST_BASS4))
+
+        # Second block riff, a fifth higher
+        riff = MusicNote.names_to_midi(['C#4', 'D4', 'E4', 'B4', 'A4', 'G#4'])
+        riff = [note + 7 for note in riff]
+        results = riff_index.search(riff)
+        self.assertEqual((1.0, tab_file, 1, 0), results[0])
+
+        with self.assertRaises(ValueError):
+            riff_index.search(riff[:GRAM_SIZE])
+
+        # Reindexing doesn't duplicate
+        riff_index.add_file(tab_file, stat, midi_notes, Tablature.INST_BASS4)
+        self.assertEqual(1, riff_index.files_count())
+        self.assertEqual(results, riff_index.search(riff))
+        riff_index.close()
+
+        # Persistent
+        riff_index = RiffIndex(self.index_file)
+        self.assertEqual(results, riff_index.search(riff))
+        riff_index.close()
+
+    def test_old_schema(self,):
+        """Databases of an older schema are rebuilt"""
+        db = sqlite3.connect(self.index_file)
+        db.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT, mtime_ns INTEGER, size INTEGER)")
+        db.commit()
+        db.close()
+
+        tab_file = os.path.abspath("tests/tab_style1.txt")
+        riff_index = RiffIndex(self.index_file)
+        stat = os.stat(tab_file)
+        self.assertFalse(riff_index.is_current(tab_file, stat, Tablature.INST_BASS4))
+        riff_index.add_file(tab_file, stat, Tablature(tab_file, Tablature.INST_BASS4).midi_notes(), Tablature.INST_BASS4)
+        self.assertTrue(riff_index.is_current(tab_file, stat, Tablature.INST_BASS4))
+        riff_index.close()
+
+    def test_search_tab(self,):
+        """A riff given as a one block tablature snippet"""
+        tab_file = os.path.abspath("tests/tab_style1.txt")
+        with contextlib.redirect_stderr(io.StringIO()):
+            tabs2notes.index(["--db", self.index_file, "-i", "bass4", tab_file])
+
+        # Second block riff, the file ending on its last string line
+        snippet = os.path.join(self.tmp_dir.name, "snippet.txt")
+        with open(snippet, 'w') as f:
+            f.write("g---6-7-9-16--14-13---\nd--------------------\na--------------------\ne--------------------")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            tabs2notes.search(["--db", self.index_file, "--tab", snippet])
+        self.assertEqual(f"1.00 {tab_file} block 2 chord 1", output.getvalue().splitlines()[0])
+
+    def test_index_directory(self,):
+        """The database isn't indexed as a tablature"""
+        tabs_dir = os.path.join(self.tmp_dir.name, "tabs")
+        os.mkdir(tabs_dir)
+        with open("tests/tab_style1.txt") as src, open(os.path.join(tabs_dir, "song.txt"), 'w') as dst:
+            dst.write(src.read())
+
+        cwd = os.getcwd()
+        os.chdir(tabs_dir)
+        try:
+            for db_args in ([], ["--db", "visible.sqlite"]):
+                for _ in range(2):
+                    errors = io.StringIO()
+                    with contextlib.redirect_stderr(errors):
+                        tabs2notes.index(db_args + ["-i", "bass4", "."])
+                    self.assertNotIn("sqlite", errors.getvalue())
+        finally:
+            os.chdir(cwd)
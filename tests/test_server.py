@@ -0,0 +1,76 @@
+"""
+Conversion server tests
+"""
+import asyncio
+import json
+import unittest
+
+from src.notes import MusicNote
+from src.server import ConversionServer, convert_text
+from src.tablature import Tablature
+
+INSTRUMENTS = {'bass4': Tablature.INST_BASS4}
+NAMINGS = {'english': MusicNote.ENGLISH}
+
+class ConversionServerTest(unittest.TestCase):
+    """Conversion daemon"""
+
+    def test_convert_text(self,):
+        """Worker conversion"""
+        with open("tests/tab_style1.txt") as f:
+            tab_text = f.read()
+        result = convert_text(tab_text, Tablature.INST_BASS4, MusicNote.ENGLISH, 12)
+
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4)
+        self.assertEqual(tab.midi_notes()[0][0][0] + 12, result['midi'][0][0][0])
+        self.assertEqual("A3", result['names'][0][0][0])
+
+        # An empty tuning is checked like any other, not detected
+        with self.assertRaises(Tablature.InstrumentBadStringCount):
+            convert_text(tab_text, (), MusicNote.ENGLISH)
+
+    def test_requests(self,):
+        """Requests over TCP"""
+        with open("tests/tab_style1.txt") as f:
+            tab = f.read()
+        answers = asyncio.run(self._exchange([
+            {'id': 1, 'tab': tab, 'naming': 'english'},
+            {'id': 2, 'tab': tab, 'instrument': [40, 45, 50, 55, 59, 64]},
+            {'id': 3, 'tab': tab, 'instrument': 'banjo'},
+            {'id': 4, 'tab': tab, 'instrument': []},
+            {'id': 5, 'command': 'stats'},
+        ]))
+
+        self.assertEqual(1, answers[0]['id'])
+        self.assertEqual(3, len(answers[0]['names']))
+        self.assertEqual("A2", answers[0]['names'][0][0][0])
+        self.assertIn("Wrong instrument", answers[1]['error'])
+        self.assertIn("Unknown instrument", answers[2]['error'])
+        # Empty tunings aren't auto-detection
+        self.assertIn("empty", answers[3]['error'])
+        self.assertEqual(4, answers[4]['requests'])
+        self.assertEqual(3, answers[4]['errors'])
+        self.assertIsNotNone(answers[4]['latency_ms']['p50'])
+
+    async def _exchange(self, requests):
+        """Start a server, send requests on one connection, return answers"""
+        server = ConversionServer(INSTRUMENTS, NAMINGS, 'bass4', 'english', workers=1, max_pending=2)
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(server.serve(port=0, ready=ready.set_result))
+        listening = await ready
+        port = listening.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        answers = []
+        for request in requests:
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            answers.append(json.loads(await reader.readline()))
+        writer.close()
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return answers
@@ -3,8 +3,12 @@ Tablatures aren't standardized...
 This stuff is going to break for sure at some point, and fixing it without 
 regressions is going to be challenging
 """
+import os
+import tempfile
 import unittest
-from src.tablature import Tablature
+from src.parallel import parallel_midi_notes
+from src.tablature import Tablature, FretsBlock, scan_block_frets, BINARY_HEADER, BINARY_BLOCK, BINARY_ALIGN
+from src.timing import StageStats, STAGE_LOAD, STAGE_STRUCTURE, STAGE_FRETS
 
 class TablatureTest(unittest.TestCase):
     """Tablature testing"""
@@ -41,17 +45,104 @@ class TablatureTest(unittest.TestCase):
         # Multiple times same number must not be repeated
         self.assertEqual(7, frets[21]) # 777777
 
+    def test_line_frets_notation(self,):
+        """Two digits frets and playing techniques"""
+        # Same digit twice is a real fret
+        self.assertEqual({3: 11, 6: 1}, dict(Tablature.get_line_frets("d--11-1---")))
+        # Hammer-on, pull-off, slides: following frets are notes
+        self.assertEqual({2: 5, 4: 7, 6: 5, 8: 7, 10: 9}, dict(Tablature.get_line_frets("e|5h7p5/7\\9--|")))
+        # Bend targets and releases aren't new notes, muted notes have no pitch
+        self.assertEqual({2: 7, 9: 3}, dict(Tablature.get_line_frets("e|7b9r7--3-x-|")))
+        # Frets glued together
+        self.assertEqual({2: 10, 4: 12}, dict(Tablature.get_line_frets("e|1012---")))
+
+    def test_scan_block_frets(self,):
+        """Events come sorted by column and string"""
+        columns, strings, frets = scan_block_frets([
+            "e|---1012--",
+            "B|--3-11---",
+        ])
+        self.assertEqual([4, 5, 6, 7], columns)
+        self.assertEqual([1, 0, 1, 0], strings)
+        self.assertEqual([3, 10, 11, 12], frets)
+
     def test_broken_tablatures(self,):
         """Weird tablatures stuff"""
 
         # Inconsistent tablature
         with self.assertRaises(Tablature.InconsistentTablature):
-            Tablature("tests/tab_inconsistent.txt", Tablature.INST_GUITAR6)
+            Tablature("tests/tab_inconsistent.txt", Tablature.INST_BASS4).midi_notes()
 
         # Wrong instrument for tablature
         with self.assertRaises(Tablature.InstrumentBadStringCount):
-            Tablature("tests/tab_empty_guitar.txt", Tablature.INST_BASS4)
+            Tablature("tests/tab_empty_guitar.txt", Tablature.INST_BASS4).midi_notes()
+
+        # The first error wins, a wrong instrument on the first block before a later inconsistency
+        with self.assertRaises(Tablature.InstrumentBadStringCount):
+            Tablature("tests/tab_inconsistent.txt", Tablature.INST_GUITAR6).check()
+        for jobs in (1, 2):
+            with self.assertRaises(Tablature.InstrumentBadStringCount):
+                parallel_midi_notes("tests/tab_inconsistent.txt", Tablature.INST_GUITAR6, jobs)
+        with open("tests/tab_inconsistent.txt") as f:
+            with self.assertRaises(Tablature.InstrumentBadStringCount):
+                list(Tablature.iter_blocks(f, Tablature.INST_GUITAR6))
     
+    def test_last_block(self,):
+        """Files ending on a string line, their last block is checked like the others"""
+        one_block = (
+            "e|-----0-----|\n"
+            "B|-----1-----|\n"
+            "G|-----0-----|\n"
+            "D|-----2-----|\n"
+            "A|-----3-----|\n"
+            "E|-----------|\n"
+        )
+        inconsistent = "G|---3-----|\nD|---------|\nA|---------|\nE|---------|\n\n" + one_block
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            one_block_file = os.path.join(tmp_dir, "one_block.txt")
+            inconsistent_file = os.path.join(tmp_dir, "inconsistent.txt")
+            for file_name, text in ((one_block_file, one_block), (inconsistent_file, inconsistent)):
+                with open(file_name, 'w') as f:
+                    f.write(text)
+
+            expected = [[[64, 60, 55, 52, 48]]]
+            tab = Tablature(one_block_file, Tablature.INST_GUITAR6)
+            self.assertEqual(expected, tab.midi_notes())
+            self.assertEqual(6, tab.strings_count)
+            for jobs in (1, 2):
+                self.assertEqual(expected, parallel_midi_notes(one_block_file, Tablature.INST_GUITAR6, jobs))
+            with open(one_block_file) as f:
+                self.assertEqual(expected, list(Tablature.iter_blocks(f, Tablature.INST_GUITAR6)))
+
+            with self.assertRaises(Tablature.InconsistentTablature):
+                Tablature(inconsistent_file, Tablature.INST_BASS4).check()
+            for jobs in (1, 2):
+                with self.assertRaises(Tablature.InconsistentTablature):
+                    parallel_midi_notes(inconsistent_file, Tablature.INST_BASS4, jobs)
+            with open(inconsistent_file) as f:
+                with self.assertRaises(Tablature.InconsistentTablature):
+                    list(Tablature.iter_blocks(f, Tablature.INST_BASS4))
+
+    def test_lazy_stages(self,):
+        """Stages run on first access only, checking stops at the structure"""
+        stats = StageStats()
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4, stats=stats)
+        self.assertEqual({}, dict(stats.wall))
+
+        tab.check()
+        self.assertEqual(4, tab.strings_count)
+        self.assertEqual({STAGE_LOAD, STAGE_STRUCTURE}, set(stats.wall))
+
+        self.assertEqual(3, len(tab.extracted_frets))
+        tab.midi_notes()
+        self.assertEqual(3, stats.counts[STAGE_STRUCTURE]) # parsed once
+        self.assertIn(STAGE_FRETS, stats.wall)
+
+        with self.assertRaises(Tablature.InconsistentTablature):
+            Tablature("tests/tab_inconsistent.txt", Tablature.INST_BASS4).check()
+        with self.assertRaises(ValueError):
+            Tablature("tests/missing.txt", Tablature.INST_BASS4).check()
+
     def test_structure_parse(self,):
         """Ensure we find all the line groups"""
         tab = Tablature("tests/tab_empty_guitar.txt", Tablature.INST_GUITAR6)
@@ -67,4 +158,94 @@ class TablatureTest(unittest.TestCase):
         # There are 3 tab lines groups
         self.assertEqual(3, len(tab.extracted_frets))
 
-        
\ No newline at end of file
+        
+    def test_iter_blocks(self,):
+        """Streamed parsing gives the same notes as the full parsing"""
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4)
+        with open("tests/tab_style1.txt") as f:
+            blocks = list(Tablature.iter_blocks(f, Tablature.INST_BASS4))
+        self.assertEqual(tab.midi_notes(), blocks)
+
+        # Same errors as the full parsing, the instrument is checked on first block
+        with self.assertRaises(Tablature.InconsistentTablature):
+            with open("tests/tab_inconsistent.txt") as f:
+                list(Tablature.iter_blocks(f, Tablature.INST_BASS4))
+        with self.assertRaises(Tablature.InstrumentBadStringCount):
+            with open("tests/tab_empty_guitar.txt") as f:
+                list(Tablature.iter_blocks(f, Tablature.INST_BASS4))
+
+    def test_iter_blocks_streaming(self,):
+        """A block is yielded before the rest of the file is read"""
+        def lines():
+            yield "e---0---"
+            yield "a---2---"
+            yield ""
+            raise AssertionError("Read too far")
+
+        blocks = Tablature.iter_blocks(lines(), (40, 45))
+        self.assertEqual([[45, 42]], next(blocks))
+
+    def test_block_frets(self,):
+        """Frets are stored per block, sorted by column and string"""
+        block = Tablature.get_block_frets([
+            "e---3---0-----",
+            "a-------2---5-",
+            "d-------2-----",
+        ], 7)
+        self.assertEqual(FretsBlock(7, 3, [4, 8, 8, 8, 12], [0, 0, 1, 2, 1], [3, 0, 2, 2, 5]), block)
+        self.assertEqual(5, len(block))
+        self.assertEqual([[67], [64, 59, 54], [62]], block.midi_notes([64, 57, 52]))
+
+    def test_save_load(self,):
+        """A saved tablature loads back without parsing"""
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bin_file = os.path.join(tmp_dir, "tab_style1.t2n")
+            tab.save(bin_file)
+            loaded = Tablature.load(bin_file)
+
+            self.assertEqual(tab.strings_count, loaded.strings_count)
+            self.assertEqual(tab.strings_base_notes, loaded.strings_base_notes)
+            self.assertEqual(tab.extracted_frets, loaded.extracted_frets)
+            self.assertEqual(tab.midi_notes(), loaded.midi_notes())
+
+            # Not a binary tablature
+            with self.assertRaises(ValueError):
+                Tablature.load("tests/tab_style1.txt")
+            with open(bin_file, 'rb') as f:
+                data = f.read()
+
+            # Truncated anywhere, or blocks events out of the arrays
+            for size in range(len(data)):
+                with open(bin_file, 'wb') as f:
+                    f.write(data[:size])
+                with self.assertRaises(ValueError, msg=f"{size} bytes"):
+                    Tablature.load(bin_file)
+            table_offset = BINARY_HEADER.size + len(tab.strings_base_notes)
+            table_offset += -table_offset % BINARY_ALIGN
+            corrupt = bytearray(data)
+            BINARY_BLOCK.pack_into(corrupt, table_offset, 0, 1000, 1)
+            with open(bin_file, 'wb') as f:
+                f.write(corrupt)
+            with self.assertRaises(ValueError):
+                Tablature.load(bin_file)
+
+            # Strings out of the instrument, or an instrument of another strings count
+            corrupt = bytearray(data)
+            corrupt[-1] = 200
+            header = list(BINARY_HEADER.unpack_from(data))
+            header[2] += 1
+            other_count = bytearray(data)
+            BINARY_HEADER.pack_into(other_count, 0, *header)
+            for corrupt in (corrupt, other_count):
+                with open(bin_file, 'wb') as f:
+                    f.write(corrupt)
+                with self.assertRaises(ValueError):
+                    Tablature.load(bin_file)
+
+            # Saved for another instrument than the chosen one
+            with open(bin_file, 'wb') as f:
+                f.write(data)
+            self.assertEqual(tab.midi_notes(), Tablature.load(bin_file, inst_strings=Tablature.INST_BASS4).midi_notes())
+            with self.assertRaises(Tablature.InstrumentBadStringCount):
+                Tablature.load(bin_file, inst_strings=Tablature.INST_GUITAR6)
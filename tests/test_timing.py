@@ -0,0 +1,54 @@
+"""
+Stages timing tests
+"""
+import unittest
+from unittest import mock
+
+from src.tablature import Tablature
+from src.timing import StageStats, STAGE_LOAD, STAGE_STRUCTURE, STAGE_FRETS, STAGE_MIDI, STAGE_NAMING, STAGE_OUTPUT
+
+class StageStatsTest(unittest.TestCase):
+    """Where does time go ?"""
+
+    def test_tablature_stats(self,):
+        """Tablature fills the stages stats"""
+        stats = StageStats()
+        tab = Tablature("tests/tab_style1.txt", Tablature.INST_BASS4, stats=stats)
+        tab.midi_notes()
+
+        self.assertEqual(20, stats.counts[STAGE_LOAD])
+        self.assertEqual(3, stats.counts[STAGE_STRUCTURE])
+        self.assertEqual(56, stats.counts[STAGE_FRETS])
+        self.assertEqual(56, stats.counts[STAGE_MIDI])
+        for stage in (STAGE_LOAD, STAGE_STRUCTURE, STAGE_FRETS, STAGE_MIDI):
+            self.assertGreater(stats.wall[stage], 0)
+
+    def test_merge(self,):
+        """Stats add up"""
+        stats = StageStats()
+        other = StageStats()
+        with other.stage(STAGE_LOAD):
+            pass
+        other.count(STAGE_LOAD, 10)
+        stats.count(STAGE_LOAD, 5)
+        stats.merge(other)
+
+        self.assertEqual(15, stats.counts[STAGE_LOAD])
+        self.assertEqual(other.wall[STAGE_LOAD], stats.wall[STAGE_LOAD])
+        self.assertEqual(4, len(stats.report(1.0))) # header, load stage, throughputs
+
+    def test_nested(self,):
+        """Nested stages time is only counted once"""
+        stats = StageStats()
+        clock = mock.Mock(side_effect=[0.0, 1.0, 4.0, 5.0])
+        cpu_clock = mock.Mock(side_effect=[0.0, 0.5, 2.5, 3.0])
+        with mock.patch('time.perf_counter', clock), mock.patch('time.process_time', cpu_clock):
+            with stats.stage(STAGE_OUTPUT):
+                with stats.stage(STAGE_NAMING):
+                    pass
+
+        self.assertEqual(2.0, stats.wall[STAGE_OUTPUT])
+        self.assertEqual(3.0, stats.wall[STAGE_NAMING])
+        self.assertEqual(1.0, stats.cpu[STAGE_OUTPUT])
+        self.assertEqual(2.0, stats.cpu[STAGE_NAMING])
+        self.assertEqual(5.0, sum(stats.wall.values()))
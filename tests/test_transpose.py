@@ -0,0 +1,45 @@
+"""
+Bulk transposition and range fitting tests
+"""
+import unittest
+
+from src.notes import SCALE_SIZE
+from src.transpose import transpose, pitch_histogram, best_offset, fit_transposition, parse_range
+
+class TransposeTest(unittest.TestCase):
+    """Moving whole files around"""
+
+    def test_transpose(self,):
+        """All notes move, or none when one leaves the MIDI range"""
+        midi_notes = [[[40], [45, 52]], [], [[127 - 12]]]
+        self.assertEqual([[[42], [47, 54]], [], [[117]]], transpose(midi_notes, 2))
+        self.assertIs(midi_notes, transpose(midi_notes, 0))
+        with self.assertRaises(ValueError):
+            transpose(midi_notes, 13)
+        with self.assertRaises(ValueError):
+            transpose(midi_notes, -41)
+
+    def test_best_offset(self,):
+        """The offset keeping most notes in range, from a single histogram"""
+        midi_notes = [[[28], [33], [40, 47]], [[28], [31]]]
+        histogram = pitch_histogram(midi_notes)
+        self.assertEqual(2, histogram[28])
+        self.assertEqual(6, sum(histogram))
+
+        # Already fitting
+        self.assertEqual(0, best_offset(histogram, 28, 47))
+        # An octave keeps the key when it fits as well as a smaller shift
+        self.assertEqual(12, best_offset(histogram, 40, 59))
+        self.assertEqual(2, best_offset(histogram, 30, 49))
+        self.assertEqual(0, best_offset(histogram, 30, 49, SCALE_SIZE))
+        self.assertEqual(SCALE_SIZE, best_offset(histogram, 40, 52, SCALE_SIZE))
+        # Nothing to fit
+        self.assertEqual(0, fit_transposition([[]], 40, 59))
+
+    def test_parse_range(self,):
+        """Ranges as notes names"""
+        self.assertEqual((28, 55), parse_range("E2:G4"))
+        self.assertEqual((28, 55), parse_range("Mi2 : Sol4"))
+        for text in ("E2", "E2:X4", "G4:E2"):
+            with self.assertRaises(ValueError):
+                parse_range(text)
@@ -0,0 +1,82 @@
+"""
+Watch mode tests
+"""
+import os
+import tempfile
+import unittest
+
+from src.watch import TabsWatcher
+
+class TabsWatcherTest(unittest.TestCase):
+    """Only changes are reconverted"""
+
+    def setUp(self,):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tabs_dir = os.path.join(self.tmp_dir.name, "tabs")
+        self.output_dir = os.path.join(self.tmp_dir.name, "notes")
+        os.makedirs(os.path.join(self.tabs_dir, "sub"))
+        self.calls = []
+
+    def tearDown(self,):
+        self.tmp_dir.cleanup()
+
+    def convert(self, tab_file, out_file):
+        """Fake conversion, copies the file, fails on 'bad'"""
+        self.calls.append(os.path.relpath(tab_file, self.tabs_dir))
+        with open(tab_file) as f:
+            content = f.read()
+        if content == "bad":
+            return "Bad tablature"
+        with open(out_file, 'w') as f:
+            f.write(content)
+        return None
+
+    def write(self, rel_path, content, mtime=None):
+        """Write a tablature"""
+        path = os.path.join(self.tabs_dir, rel_path)
+        with open(path, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def watcher(self,):
+        return TabsWatcher(self.tabs_dir, self.output_dir, self.convert, '.out')
+
+    def test_scan(self,):
+        """Added, changed, touched, deleted and broken files"""
+        self.write("a.txt", "a", 1000)
+        self.write("sub/b.txt", "b", 1000)
+        self.write(".hidden", "h", 1000)
+        watcher = self.watcher()
+
+        self.assertEqual((["a.txt", "sub/b.txt"], [], []), tuple(map(sorted, watcher.scan())))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "sub", "b.txt.out")))
+
+        # Nothing changed, nothing done
+        self.calls.clear()
+        self.assertEqual(([], [], []), watcher.scan())
+        self.assertEqual([], self.calls)
+
+        # Touched with the same content isn't converted
+        self.write("a.txt", "a", 2000)
+        self.assertEqual(([], [], []), watcher.scan())
+        self.assertEqual([], self.calls)
+
+        # Changed, deleted and broken
+        self.write("a.txt", "aa", 3000)
+        os.remove(os.path.join(self.tabs_dir, "sub", "b.txt"))
+        self.write("c.txt", "bad", 3000)
+        converted, removed, errors = watcher.scan()
+        self.assertEqual(["a.txt"], converted)
+        self.assertEqual(["sub/b.txt"], removed)
+        self.assertEqual([("c.txt", "Bad tablature")], errors)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "sub", "b.txt.out")))
+
+    def test_manifest(self,):
+        """A new watcher goes on where the previous one stopped"""
+        self.write("a.txt", "a", 1000)
+        self.watcher().scan()
+
+        self.calls.clear()
+        self.assertEqual(([], [], []), self.watcher().scan())
+        self.assertEqual([], self.calls)